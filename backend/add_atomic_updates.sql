@@ -0,0 +1,62 @@
+-- SQL script for single-statement item updates
+-- Run these commands in your Supabase SQL editor after add_folder_paths.sql
+--
+-- Each function applies its change with one conditional UPDATE scoped to the
+-- caller and returns the updated row, or no row when the item is not the
+-- caller's. There is no read-then-write window for concurrent requests to
+-- race through.
+
+-- Flip the star in place, so two clicks at once always cancel out
+CREATE OR REPLACE FUNCTION toggle_file_star(p_file_id UUID, p_owner_id UUID)
+RETURNS SETOF files
+LANGUAGE sql
+AS $$
+    UPDATE files SET is_starred = NOT COALESCE(is_starred, FALSE)
+    WHERE id = p_file_id AND owner_id = p_owner_id
+    RETURNING *;
+$$;
+
+CREATE OR REPLACE FUNCTION toggle_folder_star(p_folder_id UUID, p_owner_id UUID)
+RETURNS SETOF folders
+LANGUAGE sql
+AS $$
+    UPDATE folders SET is_starred = NOT COALESCE(is_starred, FALSE)
+    WHERE id = p_folder_id AND owner_id = p_owner_id
+    RETURNING *;
+$$;
+
+-- Rename and/or move a folder. Raises no_data_found (P0002) when the new
+-- parent is not the caller's; moving a folder into its own subtree is
+-- rejected by the set_folder_path trigger with check_violation (23514).
+-- Returns the updated row as JSON with the parent it had before, read under
+-- the row lock the update takes, as "previous_parent_id".
+DROP FUNCTION IF EXISTS update_folder(UUID, UUID, TEXT, UUID);
+CREATE FUNCTION update_folder(p_folder_id UUID, p_owner_id UUID, p_name TEXT, p_parent_id UUID)
+RETURNS SETOF JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    previous_parent_id UUID;
+BEGIN
+    -- Before the row lock, in the same order as every other path change
+    PERFORM lock_folder_tree(p_owner_id);
+
+    IF p_parent_id IS NOT NULL
+       AND NOT EXISTS (SELECT 1 FROM folders WHERE id = p_parent_id AND owner_id = p_owner_id) THEN
+        RAISE EXCEPTION 'Parent folder % not found', p_parent_id USING ERRCODE = 'no_data_found';
+    END IF;
+
+    SELECT parent_id INTO previous_parent_id
+    FROM folders
+    WHERE id = p_folder_id AND owner_id = p_owner_id
+    FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    RETURN QUERY
+    UPDATE folders SET name = p_name, parent_id = p_parent_id, updated_at = NOW()
+    WHERE id = p_folder_id AND owner_id = p_owner_id
+    RETURNING to_jsonb(folders) || jsonb_build_object('previous_parent_id', previous_parent_id);
+END;
+$$;
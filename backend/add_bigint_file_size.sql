@@ -0,0 +1,7 @@
+-- SQL script to allow files over 2 GiB
+-- Run this in your Supabase SQL Editor
+
+-- files.size was created as INTEGER, which stops at 2 GiB; resumable uploads
+-- are meant for larger files, and blobs.size is already BIGINT. Rewrites the
+-- table and its size index, so run it at a quiet time on a large table.
+ALTER TABLE files ALTER COLUMN size TYPE BIGINT;
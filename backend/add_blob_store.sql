@@ -0,0 +1,87 @@
+-- SQL script to enable content-addressed (deduplicated) file storage
+-- Run these commands in your Supabase SQL editor before deploying the backend
+
+-- One row per distinct blob on disk, keyed by its SHA-256 digest
+CREATE TABLE IF NOT EXISTS blobs (
+    digest CHAR(64) PRIMARY KEY,
+    size BIGINT NOT NULL,
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Set while a blob that lost its last reference is being unlinked (see below)
+ALTER TABLE blobs ADD COLUMN IF NOT EXISTS deleting_since TIMESTAMP WITH TIME ZONE;
+
+-- Take a reference on a blob, creating its row on first use.
+-- Returns the new reference count, and whether the blob is being unlinked:
+-- if so, the caller must wait for blob_deletion_settled before storing it.
+DROP FUNCTION IF EXISTS acquire_blob(TEXT, BIGINT);
+CREATE FUNCTION acquire_blob(p_digest TEXT, p_size BIGINT)
+RETURNS TABLE (ref_count INTEGER, deleting BOOLEAN)
+LANGUAGE sql
+AS $$
+    INSERT INTO blobs (digest, size, ref_count)
+    VALUES (p_digest, p_size, 1)
+    ON CONFLICT (digest) DO UPDATE SET ref_count = blobs.ref_count + 1
+    RETURNING blobs.ref_count, blobs.deleting_since IS NOT NULL;
+$$;
+
+-- Drop a reference on a blob. At zero the row stays, marked for deletion.
+-- Returns the remaining reference count (0 means the caller should unlink it).
+CREATE OR REPLACE FUNCTION release_blob(p_digest TEXT)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    remaining INTEGER;
+BEGIN
+    UPDATE blobs
+    SET ref_count = GREATEST(ref_count - 1, 0),
+        deleting_since = CASE WHEN ref_count <= 1 THEN NOW() ELSE deleting_since END
+    WHERE digest = p_digest
+    RETURNING ref_count INTO remaining;
+
+    RETURN COALESCE(remaining, 0);
+END;
+$$;
+
+-- Unlinking a blob races with an upload of the same content taking a new
+-- reference: the upload would find the old copy still there and drop its
+-- own, then lose it to the unlink. So the unlink is bracketed by these two
+-- calls. The claim returns only the digests still unreferenced, and holds
+-- off acquire_blob callers until the finish, which forgets the blobs that
+-- stayed unreferenced and lets the waiting uploads store theirs.
+CREATE OR REPLACE FUNCTION claim_blob_deletions(p_digests TEXT[])
+RETURNS TEXT[]
+LANGUAGE sql
+AS $$
+    WITH claimed AS (
+        UPDATE blobs SET deleting_since = NOW()
+        WHERE digest = ANY(p_digests) AND ref_count <= 0 AND deleting_since IS NOT NULL
+        RETURNING digest
+    )
+    SELECT COALESCE(array_agg(digest), '{}') FROM claimed;
+$$;
+
+CREATE OR REPLACE FUNCTION finish_blob_deletions(p_digests TEXT[])
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    DELETE FROM blobs WHERE digest = ANY(p_digests) AND ref_count <= 0;
+    UPDATE blobs SET deleting_since = NULL WHERE digest = ANY(p_digests);
+$$;
+
+-- Whether a blob can be stored again after acquire_blob reported it being
+-- unlinked. A deletion claimed longer ago than p_timeout_seconds is taken to
+-- have been abandoned (its worker died) and is cleared.
+CREATE OR REPLACE FUNCTION blob_deletion_settled(p_digest TEXT, p_timeout_seconds DOUBLE PRECISION)
+RETURNS BOOLEAN
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE blobs SET deleting_since = NULL
+    WHERE digest = p_digest
+      AND deleting_since < NOW() - make_interval(secs => p_timeout_seconds);
+    RETURN NOT EXISTS (SELECT 1 FROM blobs WHERE digest = p_digest AND deleting_since IS NOT NULL);
+END;
+$$;
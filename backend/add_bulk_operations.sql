@@ -0,0 +1,205 @@
+-- SQL script for bulk move, star, trash, restore and delete
+-- Run these commands in your Supabase SQL editor after add_folder_paths.sql
+--
+-- Each function takes the caller's id plus arrays of file and folder ids,
+-- ignores ids the caller does not own, and applies the change with one
+-- statement per table. It returns the ids it applied to as
+-- {"files": [...], "folders": [...]} so the API can report per-item results.
+
+-- A bulk move can move a folder and one of its descendants in the same
+-- statement. Rewriting descendants by their old path prefix then depends on
+-- row order, so paths are rebuilt by walking parent_id from the moved folder.
+CREATE OR REPLACE FUNCTION move_folder_descendants()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF NEW.path IS DISTINCT FROM OLD.path THEN
+        WITH RECURSIVE sub AS (
+            SELECT c.id, NEW.path || c.id::text || '/' AS path
+            FROM folders c WHERE c.owner_id = NEW.owner_id AND c.parent_id = NEW.id
+            UNION ALL
+            SELECT c.id, s.path || c.id::text || '/'
+            FROM folders c JOIN sub s ON c.parent_id = s.id
+            WHERE c.owner_id = NEW.owner_id
+        )
+        UPDATE folders SET path = sub.path FROM sub
+        WHERE folders.id = sub.id AND folders.path IS DISTINCT FROM sub.path;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Set (not toggle) the star on every listed item
+CREATE OR REPLACE FUNCTION bulk_set_starred(p_owner_id UUID, p_file_ids UUID[], p_folder_ids UUID[], p_starred BOOLEAN)
+RETURNS JSON
+LANGUAGE sql
+AS $$
+    WITH starred_files AS (
+        UPDATE files SET is_starred = p_starred
+        WHERE owner_id = p_owner_id AND id = ANY(p_file_ids)
+        RETURNING id
+    ), starred_folders AS (
+        UPDATE folders SET is_starred = p_starred
+        WHERE owner_id = p_owner_id AND id = ANY(p_folder_ids)
+        RETURNING id
+    )
+    SELECT json_build_object(
+        'files', COALESCE((SELECT json_agg(id) FROM starred_files), '[]'),
+        'folders', COALESCE((SELECT json_agg(id) FROM starred_folders), '[]')
+    );
+$$;
+
+-- Move items into p_target_id (NULL for the root). Returns NULL if the target
+-- is not a live folder of the caller. Folders that would end up inside
+-- themselves are skipped and listed under "rejected_folders".
+CREATE OR REPLACE FUNCTION bulk_move(p_owner_id UUID, p_file_ids UUID[], p_folder_ids UUID[], p_target_id UUID)
+RETURNS JSON
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    target_path TEXT;
+    moved_files JSON;
+    moved_folders JSON;
+    rejected JSON;
+BEGIN
+    -- Held until commit, so the target path and cycle checks below can't be
+    -- invalidated by a concurrent move
+    PERFORM lock_folder_tree(p_owner_id);
+
+    IF p_target_id IS NOT NULL THEN
+        SELECT path INTO target_path FROM folders
+        WHERE id = p_target_id AND owner_id = p_owner_id AND is_trashed IS NOT TRUE;
+        IF target_path IS NULL THEN
+            RETURN NULL;
+        END IF;
+    END IF;
+
+    SELECT COALESCE(json_agg(id), '[]') INTO rejected FROM folders
+    WHERE owner_id = p_owner_id AND id = ANY(p_folder_ids) AND starts_with(target_path, path);
+
+    WITH moved AS (
+        UPDATE files SET folder_id = p_target_id, updated_at = NOW()
+        WHERE owner_id = p_owner_id AND id = ANY(p_file_ids) AND is_trashed IS NOT TRUE
+        RETURNING id
+    )
+    SELECT COALESCE(json_agg(id), '[]') INTO moved_files FROM moved;
+
+    WITH moved AS (
+        UPDATE folders SET parent_id = p_target_id, updated_at = NOW()
+        WHERE owner_id = p_owner_id AND id = ANY(p_folder_ids) AND is_trashed IS NOT TRUE
+          AND (target_path IS NULL OR NOT starts_with(target_path, path))
+        RETURNING id
+    )
+    SELECT COALESCE(json_agg(id), '[]') INTO moved_folders FROM moved;
+
+    RETURN json_build_object('files', moved_files, 'folders', moved_folders, 'rejected_folders', rejected);
+END;
+$$;
+
+-- Trash the listed files and folders, including everything inside the
+-- folders, stamped like trash_folder_tree. Items already in the trash count
+-- as applied.
+CREATE OR REPLACE FUNCTION bulk_trash(p_owner_id UUID, p_file_ids UUID[], p_folder_ids UUID[])
+RETURNS JSON
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    stamp TIMESTAMP WITH TIME ZONE := NOW();
+    roots UUID[];
+    tree UUID[];
+    owned_files UUID[];
+BEGIN
+    SELECT array_agg(id) INTO roots FROM folders WHERE owner_id = p_owner_id AND id = ANY(p_folder_ids);
+    SELECT array_agg(DISTINCT s.id) INTO tree FROM unnest(roots) AS r(id), folder_subtree(r.id, p_owner_id) s;
+    SELECT array_agg(id) INTO owned_files FROM files WHERE owner_id = p_owner_id AND id = ANY(p_file_ids);
+
+    UPDATE folders SET is_trashed = TRUE, trashed_at = stamp, updated_at = stamp
+    WHERE id = ANY(tree) AND is_trashed IS NOT TRUE;
+
+    UPDATE files SET is_trashed = TRUE, trashed_at = stamp, updated_at = stamp
+    WHERE owner_id = p_owner_id AND (id = ANY(owned_files) OR folder_id = ANY(tree)) AND is_trashed IS NOT TRUE;
+
+    RETURN json_build_object('files', to_json(COALESCE(owned_files, '{}')), 'folders', to_json(COALESCE(roots, '{}')));
+END;
+$$;
+
+-- Restore trashed files, and trashed folders together with everything that
+-- was trashed with each of them (as restore_folder_tree does for one folder)
+CREATE OR REPLACE FUNCTION bulk_restore(p_owner_id UUID, p_file_ids UUID[], p_folder_ids UUID[])
+RETURNS JSON
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    roots UUID[];
+    folder_ids UUID[];
+    stamps TIMESTAMP WITH TIME ZONE[];
+    restored_files JSON;
+BEGIN
+    -- Every folder to restore with the stamp it was trashed under: each trashed
+    -- root, plus the rows in its subtree that carry the root's stamp
+    WITH root AS (
+        SELECT id, path, trashed_at FROM folders
+        WHERE owner_id = p_owner_id AND id = ANY(p_folder_ids) AND is_trashed = TRUE
+    ), restoring AS (
+        SELECT DISTINCT ON (d.id) d.id, d.trashed_at, root.id AS root_id
+        FROM root
+        JOIN folders d ON d.owner_id = p_owner_id
+            AND d.path >= root.path AND d.path < left(root.path, -1) || '0'
+        WHERE d.is_trashed = TRUE AND (d.id = root.id OR d.trashed_at IS NOT DISTINCT FROM root.trashed_at)
+    )
+    SELECT array_agg(DISTINCT root_id), array_agg(id), array_agg(trashed_at)
+    INTO roots, folder_ids, stamps FROM restoring;
+
+    UPDATE folders SET is_trashed = FALSE, trashed_at = NULL, updated_at = NOW()
+    WHERE id = ANY(folder_ids);
+
+    -- Files come back with their folder if they were trashed together with it
+    UPDATE files SET is_trashed = FALSE, trashed_at = NULL, updated_at = NOW()
+    FROM unnest(folder_ids, stamps) AS r(id, stamp)
+    WHERE files.owner_id = p_owner_id AND files.folder_id = r.id AND files.is_trashed = TRUE
+      AND files.trashed_at IS NOT DISTINCT FROM r.stamp;
+
+    WITH restored AS (
+        UPDATE files SET is_trashed = FALSE, trashed_at = NULL, updated_at = NOW()
+        WHERE owner_id = p_owner_id AND id = ANY(p_file_ids) AND is_trashed = TRUE
+        RETURNING id
+    )
+    SELECT COALESCE(json_agg(id), '[]') INTO restored_files FROM restored;
+
+    RETURN json_build_object('files', restored_files, 'folders', to_json(COALESCE(roots, '{}')));
+END;
+$$;
+
+-- Permanently delete the listed files and folder subtrees. Also returns the
+-- storage paths of every deleted file for the caller to release.
+CREATE OR REPLACE FUNCTION bulk_purge(p_owner_id UUID, p_file_ids UUID[], p_folder_ids UUID[])
+RETURNS JSON
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    roots UUID[];
+    tree UUID[];
+    owned_files UUID[];
+    paths TEXT[];
+BEGIN
+    SELECT array_agg(id) INTO roots FROM folders WHERE owner_id = p_owner_id AND id = ANY(p_folder_ids);
+    SELECT array_agg(DISTINCT s.id) INTO tree FROM unnest(roots) AS r(id), folder_subtree(r.id, p_owner_id) s;
+    SELECT array_agg(id) INTO owned_files FROM files WHERE owner_id = p_owner_id AND id = ANY(p_file_ids);
+
+    WITH deleted AS (
+        DELETE FROM files
+        WHERE owner_id = p_owner_id AND (id = ANY(owned_files) OR folder_id = ANY(tree))
+        RETURNING storage_path
+    )
+    SELECT array_agg(deleted.storage_path) INTO paths FROM deleted;
+
+    DELETE FROM folders WHERE id = ANY(tree);
+
+    RETURN json_build_object(
+        'files', to_json(COALESCE(owned_files, '{}')),
+        'folders', to_json(COALESCE(roots, '{}')),
+        'storage_paths', to_json(COALESCE(paths, '{}'))
+    );
+END;
+$$;
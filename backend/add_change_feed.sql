@@ -0,0 +1,161 @@
+-- SQL script for the per-user change feed behind GET /changes
+-- Run these commands in your Supabase SQL editor after add_folder_paths.sql
+--
+-- Every insert or update of a file or folder stamps the row with the owner's
+-- next change sequence number, and every delete leaves a tombstone stamped the
+-- same way, so "what changed since N" is an index range scan rather than a
+-- re-listing. A transaction takes one number per user and reuses it for all
+-- the rows it touches. Taking it locks the user's counter row until commit,
+-- so for each user the numbers become visible in order: a reader that has
+-- seen N will never later find a commit numbered N or below.
+
+CREATE TABLE IF NOT EXISTS change_counters (
+    owner_id UUID PRIMARY KEY,
+    seq BIGINT NOT NULL DEFAULT 0,
+    -- Tombstones up to here have been pruned; older cursors must re-list
+    pruned_seq BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS change_tombstones (
+    owner_id UUID NOT NULL,
+    change_seq BIGINT NOT NULL,
+    kind TEXT NOT NULL CHECK (kind IN ('file', 'folder')),
+    id UUID NOT NULL,
+    deleted_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (owner_id, change_seq, kind, id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_change_tombstones_owner_deleted ON change_tombstones(owner_id, deleted_at);
+
+ALTER TABLE files ADD COLUMN IF NOT EXISTS change_seq BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE folders ADD COLUMN IF NOT EXISTS change_seq BIGINT NOT NULL DEFAULT 0;
+
+CREATE INDEX IF NOT EXISTS idx_files_owner_change_seq ON files(owner_id, change_seq, id);
+CREATE INDEX IF NOT EXISTS idx_folders_owner_change_seq ON folders(owner_id, change_seq, id);
+
+-- The calling transaction's sequence number for p_owner_id, taken on first
+-- use and remembered in a transaction-local setting for the rows after it
+CREATE OR REPLACE FUNCTION next_change_seq(p_owner_id UUID)
+RETURNS BIGINT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_key TEXT := 'drive_changes.u' || replace(p_owner_id::TEXT, '-', '');
+    v_taken TEXT := current_setting(v_key, true);
+    v_xact TEXT := txid_current()::TEXT;
+    v_seq BIGINT;
+BEGIN
+    IF split_part(v_taken, ':', 1) = v_xact THEN
+        RETURN split_part(v_taken, ':', 2)::BIGINT;
+    END IF;
+
+    INSERT INTO change_counters AS c (owner_id, seq) VALUES (p_owner_id, 1)
+    ON CONFLICT (owner_id) DO UPDATE SET seq = c.seq + 1
+    RETURNING c.seq INTO v_seq;
+
+    PERFORM set_config(v_key, v_xact || ':' || v_seq, true);
+    RETURN v_seq;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION stamp_change_seq()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.change_seq := next_change_seq(NEW.owner_id);
+    RETURN NEW;
+END;
+$$;
+
+-- Tombstones for deleted rows (TG_ARGV[0] is 'file' or 'folder'). The owners'
+-- tombstones older than 30 days are pruned on the way and their horizon raised.
+CREATE OR REPLACE FUNCTION record_deletions()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO change_tombstones (owner_id, change_seq, kind, id)
+    SELECT o.owner_id, next_change_seq(o.owner_id), TG_ARGV[0], o.id FROM old_rows o;
+
+    WITH pruned AS (
+        DELETE FROM change_tombstones t
+        USING (SELECT DISTINCT owner_id FROM old_rows) o
+        WHERE t.owner_id = o.owner_id AND t.deleted_at < NOW() - INTERVAL '30 days'
+        RETURNING t.owner_id, t.change_seq
+    )
+    UPDATE change_counters c SET pruned_seq = GREATEST(c.pruned_seq, p.seq)
+    FROM (SELECT owner_id, max(change_seq) AS seq FROM pruned GROUP BY owner_id) p
+    WHERE c.owner_id = p.owner_id;
+
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS files_change_seq ON files;
+CREATE TRIGGER files_change_seq
+    BEFORE INSERT OR UPDATE ON files
+    FOR EACH ROW EXECUTE FUNCTION stamp_change_seq();
+
+DROP TRIGGER IF EXISTS folders_change_seq ON folders;
+CREATE TRIGGER folders_change_seq
+    BEFORE INSERT OR UPDATE ON folders
+    FOR EACH ROW EXECUTE FUNCTION stamp_change_seq();
+
+DROP TRIGGER IF EXISTS files_change_tombstones ON files;
+CREATE TRIGGER files_change_tombstones
+    AFTER DELETE ON files
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION record_deletions('file');
+
+DROP TRIGGER IF EXISTS folders_change_tombstones ON folders;
+CREATE TRIGGER folders_change_tombstones
+    AFTER DELETE ON folders
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION record_deletions('folder');
+
+-- Changes after the cursor (p_seq, p_kind, p_id) in (seq, type, id) order, at
+-- most p_limit of them. A NULL p_kind means everything numbered p_seq has been
+-- seen. Returns {"seq": latest number, "pruned_seq": horizon, "items": [...]},
+-- each item {"change_seq", "type", "id", "deleted", "item": row or null}.
+CREATE OR REPLACE FUNCTION get_changes(p_owner_id UUID, p_seq BIGINT, p_kind TEXT, p_id UUID, p_limit INTEGER)
+RETURNS JSON
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT json_build_object(
+        'seq', COALESCE(c.seq, 0),
+        'pruned_seq', COALESCE(c.pruned_seq, 0),
+        'items', COALESCE((
+            SELECT json_agg(u ORDER BY u.change_seq, u.type, u.id)
+            FROM (
+                SELECT * FROM (
+                    (SELECT f.change_seq, 'file' AS type, f.id, FALSE AS deleted, to_json(f) AS item
+                     FROM files f
+                     WHERE f.owner_id = p_owner_id AND f.change_seq >= p_seq
+                       AND (f.change_seq > p_seq OR (p_kind IS NOT NULL AND ('file', f.id) > (p_kind, p_id)))
+                     ORDER BY f.change_seq, f.id
+                     LIMIT p_limit)
+                    UNION ALL
+                    (SELECT d.change_seq, 'folder', d.id, FALSE, to_json(d)
+                     FROM folders d
+                     WHERE d.owner_id = p_owner_id AND d.change_seq >= p_seq
+                       AND (d.change_seq > p_seq OR (p_kind IS NOT NULL AND ('folder', d.id) > (p_kind, p_id)))
+                     ORDER BY d.change_seq, d.id
+                     LIMIT p_limit)
+                    UNION ALL
+                    (SELECT t.change_seq, t.kind, t.id, TRUE, NULL
+                     FROM change_tombstones t
+                     WHERE t.owner_id = p_owner_id AND t.change_seq >= p_seq
+                       AND (t.change_seq > p_seq OR (p_kind IS NOT NULL AND (t.kind, t.id) > (p_kind, p_id)))
+                     ORDER BY t.change_seq, t.kind, t.id
+                     LIMIT p_limit)
+                ) merged
+                ORDER BY change_seq, type, id
+                LIMIT p_limit
+            ) u
+        ), '[]'::json)
+    )
+    FROM (SELECT p_owner_id AS owner_id) o
+    LEFT JOIN change_counters c ON c.owner_id = o.owner_id;
+$$;
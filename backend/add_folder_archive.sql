@@ -0,0 +1,30 @@
+-- SQL script for folder downloads
+-- Run these commands in your Supabase SQL editor after add_folder_paths.sql
+--
+-- The folders a ZIP of p_folder_id contains: the folder itself and every
+-- subfolder reached through parent_id without passing a trashed folder,
+-- parents before children. Files are then listed folder by folder through
+-- idx_files_owner_folder. One JSON array, so PostgREST's row limit does not
+-- truncate it; set_folder_path refuses cycles, so the walk always ends.
+CREATE OR REPLACE FUNCTION folder_archive_tree(p_folder_id UUID, p_owner_id UUID)
+RETURNS JSON
+LANGUAGE sql
+STABLE
+AS $$
+    WITH RECURSIVE tree AS (
+        SELECT f.id, f.parent_id, f.name, f.created_at, f.updated_at, 0 AS depth FROM folders f
+        WHERE f.id = p_folder_id AND f.owner_id = p_owner_id AND f.is_trashed IS NOT TRUE
+        UNION ALL
+        SELECT c.id, c.parent_id, c.name, c.created_at, c.updated_at, t.depth + 1 FROM folders c
+        JOIN tree t ON c.parent_id = t.id
+        WHERE c.owner_id = p_owner_id AND c.is_trashed IS NOT TRUE
+    )
+    SELECT COALESCE(
+        json_agg(json_build_object(
+            'id', id, 'parent_id', parent_id, 'name', name,
+            'created_at', created_at, 'updated_at', updated_at
+        ) ORDER BY depth, name),
+        '[]'::json
+    )
+    FROM tree;
+$$;
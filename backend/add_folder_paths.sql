@@ -0,0 +1,113 @@
+-- SQL script to maintain materialized folder paths
+-- Run these commands in your Supabase SQL editor after add_folder_subtree.sql
+
+-- Each folder stores the ids from its root down to itself: '/<root>/<child>/<self>/'.
+-- Ancestors come from splitting the path, and a subtree is every path with
+-- that prefix. Byte ("C") ordering makes the prefix an index range: since
+-- paths end in '/', the subtree of P is P <= path < P with '/' bumped to '0'.
+ALTER TABLE folders ADD COLUMN IF NOT EXISTS path TEXT COLLATE "C";
+
+-- Backfill existing rows top-down
+WITH RECURSIVE tree AS (
+    SELECT id, '/' || id::text || '/' AS path FROM folders WHERE parent_id IS NULL
+    UNION ALL
+    SELECT c.id, t.path || c.id::text || '/' FROM folders c JOIN tree t ON c.parent_id = t.id
+)
+UPDATE folders SET path = tree.path FROM tree WHERE folders.id = tree.id;
+
+CREATE INDEX IF NOT EXISTS idx_folders_owner_path ON folders(owner_id, path);
+
+-- Serialize path changes within one owner's tree until the transaction ends.
+-- Without it, two crossing moves (A into B while B goes into A) each read the
+-- other's old path, both pass the cycle check and together commit a cycle; an
+-- insert under a folder being moved could likewise keep the folder's old path.
+-- Functions that move folders call this before locking any rows, so the
+-- trigger below finds it already held instead of waiting on it with a row
+-- lock taken.
+CREATE OR REPLACE FUNCTION lock_folder_tree(p_owner_id UUID)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    SELECT pg_advisory_xact_lock(hashtext('folder_paths'), hashtext(p_owner_id::text));
+$$;
+
+-- Compute the path on insert and on move, refusing moves that would create a cycle
+CREATE OR REPLACE FUNCTION set_folder_path()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    parent_path TEXT;
+BEGIN
+    -- Taken before the parent's path is read, which then sees every move
+    -- committed ahead of this one
+    PERFORM lock_folder_tree(NEW.owner_id);
+
+    IF NEW.parent_id IS NULL THEN
+        NEW.path := '/' || NEW.id::text || '/';
+        RETURN NEW;
+    END IF;
+
+    SELECT path INTO parent_path FROM folders WHERE id = NEW.parent_id;
+    IF parent_path IS NULL THEN
+        RAISE EXCEPTION 'Parent folder % not found', NEW.parent_id USING ERRCODE = 'foreign_key_violation';
+    END IF;
+    IF TG_OP = 'UPDATE' AND starts_with(parent_path, OLD.path) THEN
+        RAISE EXCEPTION 'Cannot move folder % into its own subtree', NEW.id USING ERRCODE = 'check_violation';
+    END IF;
+
+    NEW.path := parent_path || NEW.id::text || '/';
+    RETURN NEW;
+END;
+$$;
+
+-- After a move, rewrite the path prefix of every descendant in one statement
+CREATE OR REPLACE FUNCTION move_folder_descendants()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF NEW.path IS DISTINCT FROM OLD.path THEN
+        UPDATE folders
+        SET path = NEW.path || substring(path FROM length(OLD.path) + 1)
+        WHERE owner_id = NEW.owner_id
+          AND path >= OLD.path AND path < left(OLD.path, -1) || '0'
+          AND id <> NEW.id;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS folders_set_path ON folders;
+CREATE TRIGGER folders_set_path
+    BEFORE INSERT OR UPDATE OF parent_id ON folders
+    FOR EACH ROW EXECUTE FUNCTION set_folder_path();
+
+DROP TRIGGER IF EXISTS folders_move_descendants ON folders;
+CREATE TRIGGER folders_move_descendants
+    AFTER UPDATE OF parent_id ON folders
+    FOR EACH ROW EXECUTE FUNCTION move_folder_descendants();
+
+-- A folder's ancestors from the root down to the folder itself, in one query
+CREATE OR REPLACE FUNCTION folder_ancestors(p_folder_id UUID, p_owner_id UUID)
+RETURNS SETOF folders
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT a.* FROM folders f
+    JOIN folders a ON a.id = ANY(string_to_array(trim(BOTH '/' FROM f.path), '/')::UUID[])
+    WHERE f.id = p_folder_id AND f.owner_id = p_owner_id AND a.owner_id = p_owner_id
+    ORDER BY length(a.path);
+$$;
+
+-- Subtrees are now a prefix scan instead of a recursive walk
+CREATE OR REPLACE FUNCTION folder_subtree(p_folder_id UUID, p_owner_id UUID)
+RETURNS TABLE (id UUID)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT d.id FROM folders f
+    JOIN folders d ON d.owner_id = f.owner_id
+        AND d.path >= f.path AND d.path < left(f.path, -1) || '0'
+    WHERE f.id = p_folder_id AND f.owner_id = p_owner_id;
+$$;
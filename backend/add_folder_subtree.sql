@@ -0,0 +1,129 @@
+-- SQL script for trashing, restoring and purging whole folder subtrees
+-- Run these commands in your Supabase SQL editor after add_blob_store.sql
+
+-- Subtree traversal follows parent_id whether or not rows are trashed
+CREATE INDEX IF NOT EXISTS idx_folders_owner_parent ON folders(owner_id, parent_id);
+CREATE INDEX IF NOT EXISTS idx_files_owner_folder ON files(owner_id, folder_id);
+
+-- A folder and all of its descendants, in one recursive query.
+-- UNION (not UNION ALL) stops at rows already visited, so a parent_id cycle
+-- cannot make it loop.
+CREATE OR REPLACE FUNCTION folder_subtree(p_folder_id UUID, p_owner_id UUID)
+RETURNS TABLE (id UUID)
+LANGUAGE sql
+STABLE
+AS $$
+    WITH RECURSIVE tree AS (
+        SELECT f.id FROM folders f
+        WHERE f.id = p_folder_id AND f.owner_id = p_owner_id
+        UNION
+        SELECT c.id FROM folders c
+        JOIN tree t ON c.parent_id = t.id
+        WHERE c.owner_id = p_owner_id
+    )
+    SELECT tree.id FROM tree;
+$$;
+
+-- Move a folder, its subfolders and their files to the trash.
+-- Everything is stamped with the same trashed_at; items that were already in
+-- the trash keep their own stamp, so restoring this folder leaves them there.
+-- Returns {"folders": n, "files": n} with the number of rows trashed.
+CREATE OR REPLACE FUNCTION trash_folder_tree(p_folder_id UUID, p_owner_id UUID)
+RETURNS JSON
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    ids UUID[];
+    stamp TIMESTAMP WITH TIME ZONE := NOW();
+    folder_count INTEGER;
+    file_count INTEGER;
+BEGIN
+    SELECT array_agg(t.id) INTO ids FROM folder_subtree(p_folder_id, p_owner_id) t;
+
+    UPDATE folders SET is_trashed = TRUE, trashed_at = stamp, updated_at = stamp
+    WHERE id = ANY(ids) AND is_trashed IS NOT TRUE;
+    GET DIAGNOSTICS folder_count = ROW_COUNT;
+
+    UPDATE files SET is_trashed = TRUE, trashed_at = stamp, updated_at = stamp
+    WHERE owner_id = p_owner_id AND folder_id = ANY(ids) AND is_trashed IS NOT TRUE;
+    GET DIAGNOSTICS file_count = ROW_COUNT;
+
+    RETURN json_build_object('folders', folder_count, 'files', file_count);
+END;
+$$;
+
+-- Restore a trashed folder together with everything that was trashed with it.
+-- Returns {"folders": n, "files": n} with the number of rows restored.
+CREATE OR REPLACE FUNCTION restore_folder_tree(p_folder_id UUID, p_owner_id UUID)
+RETURNS JSON
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    ids UUID[];
+    stamp TIMESTAMP WITH TIME ZONE;
+    folder_count INTEGER;
+    file_count INTEGER;
+BEGIN
+    SELECT trashed_at INTO stamp FROM folders
+    WHERE id = p_folder_id AND owner_id = p_owner_id AND is_trashed = TRUE;
+
+    SELECT array_agg(t.id) INTO ids FROM folder_subtree(p_folder_id, p_owner_id) t;
+
+    UPDATE folders SET is_trashed = FALSE, trashed_at = NULL, updated_at = NOW()
+    WHERE id = ANY(ids) AND is_trashed = TRUE
+      AND (id = p_folder_id OR trashed_at IS NOT DISTINCT FROM stamp);
+    GET DIAGNOSTICS folder_count = ROW_COUNT;
+
+    UPDATE files SET is_trashed = FALSE, trashed_at = NULL, updated_at = NOW()
+    WHERE owner_id = p_owner_id AND folder_id = ANY(ids) AND is_trashed = TRUE
+      AND trashed_at IS NOT DISTINCT FROM stamp;
+    GET DIAGNOSTICS file_count = ROW_COUNT;
+
+    RETURN json_build_object('folders', folder_count, 'files', file_count);
+END;
+$$;
+
+-- Delete a folder subtree and all files in it.
+-- Returns the storage paths of the deleted files (as one array, so PostgREST's
+-- row limit does not truncate it) for the caller to release.
+CREATE OR REPLACE FUNCTION purge_folder_tree(p_folder_id UUID, p_owner_id UUID)
+RETURNS TEXT[]
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    ids UUID[];
+    paths TEXT[];
+BEGIN
+    SELECT array_agg(t.id) INTO ids FROM folder_subtree(p_folder_id, p_owner_id) t;
+
+    WITH deleted AS (
+        DELETE FROM files
+        WHERE owner_id = p_owner_id AND folder_id = ANY(ids)
+        RETURNING storage_path
+    )
+    SELECT array_agg(deleted.storage_path) INTO paths FROM deleted;
+
+    -- Foreign keys are checked at the end of the statement, so parents and
+    -- children can go together
+    DELETE FROM folders WHERE id = ANY(ids);
+
+    RETURN COALESCE(paths, '{}');
+END;
+$$;
+
+-- Batched release_blob: drop one reference per occurrence of each digest.
+-- Returns the digests that are no longer referenced, which the caller unlinks.
+CREATE OR REPLACE FUNCTION release_blobs(p_digests TEXT[])
+RETURNS TEXT[]
+LANGUAGE sql
+AS $$
+    WITH released AS (
+        UPDATE blobs
+        SET ref_count = GREATEST(blobs.ref_count - r.n, 0),
+            deleting_since = CASE WHEN blobs.ref_count <= r.n THEN NOW() ELSE blobs.deleting_since END
+        FROM (SELECT d AS digest, COUNT(*) AS n FROM unnest(p_digests) AS d GROUP BY d) r
+        WHERE blobs.digest = r.digest
+        RETURNING blobs.digest, blobs.ref_count
+    )
+    SELECT COALESCE(array_agg(digest), '{}') FROM released WHERE ref_count = 0;
+$$;
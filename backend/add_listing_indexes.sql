@@ -0,0 +1,44 @@
+-- SQL script to support keyset (cursor) pagination on listing endpoints
+-- Run these commands in your Supabase SQL editor
+
+-- Folder contents, by each sortable column (id breaks ties)
+CREATE INDEX IF NOT EXISTS idx_files_folder_name ON files(owner_id, folder_id, name, id) WHERE is_trashed = FALSE;
+CREATE INDEX IF NOT EXISTS idx_files_folder_updated ON files(owner_id, folder_id, updated_at, id) WHERE is_trashed = FALSE;
+CREATE INDEX IF NOT EXISTS idx_files_folder_size ON files(owner_id, folder_id, size, id) WHERE is_trashed = FALSE;
+CREATE INDEX IF NOT EXISTS idx_folders_parent_name ON folders(owner_id, parent_id, name, id) WHERE is_trashed = FALSE;
+CREATE INDEX IF NOT EXISTS idx_folders_parent_updated ON folders(owner_id, parent_id, updated_at, id) WHERE is_trashed = FALSE;
+
+-- Recent, starred and trash views
+CREATE INDEX IF NOT EXISTS idx_files_owner_updated ON files(owner_id, is_trashed, updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_folders_owner_updated ON folders(owner_id, is_trashed, updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_files_owner_starred ON files(owner_id, name, id) WHERE is_starred = TRUE AND is_trashed = FALSE;
+CREATE INDEX IF NOT EXISTS idx_folders_owner_starred ON folders(owner_id, name, id) WHERE is_starred = TRUE AND is_trashed = FALSE;
+
+-- Root listings filter on folder_id/parent_id IS NULL, which the indexes above
+-- can match but can't return in sort order, so the root gets its own
+CREATE INDEX IF NOT EXISTS idx_files_root_name ON files(owner_id, name, id) WHERE folder_id IS NULL AND is_trashed = FALSE;
+CREATE INDEX IF NOT EXISTS idx_files_root_updated ON files(owner_id, updated_at, id) WHERE folder_id IS NULL AND is_trashed = FALSE;
+CREATE INDEX IF NOT EXISTS idx_files_root_size ON files(owner_id, size, id) WHERE folder_id IS NULL AND is_trashed = FALSE;
+CREATE INDEX IF NOT EXISTS idx_folders_root_name ON folders(owner_id, name, id) WHERE parent_id IS NULL AND is_trashed = FALSE;
+CREATE INDEX IF NOT EXISTS idx_folders_root_updated ON folders(owner_id, updated_at, id) WHERE parent_id IS NULL AND is_trashed = FALSE;
+
+-- Descending pages are these indexes scanned backwards. That only matches
+-- "ORDER BY col DESC, id DESC" when col can't be NULL: with NULLs allowed the
+-- listings would need NULLS LAST, which a backward scan doesn't produce. Rows
+-- never written since creation get their creation time (and show up once in
+-- /changes as updated). Safe to run again.
+UPDATE files SET created_at = COALESCE(created_at, NOW()) WHERE created_at IS NULL;
+UPDATE files SET updated_at = created_at WHERE updated_at IS NULL;
+ALTER TABLE files
+    ALTER COLUMN created_at SET DEFAULT NOW(),
+    ALTER COLUMN created_at SET NOT NULL,
+    ALTER COLUMN updated_at SET DEFAULT NOW(),
+    ALTER COLUMN updated_at SET NOT NULL;
+
+UPDATE folders SET created_at = COALESCE(created_at, NOW()) WHERE created_at IS NULL;
+UPDATE folders SET updated_at = created_at WHERE updated_at IS NULL;
+ALTER TABLE folders
+    ALTER COLUMN created_at SET DEFAULT NOW(),
+    ALTER COLUMN created_at SET NOT NULL,
+    ALTER COLUMN updated_at SET DEFAULT NOW(),
+    ALTER COLUMN updated_at SET NOT NULL;
@@ -0,0 +1,117 @@
+-- SQL script for listing ETags (conditional GET on the listing endpoints)
+-- Run these commands in your Supabase SQL editor after add_change_feed.sql
+--
+-- Every listing belongs to a scope: a folder's contents ('folder:<id>', or
+-- 'folder:root'), or one of the 'starred', 'trash' and 'recent' views. Each
+-- statement writing files or folders sets the version of every scope whose
+-- listing its rows were or are shown in to the transaction's change number
+-- (see add_change_feed.sql), so a scope's version changes exactly when its
+-- listing may have. Versions come from the owner's change counter, so they
+-- never repeat, even for a scope whose row is recreated.
+
+CREATE TABLE IF NOT EXISTS listing_versions (
+    owner_id UUID NOT NULL,
+    scope TEXT NOT NULL,
+    version BIGINT NOT NULL,
+    PRIMARY KEY (owner_id, scope)
+);
+
+-- The scopes whose listings show a row in this state. A folder's own
+-- contents listing includes the folder itself.
+CREATE OR REPLACE FUNCTION listing_scopes(p_kind TEXT, p_id UUID, p_parent_id UUID, p_is_starred BOOLEAN, p_is_trashed BOOLEAN)
+RETURNS TEXT[]
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT array_remove(ARRAY[
+        'folder:' || COALESCE(p_parent_id::TEXT, 'root'),
+        CASE WHEN p_kind = 'folder' THEN 'folder:' || p_id END,
+        CASE WHEN COALESCE(p_is_starred, FALSE) AND NOT COALESCE(p_is_trashed, FALSE) THEN 'starred' END,
+        CASE WHEN COALESCE(p_is_trashed, FALSE) THEN 'trash' END,
+        CASE WHEN NOT COALESCE(p_is_trashed, FALSE) THEN 'recent' END
+    ], NULL);
+$$;
+
+-- Set each (owner, scope) pair's version to the owner's change number
+CREATE OR REPLACE FUNCTION set_listing_versions(p_owner_ids UUID[], p_scopes TEXT[])
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    INSERT INTO listing_versions AS v (owner_id, scope, version)
+    SELECT t.owner_id, t.scope, next_change_seq(t.owner_id)
+    FROM (SELECT DISTINCT * FROM unnest(p_owner_ids, p_scopes) AS u(owner_id, scope)) t
+    ON CONFLICT (owner_id, scope) DO UPDATE SET version = EXCLUDED.version;
+$$;
+
+-- Statement-level, so a statement touching thousands of rows sets each of
+-- their scopes once. Rows count both before and after the change.
+CREATE OR REPLACE FUNCTION bump_file_listing_versions()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        PERFORM set_listing_versions(array_agg(s.owner_id), array_agg(s.scope))
+        FROM (SELECT DISTINCT r.owner_id, unnest(listing_scopes('file', r.id, r.folder_id, r.is_starred, r.is_trashed)) AS scope FROM old_rows r) s;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        PERFORM set_listing_versions(array_agg(s.owner_id), array_agg(s.scope))
+        FROM (SELECT DISTINCT r.owner_id, unnest(listing_scopes('file', r.id, r.folder_id, r.is_starred, r.is_trashed)) AS scope FROM new_rows r) s;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION bump_folder_listing_versions()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        PERFORM set_listing_versions(array_agg(s.owner_id), array_agg(s.scope))
+        FROM (SELECT DISTINCT r.owner_id, unnest(listing_scopes('folder', r.id, r.parent_id, r.is_starred, r.is_trashed)) AS scope FROM old_rows r) s;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        PERFORM set_listing_versions(array_agg(s.owner_id), array_agg(s.scope))
+        FROM (SELECT DISTINCT r.owner_id, unnest(listing_scopes('folder', r.id, r.parent_id, r.is_starred, r.is_trashed)) AS scope FROM new_rows r) s;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Triggers with transition tables take one event each
+DROP TRIGGER IF EXISTS files_listing_versions_insert ON files;
+CREATE TRIGGER files_listing_versions_insert
+    AFTER INSERT ON files
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_file_listing_versions();
+
+DROP TRIGGER IF EXISTS files_listing_versions_update ON files;
+CREATE TRIGGER files_listing_versions_update
+    AFTER UPDATE ON files
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_file_listing_versions();
+
+DROP TRIGGER IF EXISTS files_listing_versions_delete ON files;
+CREATE TRIGGER files_listing_versions_delete
+    AFTER DELETE ON files
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_file_listing_versions();
+
+DROP TRIGGER IF EXISTS folders_listing_versions_insert ON folders;
+CREATE TRIGGER folders_listing_versions_insert
+    AFTER INSERT ON folders
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_folder_listing_versions();
+
+DROP TRIGGER IF EXISTS folders_listing_versions_update ON folders;
+CREATE TRIGGER folders_listing_versions_update
+    AFTER UPDATE ON folders
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_folder_listing_versions();
+
+DROP TRIGGER IF EXISTS folders_listing_versions_delete ON folders;
+CREATE TRIGGER folders_listing_versions_delete
+    AFTER DELETE ON folders
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_folder_listing_versions();
@@ -0,0 +1,86 @@
+-- SQL script for refresh-token sessions
+-- Run these commands in your Supabase SQL editor
+--
+-- A refresh token is "<session id>.<secret>". Each login session is one row
+-- however often its token is rotated: only the SHA-256 of the current secret
+-- and of the one it replaced are kept. Deleting the row revokes the session.
+
+CREATE TABLE IF NOT EXISTS refresh_sessions (
+    id UUID PRIMARY KEY,
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    token_hash BYTEA NOT NULL,
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+ALTER TABLE refresh_sessions ADD COLUMN IF NOT EXISTS previous_token_hash BYTEA;
+ALTER TABLE refresh_sessions ADD COLUMN IF NOT EXISTS rotated_at TIMESTAMP WITH TIME ZONE;
+
+CREATE INDEX IF NOT EXISTS idx_refresh_sessions_user_id ON refresh_sessions(user_id);
+
+-- Start a session at login, clearing the user's lapsed ones on the way.
+-- Hashes are passed as hex.
+CREATE OR REPLACE FUNCTION create_refresh_session(p_session_id UUID, p_user_id UUID, p_token_hash TEXT, p_expires_at TIMESTAMPTZ)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    DELETE FROM refresh_sessions WHERE user_id = p_user_id AND expires_at <= NOW();
+    INSERT INTO refresh_sessions (id, user_id, token_hash, expires_at)
+    VALUES (p_session_id, p_user_id, decode(p_token_hash, 'hex'), p_expires_at);
+$$;
+
+-- Swap the session's current token for a new one and return its user (id,
+-- email, is_active), or no row when the token is not the current one.
+--
+-- The new token is derived from the old one (see auth_utils), so the token
+-- just replaced coming back within p_grace_seconds, with the same new hash,
+-- is a concurrent refresh that lost the race: it gets the same user, and the
+-- caller hands out the same new token. Coming back later means the chain may
+-- have leaked, so that ends the session for whoever holds the newer token as
+-- well. A secret the session never issued changes nothing, so a session id
+-- alone can't be used to revoke it.
+DROP FUNCTION IF EXISTS rotate_refresh_session(UUID, TEXT, TEXT, TIMESTAMPTZ);
+CREATE OR REPLACE FUNCTION rotate_refresh_session(p_session_id UUID, p_token_hash TEXT, p_new_token_hash TEXT, p_expires_at TIMESTAMPTZ, p_grace_seconds DOUBLE PRECISION)
+RETURNS TABLE (id UUID, email TEXT, is_active BOOLEAN)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_user_id UUID;
+BEGIN
+    UPDATE refresh_sessions s
+    SET previous_token_hash = s.token_hash,
+        token_hash = decode(p_new_token_hash, 'hex'),
+        rotated_at = NOW(),
+        expires_at = p_expires_at
+    WHERE s.id = p_session_id
+      AND s.token_hash = decode(p_token_hash, 'hex')
+      AND s.expires_at > NOW()
+    RETURNING s.user_id INTO v_user_id;
+
+    IF v_user_id IS NULL THEN
+        SELECT s.user_id INTO v_user_id
+        FROM refresh_sessions s
+        WHERE s.id = p_session_id
+          AND s.previous_token_hash = decode(p_token_hash, 'hex')
+          AND s.token_hash = decode(p_new_token_hash, 'hex')
+          AND s.rotated_at > NOW() - make_interval(secs => p_grace_seconds)
+          AND s.expires_at > NOW();
+    END IF;
+
+    IF v_user_id IS NULL THEN
+        DELETE FROM refresh_sessions s
+        WHERE s.id = p_session_id AND s.previous_token_hash = decode(p_token_hash, 'hex');
+        RETURN;
+    END IF;
+
+    RETURN QUERY SELECT u.id, u.email::TEXT, u.is_active FROM users u WHERE u.id = v_user_id;
+END;
+$$;
+
+-- Logout: end the session the token belongs to
+CREATE OR REPLACE FUNCTION revoke_refresh_session(p_session_id UUID, p_token_hash TEXT)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    DELETE FROM refresh_sessions WHERE id = p_session_id AND token_hash = decode(p_token_hash, 'hex');
+$$;
@@ -0,0 +1,100 @@
+-- SQL script to enable name search over files and folders
+-- Run these commands in your Supabase SQL editor
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+-- Lets the trigram indexes lead with owner_id
+CREATE EXTENSION IF NOT EXISTS btree_gin;
+
+-- Substring matches (LIKE '%term%') use the trigram indexes, prefix matches
+-- (LIKE 'term%') the btree ones; both are scoped to one owner's live items
+CREATE INDEX IF NOT EXISTS idx_files_name_trgm ON files USING gin (owner_id, lower(name) gin_trgm_ops) WHERE is_trashed = FALSE;
+CREATE INDEX IF NOT EXISTS idx_folders_name_trgm ON folders USING gin (owner_id, lower(name) gin_trgm_ops) WHERE is_trashed = FALSE;
+CREATE INDEX IF NOT EXISTS idx_files_name_prefix ON files(owner_id, lower(name) text_pattern_ops) WHERE is_trashed = FALSE;
+CREATE INDEX IF NOT EXISTS idx_folders_name_prefix ON folders(owner_id, lower(name) text_pattern_ops) WHERE is_trashed = FALSE;
+
+-- Ranked search over a user's files and folders.
+--
+-- Names equal to the query rank first, then names starting with it, then
+-- other substring matches; trigram similarity orders matches within a tier.
+-- Queries shorter than three characters have no trigrams to look up, so
+-- they are matched as prefixes. File-only filters (mime type, size) exclude
+-- folders. Results are keyset-paginated on (score DESC, id) via p_after_*.
+CREATE OR REPLACE FUNCTION search_items(
+    p_owner_id UUID,
+    p_query TEXT,
+    p_prefix BOOLEAN DEFAULT FALSE,
+    p_kind TEXT DEFAULT NULL,
+    p_mime_type TEXT DEFAULT NULL,
+    p_min_size BIGINT DEFAULT NULL,
+    p_max_size BIGINT DEFAULT NULL,
+    p_modified_after TIMESTAMP WITH TIME ZONE DEFAULT NULL,
+    p_modified_before TIMESTAMP WITH TIME ZONE DEFAULT NULL,
+    p_after_score NUMERIC DEFAULT NULL,
+    p_after_id UUID DEFAULT NULL,
+    p_limit INTEGER DEFAULT 100
+)
+RETURNS TABLE (
+    kind TEXT,
+    id UUID,
+    name TEXT,
+    mime_type TEXT,
+    size BIGINT,
+    parent_id UUID,
+    is_starred BOOLEAN,
+    created_at TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE,
+    score NUMERIC
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    term TEXT := lower(p_query);
+    escaped TEXT := replace(replace(replace(lower(p_query), '\', '\\'), '%', '\%'), '_', '\_');
+    prefix_pattern TEXT := escaped || '%';
+    pattern TEXT;
+BEGIN
+    IF p_prefix OR length(term) < 3 THEN
+        pattern := prefix_pattern;
+    ELSE
+        pattern := '%' || escaped || '%';
+    END IF;
+
+    -- EXECUTE plans with the actual parameter values, so the pattern's shape
+    -- picks the matching index and unused filters fold away
+    RETURN QUERY EXECUTE $sql$
+        SELECT * FROM (
+            SELECT
+                'file'::TEXT AS kind, f.id, f.name::TEXT, f.mime_type::TEXT, f.size::BIGINT,
+                f.folder_id AS parent_id, f.is_starred, f.created_at, f.updated_at,
+                round((CASE WHEN lower(f.name) = $3 THEN 3 WHEN lower(f.name) LIKE $4 THEN 2 ELSE 1 END
+                       + similarity(lower(f.name), $3))::NUMERIC, 6) AS score
+            FROM files f
+            WHERE f.owner_id = $1 AND f.is_trashed = FALSE AND lower(f.name) LIKE $2
+              AND ($5::TEXT IS NULL OR $5 = 'file')
+              AND ($6::TEXT IS NULL OR f.mime_type = $6 OR (right($6, 1) = '/' AND f.mime_type LIKE $6 || '%'))
+              AND ($7::BIGINT IS NULL OR f.size >= $7)
+              AND ($8::BIGINT IS NULL OR f.size <= $8)
+              AND ($9::TIMESTAMPTZ IS NULL OR COALESCE(f.updated_at, f.created_at) >= $9)
+              AND ($10::TIMESTAMPTZ IS NULL OR COALESCE(f.updated_at, f.created_at) < $10)
+            UNION ALL
+            SELECT
+                'folder'::TEXT, d.id, d.name::TEXT, NULL::TEXT, NULL::BIGINT,
+                d.parent_id, d.is_starred, d.created_at, d.updated_at,
+                round((CASE WHEN lower(d.name) = $3 THEN 3 WHEN lower(d.name) LIKE $4 THEN 2 ELSE 1 END
+                       + similarity(lower(d.name), $3))::NUMERIC, 6)
+            FROM folders d
+            WHERE d.owner_id = $1 AND d.is_trashed = FALSE AND lower(d.name) LIKE $2
+              AND ($5::TEXT IS NULL OR $5 = 'folder')
+              AND $6::TEXT IS NULL AND $7::BIGINT IS NULL AND $8::BIGINT IS NULL
+              AND ($9::TIMESTAMPTZ IS NULL OR COALESCE(d.updated_at, d.created_at) >= $9)
+              AND ($10::TIMESTAMPTZ IS NULL OR COALESCE(d.updated_at, d.created_at) < $10)
+        ) results
+        WHERE $11::NUMERIC IS NULL OR results.score < $11 OR (results.score = $11 AND results.id > $12)
+        ORDER BY results.score DESC, results.id
+        LIMIT $13
+    $sql$
+    USING p_owner_id, pattern, term, prefix_pattern, p_kind, p_mime_type, p_min_size, p_max_size,
+          p_modified_after, p_modified_before, p_after_score, p_after_id, p_limit;
+END;
+$$;
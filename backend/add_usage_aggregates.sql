@@ -0,0 +1,289 @@
+-- SQL script for storage usage aggregates and quotas
+-- Run these commands in your Supabase SQL editor after add_folder_paths.sql
+--
+-- Usage is kept up to date by statement-level triggers on files and folders,
+-- so every write path (uploads, trash, restore, permanent and bulk deletes,
+-- moves) adjusts the totals by the rows it changed, in the same transaction,
+-- and reading usage never scans files.
+--
+--   user_usage          all of a user's files, with the trashed share
+--   user_usage_by_type  live (not trashed) files per mime type
+--   folder_usage        live files directly in a folder, and in its whole subtree
+
+-- Optional per-user quota in bytes; NULL falls back to STORAGE_QUOTA_BYTES
+ALTER TABLE users ADD COLUMN IF NOT EXISTS storage_quota BIGINT;
+
+CREATE TABLE IF NOT EXISTS user_usage (
+    owner_id UUID PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    total_bytes BIGINT NOT NULL DEFAULT 0,
+    file_count BIGINT NOT NULL DEFAULT 0,
+    trashed_bytes BIGINT NOT NULL DEFAULT 0,
+    trashed_file_count BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS user_usage_by_type (
+    owner_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    mime_type TEXT NOT NULL,
+    bytes BIGINT NOT NULL DEFAULT 0,
+    file_count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (owner_id, mime_type)
+);
+
+CREATE TABLE IF NOT EXISTS folder_usage (
+    folder_id UUID PRIMARY KEY REFERENCES folders(id) ON DELETE CASCADE,
+    bytes BIGINT NOT NULL DEFAULT 0,
+    file_count BIGINT NOT NULL DEFAULT 0,
+    total_bytes BIGINT NOT NULL DEFAULT 0,
+    total_file_count BIGINT NOT NULL DEFAULT 0
+);
+
+-- One file row entering (+1) or leaving (-1) the totals
+DO $$
+BEGIN
+    CREATE TYPE file_usage_change AS (
+        owner_id UUID,
+        folder_id UUID,
+        mime_type TEXT,
+        size BIGINT,
+        is_trashed BOOLEAN,
+        sign INTEGER
+    );
+EXCEPTION WHEN duplicate_object THEN NULL;
+END;
+$$;
+
+-- Apply a statement's file changes, grouped so each aggregate row is written
+-- once. Rows are written in key order to keep concurrent writers from
+-- deadlocking on each other's rows.
+CREATE OR REPLACE FUNCTION apply_file_usage(changes file_usage_change[])
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    INSERT INTO user_usage AS u (owner_id, total_bytes, file_count, trashed_bytes, trashed_file_count)
+    SELECT owner_id, SUM(sign * size), SUM(sign),
+           COALESCE(SUM(sign * size) FILTER (WHERE is_trashed), 0),
+           COALESCE(SUM(sign) FILTER (WHERE is_trashed), 0)
+    FROM unnest(changes)
+    GROUP BY owner_id
+    ORDER BY owner_id
+    ON CONFLICT (owner_id) DO UPDATE SET
+        total_bytes = u.total_bytes + EXCLUDED.total_bytes,
+        file_count = u.file_count + EXCLUDED.file_count,
+        trashed_bytes = u.trashed_bytes + EXCLUDED.trashed_bytes,
+        trashed_file_count = u.trashed_file_count + EXCLUDED.trashed_file_count;
+
+    INSERT INTO user_usage_by_type AS t (owner_id, mime_type, bytes, file_count)
+    SELECT owner_id, mime_type, SUM(sign * size), SUM(sign)
+    FROM unnest(changes)
+    WHERE NOT is_trashed
+    GROUP BY owner_id, mime_type
+    HAVING SUM(sign) <> 0 OR SUM(sign * size) <> 0
+    ORDER BY owner_id, mime_type
+    ON CONFLICT (owner_id, mime_type) DO UPDATE SET
+        bytes = t.bytes + EXCLUDED.bytes,
+        file_count = t.file_count + EXCLUDED.file_count;
+
+    -- Direct totals on the file's folder, subtree totals on the folder and
+    -- every ancestor listed in its path
+    INSERT INTO folder_usage AS f (folder_id, bytes, file_count, total_bytes, total_file_count)
+    SELECT a.id,
+           COALESCE(SUM(c.sign * c.size) FILTER (WHERE a.id = c.folder_id), 0),
+           COALESCE(SUM(c.sign) FILTER (WHERE a.id = c.folder_id), 0),
+           SUM(c.sign * c.size),
+           SUM(c.sign)
+    FROM unnest(changes) c
+    JOIN folders d ON d.id = c.folder_id
+    CROSS JOIN LATERAL unnest(string_to_array(trim(BOTH '/' FROM d.path), '/')::UUID[]) AS a(id)
+    WHERE NOT c.is_trashed
+    GROUP BY a.id
+    HAVING SUM(c.sign) <> 0 OR SUM(c.sign * c.size) <> 0 OR bool_or(a.id = c.folder_id)
+    ORDER BY a.id
+    ON CONFLICT (folder_id) DO UPDATE SET
+        bytes = f.bytes + EXCLUDED.bytes,
+        file_count = f.file_count + EXCLUDED.file_count,
+        total_bytes = f.total_bytes + EXCLUDED.total_bytes,
+        total_file_count = f.total_file_count + EXCLUDED.total_file_count;
+$$;
+
+-- Shared by the insert, update and delete triggers on files (a trigger with
+-- transition tables can only watch one event)
+CREATE OR REPLACE FUNCTION track_file_usage()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    changes file_usage_change[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        changes := ARRAY(
+            SELECT ROW(n.owner_id, n.folder_id, n.mime_type, n.size, COALESCE(n.is_trashed, FALSE), 1)::file_usage_change
+            FROM new_rows n
+        );
+    ELSIF TG_OP = 'DELETE' THEN
+        changes := ARRAY(
+            SELECT ROW(o.owner_id, o.folder_id, o.mime_type, o.size, COALESCE(o.is_trashed, FALSE), -1)::file_usage_change
+            FROM old_rows o
+        );
+    ELSE
+        -- Only rows whose size, place, type or trash state changed; renames
+        -- and star toggles leave usage alone
+        changes := ARRAY(
+            SELECT c.change
+            FROM old_rows o
+            JOIN new_rows n ON n.id = o.id
+            CROSS JOIN LATERAL (VALUES
+                (ROW(o.owner_id, o.folder_id, o.mime_type, o.size, COALESCE(o.is_trashed, FALSE), -1)::file_usage_change),
+                (ROW(n.owner_id, n.folder_id, n.mime_type, n.size, COALESCE(n.is_trashed, FALSE), 1)::file_usage_change)
+            ) AS c(change)
+            WHERE (o.owner_id, o.folder_id, o.mime_type, o.size, COALESCE(o.is_trashed, FALSE))
+                  IS DISTINCT FROM (n.owner_id, n.folder_id, n.mime_type, n.size, COALESCE(n.is_trashed, FALSE))
+        );
+    END IF;
+
+    IF cardinality(changes) > 0 THEN
+        PERFORM apply_file_usage(changes);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS files_usage_insert ON files;
+CREATE TRIGGER files_usage_insert
+    AFTER INSERT ON files
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION track_file_usage();
+
+DROP TRIGGER IF EXISTS files_usage_update ON files;
+CREATE TRIGGER files_usage_update
+    AFTER UPDATE ON files
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION track_file_usage();
+
+DROP TRIGGER IF EXISTS files_usage_delete ON files;
+CREATE TRIGGER files_usage_delete
+    AFTER DELETE ON files
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION track_file_usage();
+
+-- When a folder's path changes, its direct totals leave the subtree totals
+-- of its old ancestors and join those of its new ones. A move rewrites the
+-- path of every descendant too (move_folder_descendants), and each of those
+-- rows moves its own direct totals the same way, so the whole subtree is
+-- accounted for whatever order the rows are updated in.
+CREATE OR REPLACE FUNCTION track_folder_usage()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO folder_usage AS f (folder_id, total_bytes, total_file_count)
+    SELECT a.id, SUM(a.sign * u.bytes), SUM(a.sign * u.file_count)
+    FROM old_rows o
+    JOIN new_rows n ON n.id = o.id
+    JOIN folder_usage u ON u.folder_id = n.id
+    CROSS JOIN LATERAL (
+        SELECT x, -1 FROM unnest(string_to_array(trim(BOTH '/' FROM o.path), '/')::UUID[]) AS x
+        UNION ALL
+        SELECT x, 1 FROM unnest(string_to_array(trim(BOTH '/' FROM n.path), '/')::UUID[]) AS x
+    ) AS a(id, sign)
+    WHERE o.path IS DISTINCT FROM n.path AND (u.bytes <> 0 OR u.file_count <> 0)
+    GROUP BY a.id
+    HAVING SUM(a.sign * u.bytes) <> 0 OR SUM(a.sign * u.file_count) <> 0
+    ORDER BY a.id
+    ON CONFLICT (folder_id) DO UPDATE SET
+        total_bytes = f.total_bytes + EXCLUDED.total_bytes,
+        total_file_count = f.total_file_count + EXCLUDED.total_file_count;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS folders_usage_move ON folders;
+CREATE TRIGGER folders_usage_move
+    AFTER UPDATE ON folders
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION track_folder_usage();
+
+-- Recompute every aggregate from the files table. Run once below to backfill;
+-- it can be run again to repair drift. Writes to files and folders wait
+-- until it commits.
+CREATE OR REPLACE FUNCTION rebuild_usage()
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    LOCK TABLE files, folders IN SHARE MODE;
+    DELETE FROM user_usage;
+    DELETE FROM user_usage_by_type;
+    DELETE FROM folder_usage;
+
+    INSERT INTO user_usage (owner_id, total_bytes, file_count, trashed_bytes, trashed_file_count)
+    SELECT owner_id, SUM(size), COUNT(*),
+           COALESCE(SUM(size) FILTER (WHERE is_trashed), 0), COUNT(*) FILTER (WHERE is_trashed)
+    FROM files
+    GROUP BY owner_id;
+
+    INSERT INTO user_usage_by_type (owner_id, mime_type, bytes, file_count)
+    SELECT owner_id, mime_type, SUM(size), COUNT(*)
+    FROM files
+    WHERE is_trashed IS NOT TRUE
+    GROUP BY owner_id, mime_type;
+
+    WITH direct AS (
+        SELECT folder_id, SUM(size) AS bytes, COUNT(*) AS file_count
+        FROM files
+        WHERE folder_id IS NOT NULL AND is_trashed IS NOT TRUE
+        GROUP BY folder_id
+    )
+    INSERT INTO folder_usage (folder_id, bytes, file_count, total_bytes, total_file_count)
+    SELECT a.id,
+           COALESCE(SUM(direct.bytes) FILTER (WHERE a.id = direct.folder_id), 0),
+           COALESCE(SUM(direct.file_count) FILTER (WHERE a.id = direct.folder_id), 0),
+           SUM(direct.bytes),
+           SUM(direct.file_count)
+    FROM direct
+    JOIN folders d ON d.id = direct.folder_id
+    CROSS JOIN LATERAL unnest(string_to_array(trim(BOTH '/' FROM d.path), '/')::UUID[]) AS a(id)
+    GROUP BY a.id;
+END;
+$$;
+
+SELECT rebuild_usage();
+
+-- A user's usage, mime type breakdown and quota in one call
+CREATE OR REPLACE FUNCTION get_usage(p_owner_id UUID)
+RETURNS JSON
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT json_build_object(
+        'total_bytes', COALESCE(u.total_bytes, 0),
+        'file_count', COALESCE(u.file_count, 0),
+        'trashed_bytes', COALESCE(u.trashed_bytes, 0),
+        'trashed_file_count', COALESCE(u.trashed_file_count, 0),
+        'quota_bytes', usr.storage_quota,
+        'by_type', COALESCE((
+            SELECT json_agg(json_build_object('mime_type', t.mime_type, 'bytes', t.bytes, 'file_count', t.file_count)
+                            ORDER BY t.bytes DESC, t.mime_type)
+            FROM user_usage_by_type t
+            WHERE t.owner_id = p_owner_id AND t.file_count > 0
+        ), '[]')
+    )
+    FROM users usr
+    LEFT JOIN user_usage u ON u.owner_id = usr.id
+    WHERE usr.id = p_owner_id;
+$$;
+
+-- Live files in a folder's whole subtree; NULL if the folder is not the caller's
+CREATE OR REPLACE FUNCTION get_folder_usage(p_folder_id UUID, p_owner_id UUID)
+RETURNS JSON
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT json_build_object(
+        'folder_id', d.id,
+        'bytes', COALESCE(u.total_bytes, 0),
+        'file_count', COALESCE(u.total_file_count, 0)
+    )
+    FROM folders d
+    LEFT JOIN folder_usage u ON u.folder_id = d.id
+    WHERE d.id = p_folder_id AND d.owner_id = p_owner_id;
+$$;
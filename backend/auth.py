@@ -1,7 +1,12 @@
 from fastapi import APIRouter, HTTPException, status, Depends
-from schemas import UserCreate, UserLogin, UserResponse, Token
-from supabase_client import supabase, USERS_TABLE
-from auth_utils import get_password_hash, verify_password, create_access_token, get_current_user_email
+from schemas import UserCreate, UserLogin, UserResponse, Token, RefreshRequest
+from config import settings
+from supabase_client import USERS_TABLE, REFRESH_SESSIONS_TABLE
+from repository import db
+from auth_utils import (
+    hash_password, verify_and_update_password, create_access_token, get_current_user_id, invalidate_user,
+    create_refresh_token, hash_refresh_secret, next_refresh_token, parse_refresh_token, refresh_token_expiry
+)
 import uuid
 from datetime import datetime
 
@@ -11,7 +16,7 @@ router = APIRouter()
 async def signup(user_data: UserCreate):
     try:
         # Check if user already exists
-        existing_user = supabase.table(USERS_TABLE).select("*").eq("email", user_data.email).execute()
+        existing_user = await db.table(USERS_TABLE).select("*").eq("email", user_data.email).execute()
         
         if existing_user.data:
             raise HTTPException(
@@ -21,7 +26,7 @@ async def signup(user_data: UserCreate):
         
         # Create new user
         user_id = str(uuid.uuid4())
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = await hash_password(user_data.password)
         
         new_user = {
             "id": user_id,
@@ -33,7 +38,7 @@ async def signup(user_data: UserCreate):
             "updated_at": datetime.utcnow().isoformat()
         }
         
-        result = supabase.table(USERS_TABLE).insert(new_user).execute()
+        result = await db.table(USERS_TABLE).insert(new_user).execute()
         
         if not result.data:
             raise HTTPException(
@@ -62,7 +67,7 @@ async def signup(user_data: UserCreate):
 async def login(user_data: UserLogin):
     try:
         # Authenticate user
-        result = supabase.table(USERS_TABLE).select("*").eq("email", user_data.email).execute()
+        result = await db.table(USERS_TABLE).select("*").eq("email", user_data.email).execute()
         
         if not result.data:
             raise HTTPException(
@@ -73,7 +78,8 @@ async def login(user_data: UserLogin):
         
         user = result.data[0]
         
-        if not verify_password(user_data.password, user["hashed_password"]):
+        verified, new_hash = await verify_and_update_password(user_data.password, user["hashed_password"])
+        if not verified:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password",
@@ -86,12 +92,16 @@ async def login(user_data: UserLogin):
                 detail="Inactive user"
             )
         
+        if new_hash:
+            await _rehash_password(user, new_hash)
+
         # Create access token
         access_token = create_access_token(
-            data={"sub": user["email"]}
+            data={"sub": user["email"], "uid": user["id"]}
         )
+        refresh_token = await _start_session(user["id"])
         
-        return {"access_token": access_token, "token_type": "bearer"}
+        return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
         
     except HTTPException:
         raise
@@ -102,10 +112,112 @@ async def login(user_data: UserLogin):
             detail="Internal server error"
         )
 
+async def _rehash_password(user: dict, new_hash: str):
+    # The configured bcrypt cost changed since this hash was made; store the
+    # upgraded one. Conditional on the old hash, so a password changed in the
+    # meantime is not overwritten. A failure only defers it to the next login.
+    try:
+        await (
+            db
+            .table(USERS_TABLE)
+            .update({"hashed_password": new_hash})
+            .eq("id", user["id"])
+            .eq("hashed_password", user["hashed_password"])
+            .execute()
+        )
+    except Exception as e:
+        print(f"Password rehash error: {e}")
+
+async def _start_session(user_id: str) -> str:
+    session_id = str(uuid.uuid4())
+    refresh_token, token_hash = create_refresh_token(session_id)
+    await db.rpc("create_refresh_session", {
+        "p_session_id": session_id,
+        "p_user_id": user_id,
+        "p_token_hash": token_hash,
+        "p_expires_at": refresh_token_expiry()
+    }).execute()
+    return refresh_token
+
+@router.post("/refresh", response_model=Token)
+async def refresh(body: RefreshRequest):
+    """Trade a refresh token for a new access token and a new refresh token.
+
+    There is no password check, and the rotation and user lookup are one
+    database call. Clients call this instead of logging in again when the
+    access token expires. Each refresh token works once; reusing the one it
+    replaced ends the session, unless that happens within a few seconds of
+    the rotation (another tab refreshing at the same time), which gets the
+    same new token.
+    """
+    invalid_token = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        parsed = parse_refresh_token(body.refresh_token)
+        if parsed is None:
+            raise invalid_token
+        session_id, secret = parsed
+
+        refresh_token, new_token_hash = next_refresh_token(session_id, secret)
+        result = await db.rpc("rotate_refresh_session", {
+            "p_session_id": session_id,
+            "p_token_hash": hash_refresh_secret(secret),
+            "p_new_token_hash": new_token_hash,
+            "p_expires_at": refresh_token_expiry(),
+            "p_grace_seconds": settings.refresh_token_reuse_grace_seconds
+        }).execute()
+        if not result.data:
+            raise invalid_token
+
+        user = result.data[0]
+        if not user["is_active"]:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Inactive user"
+            )
+
+        access_token = create_access_token(
+            data={"sub": user["email"], "uid": user["id"]}
+        )
+        return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Refresh error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+
+@router.post("/logout")
+async def logout(body: RefreshRequest):
+    # Ends the refresh token's session; access tokens already issued stay
+    # valid until they expire
+    try:
+        parsed = parse_refresh_token(body.refresh_token)
+        if parsed is not None:
+            session_id, secret = parsed
+            await db.rpc("revoke_refresh_session", {
+                "p_session_id": session_id,
+                "p_token_hash": hash_refresh_secret(secret)
+            }).execute()
+        return {"message": "Logged out"}
+
+    except Exception as e:
+        print(f"Logout error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+
 @router.get("/me", response_model=UserResponse)
-async def get_current_user_info(current_user_email: str = Depends(get_current_user_email)):
+async def get_current_user_info(user_id: str = Depends(get_current_user_id)):
     try:
-        result = supabase.table(USERS_TABLE).select("*").eq("email", current_user_email).execute()
+        result = await db.table(USERS_TABLE).select("*").eq("id", user_id).execute()
         
         if not result.data:
             raise HTTPException(
@@ -131,3 +243,32 @@ async def get_current_user_info(current_user_email: str = Depends(get_current_us
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal server error"
         )
+
+@router.post("/deactivate")
+async def deactivate_current_user(user_id: str = Depends(get_current_user_id)):
+    try:
+        result = await db.table(USERS_TABLE).update({
+            "is_active": False,
+            "updated_at": datetime.utcnow().isoformat()
+        }).eq("id", user_id).execute()
+
+        if not result.data:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+
+        # Drop the cached user so outstanding tokens stop working immediately,
+        # and end every session so none can be refreshed
+        invalidate_user(user_id, result.data[0]["email"])
+        await db.table(REFRESH_SESSIONS_TABLE).delete().eq("user_id", user_id).execute()
+        return {"message": "Account deactivated"}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Deactivate user error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
@@ -1,13 +1,31 @@
 from datetime import datetime, timedelta
-from typing import Optional
+import base64
+import hashlib
+import hmac
+import secrets
+import time
+import uuid
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from config import settings
+from cache import TTLCache
+from concurrency import run_password_hashing
+from logs import RateLimitedLogger
+from repository import db
+from supabase_client import USERS_TABLE
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing. Pinning the accepted cost to the configured one flags
+# hashes made at any other cost for an upgrade (see verify_and_update_password)
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.bcrypt_rounds,
+    bcrypt__min_rounds=settings.bcrypt_rounds,
+    bcrypt__max_rounds=settings.bcrypt_rounds,
+)
 
 # JWT token handling
 security = HTTPBearer()
@@ -18,6 +36,16 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+# bcrypt takes 100ms+ of CPU per call, so the async endpoints run it on the
+# password pool instead of the event loop
+
+async def hash_password(password: str) -> str:
+    return await run_password_hashing(get_password_hash, password)
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Check a password; also return a fresh hash if the stored one used another cost."""
+    return await run_password_hashing(pwd_context.verify_and_update, plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -29,17 +57,76 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     return encoded_jwt
 
-def verify_token(token: str) -> Optional[str]:
+# Refresh tokens are opaque: "<session id>.<secret>". Only the secret's hash is
+# stored (see add_refresh_tokens.sql), so a database leak yields no usable token.
+
+def hash_refresh_secret(secret: str) -> str:
+    """The hex hash stored for a refresh token's secret."""
+    return hashlib.sha256(secret.encode()).hexdigest()
+
+def create_refresh_token(session_id: str) -> Tuple[str, str]:
+    """Return a new token for the session and the hex hash to store for it."""
+    secret = secrets.token_urlsafe(32)
+    return f"{session_id}.{secret}", hash_refresh_secret(secret)
+
+def next_refresh_token(session_id: str, secret: str) -> Tuple[str, str]:
+    """Return the token a rotation replaces ``secret`` with, and its hex hash.
+
+    It is derived from the old secret with the server key, so a refresh that
+    loses a race to rotate the same token can be given the token the winner
+    got. Without the key it can't be predicted from the old token.
+    """
+    digest = hmac.new(settings.secret_key.encode(), f"{session_id}.{secret}".encode(), hashlib.sha256).digest()
+    new_secret = base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+    return f"{session_id}.{new_secret}", hash_refresh_secret(new_secret)
+
+def parse_refresh_token(token: str) -> Optional[Tuple[str, str]]:
+    """Split a refresh token into its session id and secret; None if malformed."""
+    session_id, _, secret = token.partition(".")
+    try:
+        uuid.UUID(session_id)
+    except ValueError:
+        return None
+    if not secret:
+        return None
+    return session_id, secret
+
+def refresh_token_expiry() -> str:
+    return (datetime.utcnow() + timedelta(days=settings.refresh_token_expire_days)).isoformat() + "Z"
+
+log = RateLimitedLogger("auth", settings.log_rate_limit_seconds)
+
+# Payloads of tokens whose signature already checked out, keyed by the token's
+# SHA-256. Clients send the same token on every request, so verification runs
+# once per token and worker; each entry lapses when its token expires.
+_token_cache = TTLCache(maxsize=settings.token_cache_size, ttl=settings.access_token_expire_minutes * 60)
+
+def decode_token(token: str) -> Optional[dict]:
+    key = hashlib.sha256(token.encode()).digest()
+    payload = _token_cache.get(key)
+    if payload is not None:
+        return payload
+
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        email: str = payload.get("sub")
-        if email is None:
-            return None
-        return email
     except JWTError as e:
         # Helpful debug for 401s without exposing secrets
-        print(f"Token verification failed: {str(e)}")
+        log.warning("token_rejected", reason=e)
         return None
+    if payload.get("sub") is None:
+        return None
+
+    expires_at = payload.get("exp")
+    ttl = expires_at - time.time() if isinstance(expires_at, (int, float)) else None
+    if ttl is None or ttl > 0:
+        _token_cache.set(key, payload, ttl)
+    return payload
+
+def verify_token(token: str) -> Optional[str]:
+    payload = decode_token(token)
+    if payload is None:
+        return None
+    return payload["sub"]
 
 async def get_current_user_email(
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -56,3 +143,57 @@ async def get_current_user_email(
         raise credentials_exception
     
     return email
+
+# Users resolved from tokens, keyed by id (or "email:<email>" for tokens issued
+# before the id was embedded). Entries are short-lived so a deactivation made
+# elsewhere is picked up within the TTL; invalidate_user makes it immediate.
+_user_cache = TTLCache(maxsize=settings.user_cache_size, ttl=settings.user_cache_ttl_seconds)
+
+async def _fetch_user(user_id: Optional[str], email: str) -> Optional[dict]:
+    query = db.table(USERS_TABLE).select("id,email,is_active")
+    if user_id:
+        query = query.eq("id", user_id)
+    else:
+        query = query.eq("email", email)
+    result = await query.execute()
+    return result.data[0] if result.data else None
+
+def invalidate_user(user_id: str, email: Optional[str] = None):
+    _user_cache.pop(user_id)
+    if email:
+        _user_cache.pop(f"email:{email}")
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> dict:
+    """Resolve the bearer token to its user row (id, email, is_active).
+
+    The user id travels in the token's ``uid`` claim, so the users table is
+    only consulted on a cache miss.
+    """
+    payload = decode_token(credentials.credentials)
+    if payload is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    email = payload["sub"]
+    user_id = payload.get("uid")
+    cache_key = user_id or f"email:{email}"
+
+    user = _user_cache.get(cache_key)
+    if user is None:
+        user = await _fetch_user(user_id, email)
+        if user is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        _user_cache.set(cache_key, user)
+
+    if not user["is_active"]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Inactive user")
+
+    return user
+
+async def get_current_user_id(user: dict = Depends(get_current_user)) -> str:
+    return user["id"]
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Load benchmark: concurrent login throughput, and /files/list latency during a
+login storm.
+
+Runs against a live backend. The account is created first if it doesn't exist:
+    python benchmarks/login_throughput.py --email bench@example.com --password secret \
+        --logins 200 --concurrency 32
+
+Compare logins/s and the listing p99 before and after a change to password
+hashing. With hashing on the event loop, listings stall for the whole storm.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+async def login(client, credentials):
+    response = await client.post("/auth/login", json=credentials)
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+async def login_worker(client, credentials, remaining, latencies):
+    while remaining:
+        remaining.pop()
+        started = time.perf_counter()
+        await login(client, credentials)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+async def list_poller(client, headers, stop, latencies):
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.get("/files/list", headers=headers)
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(0.01)
+
+async def main(args):
+    credentials = {"email": args.email, "password": args.password}
+    limits = httpx.Limits(max_connections=args.concurrency + args.pollers)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=None, limits=limits) as client:
+        await client.post("/auth/signup", json={**credentials, "name": "Benchmark"})
+        headers = {"Authorization": f"Bearer {await login(client, credentials)}"}
+
+        stop = asyncio.Event()
+        login_latencies, list_latencies = [], []
+        pollers = [
+            asyncio.create_task(list_poller(client, headers, stop, list_latencies))
+            for _ in range(args.pollers)
+        ]
+        remaining = list(range(args.logins))
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            login_worker(client, credentials, remaining, login_latencies) for _ in range(args.concurrency)
+        ])
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await asyncio.gather(*pollers)
+
+    print(f"Logins: {args.logins} at concurrency {args.concurrency} in {elapsed:.2f}s "
+          f"({args.logins / elapsed:.1f}/s, mean {statistics.mean(login_latencies):.0f} ms)")
+    print(f"/files/list requests during logins: {len(list_latencies)}")
+    if list_latencies:
+        print(f"  p50: {percentile(list_latencies, 50):.1f} ms")
+        print(f"  p99: {percentile(list_latencies, 99):.1f} ms")
+        print(f"  max: {max(list_latencies):.1f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--logins", type=int, default=200, help="total logins")
+    parser.add_argument("--concurrency", type=int, default=32, help="logins in flight at once")
+    parser.add_argument("--pollers", type=int, default=2, help="concurrent /files/list pollers")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Load benchmark: /files/list latency while large uploads are in flight.
+
+Runs against a live backend:
+    python benchmarks/upload_latency.py --token <jwt> --uploads 8 --upload-mb 200
+
+Compare the reported p99 before and after a change to the upload path.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import httpx
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+async def upload_worker(client, headers, size_mb):
+    # Random bytes so nothing along the way can compress or dedupe the payload
+    payload = os.urandom(size_mb * 1024 * 1024)
+    started = time.perf_counter()
+    response = await client.post(
+        "/files/upload",
+        headers=headers,
+        files={"file": ("bench.bin", payload, "application/octet-stream")},
+    )
+    response.raise_for_status()
+    return time.perf_counter() - started
+
+async def list_poller(client, headers, stop, latencies):
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.get("/files/list", headers=headers)
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(0.01)
+
+async def main(args):
+    headers = {"Authorization": f"Bearer {args.token}"}
+    limits = httpx.Limits(max_connections=args.uploads + args.pollers)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=None, limits=limits) as client:
+        stop = asyncio.Event()
+        latencies = []
+        pollers = [
+            asyncio.create_task(list_poller(client, headers, stop, latencies))
+            for _ in range(args.pollers)
+        ]
+        upload_times = await asyncio.gather(*[
+            upload_worker(client, headers, args.upload_mb) for _ in range(args.uploads)
+        ])
+        stop.set()
+        await asyncio.gather(*pollers)
+
+    print(f"Uploads: {args.uploads} x {args.upload_mb} MB, mean {statistics.mean(upload_times):.2f}s")
+    print(f"/files/list requests during uploads: {len(latencies)}")
+    if latencies:
+        print(f"  p50: {percentile(latencies, 50):.1f} ms")
+        print(f"  p95: {percentile(latencies, 95):.1f} ms")
+        print(f"  p99: {percentile(latencies, 99):.1f} ms")
+        print(f"  max: {max(latencies):.1f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True, help="Bearer token from /auth/login")
+    parser.add_argument("--uploads", type=int, default=8, help="concurrent uploads")
+    parser.add_argument("--upload-mb", type=int, default=100, help="size of each upload in MB")
+    parser.add_argument("--pollers", type=int, default=4, help="concurrent /files/list pollers")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,216 @@
+import asyncio
+import hashlib
+import os
+import re
+import uuid
+from typing import List, Optional, Tuple
+from config import settings
+from concurrency import run_blocking
+from repository import db
+from storage import LocalStorage, StorageDriver, storage
+
+# Content-addressed storage: each distinct byte sequence is stored once under
+# its SHA-256 digest, and the blobs table keeps a reference count per digest.
+# Blobs live in the configured storage driver, keyed by digest; uploads are
+# staged in TMP_DIR on local disk first so they can be hashed. The plain
+# functions block on disk I/O, so callers run them via
+# concurrency.run_blocking; the async ones do that themselves.
+BLOB_DIR = os.path.join(settings.upload_dir, "blobs")
+TMP_DIR = os.path.join(settings.upload_dir, "tmp")
+os.makedirs(TMP_DIR, exist_ok=True)
+
+DIGEST_RE = re.compile(r"[0-9a-f]{64}")
+
+# Rows written before content addressing hold a plain path owned by that row alone
+legacy_storage = LocalStorage(".", fanout=False)
+
+# Thumbnail bounding boxes rendered for each image or document
+THUMBNAIL_SIZES = sorted({int(size) for size in settings.thumbnail_sizes.split(",") if size.strip()})
+
+HASH_READ_SIZE = 1024 * 1024
+# Digests per release_blobs call, to keep request bodies bounded
+RELEASE_BATCH_SIZE = 1000
+# Blobs claimed for deletion at a time; a claim must be finished well within
+# BLOB_DELETE_TIMEOUT_SECONDS or uploads waiting on it take it over
+DELETE_BATCH_SIZE = 100
+# Polling for a deletion to finish backs off up to this interval
+DELETION_POLL_MAX_SECONDS = 1.0
+
+def new_temp_path() -> str:
+    # Same filesystem as the default local store, so committing a blob is a rename
+    return os.path.join(TMP_DIR, str(uuid.uuid4()))
+
+def blob_digest(storage_path: str) -> Optional[str]:
+    """Return the digest a file row's ``storage_path`` refers to, if any.
+
+    New rows store the bare digest; rows from before storage drivers store the
+    local ``<upload_dir>/blobs/aa/bb/<digest>`` path, which the local driver
+    still resolves to the same file.
+    """
+    if DIGEST_RE.fullmatch(storage_path):
+        return storage_path
+    digest = os.path.basename(storage_path)
+    if DIGEST_RE.fullmatch(digest) and os.path.dirname(os.path.dirname(os.path.dirname(storage_path))) == BLOB_DIR:
+        return digest
+    return None
+
+def thumbnail_key(storage_path: str, size: int) -> str:
+    """Key of a file's ``size`` thumbnail in the storage driver.
+
+    Thumbnails sit beside their blob under the same digest, so files with
+    identical content share them. Legacy paths are keyed by a hash of the path.
+    """
+    digest = blob_digest(storage_path) or hashlib.sha256(storage_path.encode()).hexdigest()
+    return f"{digest}.thumb{size}.jpg"
+
+def locate(storage_path: str) -> Tuple[StorageDriver, str]:
+    """Return the driver and key holding a file row's content."""
+    digest = blob_digest(storage_path)
+    if digest is None:
+        return legacy_storage, storage_path
+    return storage, digest
+
+def write_temp_blob(source, buffer_size: int) -> Tuple[str, int, str]:
+    """Copy a file-like object to a temp file, hashing as it streams.
+
+    Returns (digest, size, temp_path).
+    """
+    temp_path = new_temp_path()
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with open(temp_path, "wb") as buffer:
+            while True:
+                chunk = source.read(buffer_size)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                buffer.write(chunk)
+                size += len(chunk)
+    except BaseException:
+        remove_file(temp_path)
+        raise
+    return hasher.hexdigest(), size, temp_path
+
+def hash_file(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(HASH_READ_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+async def commit_blob(temp_path: str, digest: str, size: int) -> str:
+    """Take a reference on ``digest`` and make sure its blob is stored.
+
+    The temp file is moved into storage if the blob isn't there and discarded
+    otherwise. If this fails the reference is dropped again and the temp file
+    is left for the caller to retry or discard. Returns the value to keep as
+    the row's storage path.
+    """
+    result = await db.rpc("acquire_blob", {"p_digest": digest, "p_size": size}).execute()
+    try:
+        if result.data and result.data[0]["deleting"]:
+            # The blob lost its last reference and is being unlinked; a copy
+            # placed now could be unlinked with it
+            await _wait_for_deletion(digest)
+        await run_blocking(_place_blob, temp_path, digest)
+    except BaseException:
+        try:
+            await release_blob(digest)
+        except Exception as e:
+            print(f"Warning: failed to release blob {digest}: {e}")
+        raise
+    return digest
+
+async def _wait_for_deletion(digest: str):
+    delay = 0.01
+    while True:
+        result = await db.rpc(
+            "blob_deletion_settled",
+            {"p_digest": digest, "p_timeout_seconds": settings.blob_delete_timeout_seconds}
+        ).execute()
+        if result.data:
+            return
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, DELETION_POLL_MAX_SECONDS)
+
+def _place_blob(temp_path: str, digest: str):
+    if storage.stat(digest) is None:
+        storage.put_file(digest, temp_path)
+    else:
+        remove_file(temp_path)
+
+async def release_blob(storage_path: str):
+    """Drop one reference to the blob behind ``storage_path``; delete it at zero.
+
+    Legacy paths outside the blob store are owned by a single file row, so they
+    are removed directly.
+    """
+    digest = blob_digest(storage_path)
+    if digest is None:
+        await delete_blobs([(legacy_storage, storage_path)])
+        return
+
+    result = await db.rpc("release_blob", {"p_digest": digest}).execute()
+    if not result.data:
+        await delete_blobs([(storage, digest)])
+
+async def release_blobs(storage_paths: List[str]) -> List[Tuple[StorageDriver, str]]:
+    """Drop one reference per path in batched calls.
+
+    Returns the (driver, key) pairs that are no longer referenced; pass them to
+    delete_blobs, typically from a background task.
+    """
+    unreferenced: List[Tuple[StorageDriver, str]] = []
+    digests: List[str] = []
+    for path in storage_paths:
+        digest = blob_digest(path)
+        if digest is None:
+            unreferenced.append((legacy_storage, path))
+        else:
+            digests.append(digest)
+
+    for i in range(0, len(digests), RELEASE_BATCH_SIZE):
+        result = await db.rpc("release_blobs", {"p_digests": digests[i:i + RELEASE_BATCH_SIZE]}).execute()
+        unreferenced.extend((storage, digest) for digest in result.data or [])
+    return unreferenced
+
+async def delete_blobs(blobs: List[Tuple[StorageDriver, str]]):
+    """Unlink blobs returned by release_blob(s), unless they were taken again since."""
+    digests = [key for driver, key in blobs if driver is storage]
+    legacy = [(driver, key) for driver, key in blobs if driver is not storage]
+    if legacy:
+        await run_blocking(_delete_blobs, legacy)
+
+    for i in range(0, len(digests), DELETE_BATCH_SIZE):
+        batch = digests[i:i + DELETE_BATCH_SIZE]
+        try:
+            claimed = await db.rpc("claim_blob_deletions", {"p_digests": batch}).execute()
+            try:
+                await run_blocking(_delete_blobs, [(storage, digest) for digest in claimed.data or []])
+            finally:
+                await db.rpc("finish_blob_deletions", {"p_digests": batch}).execute()
+        except Exception as e:
+            # Unclaimed or unfinished blobs stay on disk; a leftover only costs space
+            print(f"Warning: failed to delete blobs: {e}")
+
+def _delete_blobs(blobs: List[Tuple[StorageDriver, str]]):
+    for driver, key in blobs:
+        # Thumbnails go with the blob; they always live in the configured store
+        targets = [(driver, key)] + [(storage, thumbnail_key(key, size)) for size in THUMBNAIL_SIZES]
+        for target, target_key in targets:
+            try:
+                target.delete(target_key)
+            except Exception as e:
+                # The reference is already gone; a leftover object only costs space
+                print(f"Warning: failed to delete blob {target_key}: {e}")
+
+def remove_file(path: str):
+    # Missing files are fine: cleanup paths may run more than once
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,146 @@
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from typing import Iterable, List, Tuple
+from repository import db
+from schemas import BulkItems, BulkMove, BulkStar, BulkItemResult, BulkResponse
+from auth_utils import get_current_user_id
+from config import settings
+import blob_store
+import events
+import listing_cache
+
+router = APIRouter()
+
+# Each endpoint is one RPC (see add_bulk_operations.sql) that checks ownership
+# and applies the change set-wise; the ids it reports back become per-item
+# results, and anything missing is reported as not found.
+
+def _unique_ids(items: BulkItems) -> Tuple[List[str], List[str]]:
+    # Deduplicated, keeping request order for the results
+    file_ids = list(dict.fromkeys(str(item_id) for item_id in items.file_ids))
+    folder_ids = list(dict.fromkeys(str(item_id) for item_id in items.folder_ids))
+    if len(file_ids) + len(folder_ids) > settings.max_bulk_items:
+        raise HTTPException(status_code=400, detail=f"At most {settings.max_bulk_items} items per request")
+    return file_ids, folder_ids
+
+def _results(
+    file_ids: List[str],
+    folder_ids: List[str],
+    applied: dict,
+    missing_detail: str,
+    rejected_folders: Iterable[str] = (),
+    rejected_detail: str = ""
+) -> BulkResponse:
+    done = {"file": set(applied["files"]), "folder": set(applied["folders"])}
+    rejected = set(rejected_folders)
+
+    results: List[BulkItemResult] = []
+    for kind, ids in (("file", file_ids), ("folder", folder_ids)):
+        for item_id in ids:
+            if item_id in done[kind]:
+                results.append(BulkItemResult(id=item_id, type=kind, status="ok"))
+            elif kind == "folder" and item_id in rejected:
+                results.append(BulkItemResult(id=item_id, type=kind, status="invalid", detail=rejected_detail))
+            else:
+                results.append(BulkItemResult(id=item_id, type=kind, status="not_found", detail=missing_detail))
+
+    succeeded = sum(1 for result in results if result.status == "ok")
+    return BulkResponse(succeeded=succeeded, failed=len(results) - succeeded, results=results)
+
+async def _call(func: str, user_id: str, file_ids: List[str], folder_ids: List[str], **params):
+    result = await db.rpc(func, {
+        "p_owner_id": user_id,
+        "p_file_ids": file_ids,
+        "p_folder_ids": folder_ids,
+        **params
+    }).execute()
+    # The items may come from any number of folders
+    await listing_cache.invalidate_owner(user_id)
+    return result.data
+
+@router.post("/star", response_model=BulkResponse)
+async def bulk_star(items: BulkStar, user_id: str = Depends(get_current_user_id)):
+    try:
+        file_ids, folder_ids = _unique_ids(items)
+        applied = await _call("bulk_set_starred", user_id, file_ids, folder_ids, p_starred=items.starred)
+        await events.publish(user_id, "updated", applied["files"], applied["folders"])
+        return _results(file_ids, folder_ids, applied, "Not found")
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Bulk star error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.post("/move", response_model=BulkResponse)
+async def bulk_move(items: BulkMove, user_id: str = Depends(get_current_user_id)):
+    try:
+        file_ids, folder_ids = _unique_ids(items)
+        target_id = str(items.target_folder_id) if items.target_folder_id else None
+        applied = await _call("bulk_move", user_id, file_ids, folder_ids, p_target_id=target_id)
+        if applied is None:
+            raise HTTPException(status_code=404, detail="Target folder not found")
+        await events.publish(user_id, "updated", applied["files"], applied["folders"])
+        return _results(
+            file_ids,
+            folder_ids,
+            applied,
+            "Not found or in trash",
+            applied["rejected_folders"],
+            "Cannot move a folder into itself or one of its subfolders"
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Bulk move error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.post("/trash", response_model=BulkResponse)
+async def bulk_trash(items: BulkItems, user_id: str = Depends(get_current_user_id)):
+    try:
+        file_ids, folder_ids = _unique_ids(items)
+        # Folders go to the trash with everything inside them
+        applied = await _call("bulk_trash", user_id, file_ids, folder_ids)
+        await events.publish(user_id, "trashed", applied["files"], applied["folders"])
+        return _results(file_ids, folder_ids, applied, "Not found")
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Bulk trash error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.post("/restore", response_model=BulkResponse)
+async def bulk_restore(items: BulkItems, user_id: str = Depends(get_current_user_id)):
+    try:
+        file_ids, folder_ids = _unique_ids(items)
+        applied = await _call("bulk_restore", user_id, file_ids, folder_ids)
+        await events.publish(user_id, "restored", applied["files"], applied["folders"])
+        return _results(file_ids, folder_ids, applied, "Not found or not in trash")
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Bulk restore error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.post("/delete", response_model=BulkResponse)
+async def bulk_delete(
+    items: BulkItems,
+    background_tasks: BackgroundTasks,
+    user_id: str = Depends(get_current_user_id)
+):
+    try:
+        file_ids, folder_ids = _unique_ids(items)
+        # Permanent: folder subtrees and their files are deleted too
+        applied = await _call("bulk_purge", user_id, file_ids, folder_ids)
+        await events.publish(user_id, "deleted", applied["files"], applied["folders"])
+        try:
+            unreferenced = await blob_store.release_blobs(applied["storage_paths"])
+        except Exception as e:
+            # Do not block permanent delete on blob bookkeeping errors
+            print(f"Warning: failed to release blobs: {e}")
+            unreferenced = []
+        background_tasks.add_task(blob_store.delete_blobs, unreferenced)
+        return _results(file_ids, folder_ids, applied, "Not found")
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Bulk delete error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
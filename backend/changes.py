@@ -0,0 +1,140 @@
+import asyncio
+import base64
+import json
+import time
+from typing import AsyncIterator, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials
+from repository import db
+from schemas import ChangesResponse
+from serialization import json_response
+from auth_utils import decode_token, get_current_user_id, security
+from config import settings
+import events
+
+router = APIRouter()
+
+# Every file and folder write stamps the row with the owner's next change
+# number, and deletes leave tombstones (see add_change_feed.sql). A cursor is
+# the (number, type, id) of the last change returned, so a client catches up
+# by reading only what changed since, however large the drive is.
+
+def _encode_cursor(seq: int, kind: Optional[str] = None, item_id: Optional[str] = None) -> str:
+    raw = json.dumps({"seq": seq, "type": kind, "id": item_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str) -> Tuple[int, Optional[str], Optional[str]]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        seq, kind, item_id = int(data["seq"]), data["type"], data["id"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if seq < 0 or kind not in (None, "file", "folder") or (kind is None) != (item_id is None):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return seq, kind, item_id
+
+@router.get("", response_model=ChangesResponse)
+async def get_changes(
+    since: Optional[str] = None,
+    limit: int = Query(settings.default_page_size, ge=1, le=settings.max_page_size),
+    user_id: str = Depends(get_current_user_id)
+):
+    """Files and folders created, updated, trashed, restored or deleted after ``since``.
+
+    Without ``since`` only the current cursor is returned: take it before
+    listing the drive, then poll with it. Items come oldest change first and
+    carry the item's current state. Keep calling with the returned cursor
+    while ``has_more`` is true.
+    """
+    try:
+        seq, kind, item_id = _decode_cursor(since) if since else (None, None, None)
+        result = await db.rpc("get_changes", {
+            "p_owner_id": user_id,
+            # Without a cursor, start past the latest number: nothing but the head is returned
+            "p_seq": seq if seq is not None else 2 ** 63 - 1,
+            "p_kind": kind,
+            "p_id": item_id,
+            "p_limit": limit + 1
+        }).execute()
+        feed = result.data
+
+        if seq is None:
+            return json_response(ChangesResponse, {"items": [], "cursor": _encode_cursor(feed["seq"]), "has_more": False})
+
+        # Tombstones this cursor still needed have been pruned
+        if seq < feed["pruned_seq"]:
+            raise HTTPException(status_code=status.HTTP_410_GONE, detail="Cursor expired; list the drive again and start from a new cursor")
+
+        rows = feed["items"]
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        items = [
+            {
+                "type": row["type"],
+                "id": row["id"],
+                "deleted": row["deleted"],
+                "trashed": bool(row["item"] and row["item"].get("is_trashed")),
+                "file": row["item"] if row["type"] == "file" else None,
+                "folder": row["item"] if row["type"] == "folder" else None,
+            }
+            for row in rows
+        ]
+        if has_more:
+            last = rows[-1]
+            cursor = _encode_cursor(last["change_seq"], last["type"], last["id"])
+        else:
+            # Everything up to the latest number has been returned
+            cursor = _encode_cursor(feed["seq"])
+        return json_response(ChangesResponse, {"items": items, "cursor": cursor, "has_more": has_more})
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Get changes error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+def _sse(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+async def _event_stream(user_id: str, expires_at: Optional[float]) -> AsyncIterator[bytes]:
+    async with events.broker.subscribe(user_id) as queue:
+        # Subscribed: anything written from now on will be announced
+        yield _sse("ready", {})
+        while True:
+            timeout = settings.event_keepalive_seconds
+            if expires_at is not None:
+                remaining = expires_at - time.time()
+                if remaining <= 0:
+                    # The client reconnects with a fresh token
+                    return
+                timeout = min(timeout, remaining)
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            yield _sse("resync" if event is events.RESYNC else "change", event)
+
+@router.get("/stream")
+async def stream_changes(
+    user_id: str = Depends(get_current_user_id),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Server-Sent Events announcing the user's file and folder writes as they happen.
+
+    ``ready`` comes once the stream is subscribed; refresh or take a /changes
+    cursor after it. Each ``change`` event is {"action", "files", "folders"},
+    with action one of created, updated, trashed, restored or deleted. After
+    ``resync`` events were dropped, so refresh from /changes. The stream ends
+    when the access token expires.
+    """
+    payload = decode_token(credentials.credentials)
+    expires_at = payload.get("exp") if payload else None
+    return StreamingResponse(
+        _event_stream(user_id, expires_at),
+        media_type="text/event-stream",
+        # Deliver each event at once rather than when a proxy buffer fills
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,39 @@
+import asyncio
+from functools import partial
+from typing import Optional
+import anyio
+from config import settings
+
+# Bounded pool for blocking disk and client calls, so a burst of large uploads
+# can't starve the default threadpool that serves sync endpoints and streaming
+_io_limiter: Optional[anyio.CapacityLimiter] = None
+
+# Password hashing gets its own pool. bcrypt releases the GIL, so hashes run
+# in parallel on these threads while the event loop keeps serving requests;
+# capping them at the core count makes a login storm queue here rather than
+# oversubscribe the CPU or take threads from uploads.
+_password_limiter: Optional[anyio.CapacityLimiter] = None
+
+# Per-worker cap on uploads writing to disk at the same time
+upload_slots = asyncio.Semaphore(settings.max_concurrent_uploads)
+
+def _get_io_limiter() -> anyio.CapacityLimiter:
+    # Created lazily: anyio needs a running event loop to build the limiter
+    global _io_limiter
+    if _io_limiter is None:
+        _io_limiter = anyio.CapacityLimiter(settings.io_thread_pool_size)
+    return _io_limiter
+
+def _get_password_limiter() -> anyio.CapacityLimiter:
+    global _password_limiter
+    if _password_limiter is None:
+        _password_limiter = anyio.CapacityLimiter(settings.password_hash_workers)
+    return _password_limiter
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking callable on the I/O thread pool and await its result."""
+    return await anyio.to_thread.run_sync(partial(func, *args, **kwargs), limiter=_get_io_limiter())
+
+async def run_password_hashing(func, *args, **kwargs):
+    """Run a CPU-bound password hash or check on the password pool."""
+    return await anyio.to_thread.run_sync(partial(func, *args, **kwargs), limiter=_get_password_limiter())
@@ -0,0 +1,129 @@
+import asyncio
+import hashlib
+import uuid
+from typing import Awaitable, Callable, Hashable, Optional
+from fastapi import Request
+from fastapi.responses import Response
+from repository import db
+from supabase_client import FOLDERS_TABLE, LISTING_VERSIONS_TABLE
+import listing_cache
+
+# Conditional GET for listings. Every write to files or folders moves the
+# version of each listing scope it affects (see add_listing_versions.sql), so
+# the scope's version stands for the listing's content: a client presenting
+# the ETag it was last given gets 304 without the listing query or a response
+# body. Pages in the listing cache keep the ETag they were built with, so a
+# hit in the shared cache is revalidated without a database call at all; hits
+# in a per-worker cache are first checked against the scope's version.
+
+# Listings must be revalidated on every use and never shared between users
+CACHE_CONTROL = "private, no-cache"
+
+def etag_matches(header: str, etag: str) -> bool:
+    # Weak comparison, as required for If-None-Match
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return any(tag.removeprefix("W/") == etag.removeprefix("W/") for tag in candidates)
+
+def folder_scope(folder_id: Optional[str]) -> str:
+    """The scope of a folder's listings (None for the root)."""
+    if not folder_id:
+        return "folder:root"
+    # Spelled the way the triggers write it (uuid::TEXT)
+    try:
+        return f"folder:{uuid.UUID(str(folder_id))}"
+    except ValueError:
+        return f"folder:{folder_id}"
+
+async def listing_etag(user_id: str, scope: str, folder_id: Optional[str] = None) -> Optional[str]:
+    """The ETag of the user's listing of ``scope``.
+
+    For a folder's scope, None unless the folder is the user's and not in the
+    trash: other ids list as empty, and must not be answered with 304.
+    """
+    async def fetch_version():
+        return await (
+            db
+            .table(LISTING_VERSIONS_TABLE)
+            .select("version")
+            .eq("owner_id", user_id)
+            .eq("scope", scope)
+            .execute()
+        )
+
+    async def fetch_folder():
+        return await (
+            db
+            .table(FOLDERS_TABLE)
+            .select("id")
+            .eq("id", folder_id)
+            .eq("owner_id", user_id)
+            .eq("is_trashed", False)
+            .execute()
+        )
+
+    if folder_id:
+        try:
+            uuid.UUID(str(folder_id))
+        except ValueError:
+            return None
+        result, folder = await asyncio.gather(fetch_version(), fetch_folder())
+        if not folder.data:
+            return None
+    else:
+        result = await fetch_version()
+
+    # Scopes nothing has been written to since the migration are at 0
+    version = result.data[0]["version"] if result.data else 0
+    # Per user, since the same URL lists each user's own drive
+    digest = hashlib.sha1(f"{user_id}:{scope}:{version}".encode()).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+def _revalidate(request: Request, response: Response) -> Response:
+    # 304 in place of a listing the client already has
+    etag = response.headers.get("etag")
+    if response.status_code != 200 or etag is None:
+        return response
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match") or "", etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return response
+
+async def listing_response(
+    request: Request,
+    user_id: str,
+    scope: str,
+    build: Callable[[], Awaitable[Response]],
+    folder_id: Optional[str] = None
+) -> Response:
+    """``build()``'s listing with its ETag, or 304 if the client has it already.
+
+    The version is read before the listing, so the content sent is never older
+    than its ETag claims.
+    """
+    etag = await listing_etag(user_id, scope, folder_id)
+    if etag is not None and etag_matches(request.headers.get("if-none-match") or "", etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    response = await build()
+    if etag is not None:
+        response.headers.update({"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    return response
+
+async def cached_listing(
+    request: Request,
+    user_id: str,
+    folder_id: Optional[str],
+    view: Hashable,
+    build: Callable[[], Awaitable[Response]]
+) -> Response:
+    """A folder listing through the listing cache, with its ETag, or 304."""
+    response = await listing_cache.read_through(
+        user_id,
+        folder_id,
+        view,
+        lambda: listing_response(request, user_id, folder_scope(folder_id), build, folder_id),
+        lambda: listing_etag(user_id, folder_scope(folder_id), folder_id)
+    )
+    return _revalidate(request, response)
@@ -1,3 +1,4 @@
+import os
 from pydantic_settings import BaseSettings
 from pydantic import Field
 from typing import Optional
@@ -7,15 +8,108 @@ class Settings(BaseSettings):
     supabase_url: str = Field(default="your_supabase_url_here", env="SUPABASE_URL")
     supabase_key: str = Field(default="your_supabase_anon_key_here", env="SUPABASE_KEY")
 
+    # Database connection pool (PostgREST over HTTP/2)
+    db_pool_size: int = Field(default=20, env="DB_POOL_SIZE")
+    db_keepalive_seconds: float = Field(default=30.0, env="DB_KEEPALIVE_SECONDS")
+    db_timeout_seconds: float = Field(default=10.0, env="DB_TIMEOUT_SECONDS")
+    db_connect_timeout_seconds: float = Field(default=5.0, env="DB_CONNECT_TIMEOUT_SECONDS")
+    db_retries: int = Field(default=2, env="DB_RETRIES")
+    db_retry_backoff_seconds: float = Field(default=0.1, env="DB_RETRY_BACKOFF_SECONDS")
+    db_http2: bool = Field(default=True, env="DB_HTTP2")
+
     # JWT
     secret_key: str = Field(default="your-secret-key-here-change-in-production", env="SECRET_KEY")
     algorithm: str = Field(default="HS256", env="ALGORITHM")
     access_token_expire_minutes: int = Field(default=30, env="ACCESS_TOKEN_EXPIRE_MINUTES")
+    # Refresh tokens rotate on every use; a session ends after this long unused
+    refresh_token_expire_days: int = Field(default=30, env="REFRESH_TOKEN_EXPIRE_DAYS")
+    # The token a rotation replaced still refreshes (to the same new token) for this long,
+    # for clients refreshing from several tabs at once; later it counts as reuse
+    refresh_token_reuse_grace_seconds: float = Field(default=30.0, env="REFRESH_TOKEN_REUSE_GRACE_SECONDS")
+
+    # Password hashing. Changing the cost rehashes each user's password at their next login
+    bcrypt_rounds: int = Field(default=12, env="BCRYPT_ROUNDS")
+    # Threads hashing at once; more than the core count only adds queueing inside the CPU
+    password_hash_workers: int = Field(default=os.cpu_count() or 1, env="PASSWORD_HASH_WORKERS")
+
+    # Verified-token cache: tokens are checked once and then trusted until they expire
+    token_cache_size: int = Field(default=10000, env="TOKEN_CACHE_SIZE")
+
+    # Repeats of the same log event are dropped for this long
+    log_rate_limit_seconds: float = Field(default=60.0, env="LOG_RATE_LIMIT_SECONDS")
+
+    # Current-user cache
+    user_cache_size: int = Field(default=10000, env="USER_CACHE_SIZE")
+    user_cache_ttl_seconds: int = Field(default=60, env="USER_CACHE_TTL_SECONDS")
 
     # Server
     host: str = Field(default="0.0.0.0", env="HOST")
     port: int = Field(default=8000, env="PORT")
 
+    # File storage
+    upload_dir: str = Field(default="uploads", env="UPLOAD_DIR")
+    download_chunk_size: int = Field(default=64 * 1024, env="DOWNLOAD_CHUNK_SIZE")
+    upload_chunk_size: int = Field(default=8 * 1024 * 1024, env="UPLOAD_CHUNK_SIZE")
+    max_upload_chunk_size: int = Field(default=64 * 1024 * 1024, env="MAX_UPLOAD_CHUNK_SIZE")
+    upload_session_ttl_hours: int = Field(default=24, env="UPLOAD_SESSION_TTL_HOURS")
+    # How often each worker sweeps expired upload sessions off disk
+    upload_session_purge_interval_seconds: float = Field(default=3600.0, env="UPLOAD_SESSION_PURGE_INTERVAL_SECONDS")
+    upload_buffer_size: int = Field(default=1024 * 1024, env="UPLOAD_BUFFER_SIZE")
+    max_concurrent_uploads: int = Field(default=8, env="MAX_CONCURRENT_UPLOADS")
+    # An upload of a blob that is being deleted waits for the deletion this long at most
+    blob_delete_timeout_seconds: float = Field(default=60.0, env="BLOB_DELETE_TIMEOUT_SECONDS")
+    # Default per-user storage quota in bytes (0 = unlimited); users.storage_quota overrides it
+    storage_quota_bytes: int = Field(default=0, env="STORAGE_QUOTA_BYTES")
+
+    # Storage driver for file content: "local", "sharded" or "s3"
+    storage_driver: str = Field(default="local", env="STORAGE_DRIVER")
+    # Comma-separated directories (one per disk) for the sharded driver
+    storage_roots: str = Field(default="", env="STORAGE_ROOTS")
+    s3_bucket: Optional[str] = Field(default=None, env="S3_BUCKET")
+    s3_prefix: str = Field(default="", env="S3_PREFIX")
+    s3_endpoint_url: Optional[str] = Field(default=None, env="S3_ENDPOINT_URL")
+    s3_region: Optional[str] = Field(default=None, env="S3_REGION")
+    s3_access_key_id: Optional[str] = Field(default=None, env="S3_ACCESS_KEY_ID")
+    s3_secret_access_key: Optional[str] = Field(default=None, env="S3_SECRET_ACCESS_KEY")
+
+    # Thumbnails, rendered in the background after upload
+    # Comma-separated bounding-box sizes in pixels; requests snap to the nearest one
+    thumbnail_sizes: str = Field(default="128,256,512", env="THUMBNAIL_SIZES")
+    thumbnail_workers: int = Field(default=2, env="THUMBNAIL_WORKERS")
+    # Larger files get no thumbnail
+    thumbnail_max_source_bytes: int = Field(default=50 * 1024 * 1024, env="THUMBNAIL_MAX_SOURCE_BYTES")
+    # Limit for converting one document (LibreOffice / pdftoppm)
+    thumbnail_timeout_seconds: float = Field(default=60.0, env="THUMBNAIL_TIMEOUT_SECONDS")
+
+    # Listing pagination
+    default_page_size: int = Field(default=100, env="DEFAULT_PAGE_SIZE")
+    max_page_size: int = Field(default=1000, env="MAX_PAGE_SIZE")
+
+    # Bulk operations
+    max_bulk_items: int = Field(default=1000, env="MAX_BULK_ITEMS")
+
+    # Folder listing cache: "local" (per worker; hits check the listing's version), "redis"
+    # (shared by workers, hits need no query) or "off"
+    listing_cache: str = Field(default="local", env="LISTING_CACHE")
+    # Memory for the local cache; size a Redis cache with its maxmemory setting
+    listing_cache_bytes: int = Field(default=64 * 1024 * 1024, env="LISTING_CACHE_BYTES")
+    # Backstop for writes made outside the API; the API's own writes invalidate at once
+    listing_cache_ttl_seconds: float = Field(default=300.0, env="LISTING_CACHE_TTL_SECONDS")
+    # Serve GET /metrics; it has no authentication, so keep it off where clients can reach it
+    metrics_enabled: bool = Field(default=False, env="METRICS_ENABLED")
+
+    # Change push (GET /changes/stream): "local" for one worker, "redis" to reach every worker
+    event_broker: str = Field(default="local", env="EVENT_BROKER")
+    # Used by EVENT_BROKER=redis and LISTING_CACHE=redis; the redis package is only imported for them
+    redis_url: str = Field(default="redis://localhost:6379/0", env="REDIS_URL")
+    # Events held for a stream that isn't reading before it is told to resync
+    event_queue_size: int = Field(default=100, env="EVENT_QUEUE_SIZE")
+    # Comment lines sent on idle streams so proxies don't time them out
+    event_keepalive_seconds: float = Field(default=15.0, env="EVENT_KEEPALIVE_SECONDS")
+
+    # Worker threads for blocking disk and database calls
+    io_thread_pool_size: int = Field(default=16, env="IO_THREAD_POOL_SIZE")
+
     # CORS
     frontend_url: str = Field(default="http://localhost:3000", env="FRONTEND_URL")
 
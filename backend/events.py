@@ -0,0 +1,139 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Iterable, Optional, Set
+from config import settings
+
+# Push notifications for GET /changes/stream. The routers publish an event
+# after each file or folder write, and it is handed to every open stream of
+# the owning user. Events only name the items a request touched (a trashed
+# folder, not everything under it): they tell a client that something changed
+# and what to refresh, while /changes remains the record of what exactly.
+#
+# The local broker fans out within this process. Under several workers a
+# request may land on a different one than the user's stream, so the Redis
+# broker publishes through Redis and each worker fans out what it receives.
+
+# Sent to a subscriber that fell behind or may have missed events
+RESYNC = {"action": "resync", "files": [], "folders": []}
+
+class LocalBroker:
+    """Fans events out to this process's subscribers."""
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    async def publish(self, user_id: str, event: dict):
+        self.deliver(user_id, event)
+
+    def deliver(self, user_id: str, event: dict):
+        for queue in self._subscribers.get(user_id, ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A stream that stops reading must not hold events without
+                # bound: drop its backlog and have it catch up from /changes
+                _replace_backlog(queue, RESYNC)
+
+    def resync_all(self):
+        for queues in self._subscribers.values():
+            for queue in queues:
+                _replace_backlog(queue, RESYNC)
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: str) -> AsyncIterator[asyncio.Queue]:
+        """A queue receiving ``user_id``'s events until the block exits."""
+        queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            queues = self._subscribers.get(user_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[user_id]
+
+    async def close(self):
+        pass
+
+def _replace_backlog(queue: asyncio.Queue, event: dict):
+    while not queue.empty():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+class RedisBroker(LocalBroker):
+    """Publishes through Redis pub/sub so streams on every worker get each event."""
+
+    CHANNEL_PREFIX = "drive:events:"
+
+    def __init__(self, url: str, queue_size: int):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("EVENT_BROKER=redis requires redis>=5 (pip install redis)")
+
+        super().__init__(queue_size)
+        self._redis = redis.from_url(url)
+        self._listener: Optional[asyncio.Task] = None
+
+    async def publish(self, user_id: str, event: dict):
+        await self._redis.publish(self.CHANNEL_PREFIX + user_id, json.dumps(event))
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: str) -> AsyncIterator[asyncio.Queue]:
+        # Started with the first stream, inside the server's event loop
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+        async with super().subscribe(user_id) as queue:
+            yield queue
+
+    async def _listen(self):
+        # One pattern subscription per worker, whatever the number of streams
+        while True:
+            try:
+                async with self._redis.pubsub() as pubsub:
+                    await pubsub.psubscribe(self.CHANNEL_PREFIX + "*")
+                    async for message in pubsub.listen():
+                        if message["type"] != "pmessage":
+                            continue
+                        user_id = message["channel"].decode()[len(self.CHANNEL_PREFIX):]
+                        self.deliver(user_id, json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Warning: event broker connection lost: {e}")
+                # Anything published while reconnecting is lost to these streams
+                self.resync_all()
+                await asyncio.sleep(1)
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+        await self._redis.aclose()
+
+def create_broker() -> LocalBroker:
+    driver = settings.event_broker.lower()
+    if driver == "local":
+        return LocalBroker(settings.event_queue_size)
+    if driver == "redis":
+        return RedisBroker(settings.redis_url, settings.event_queue_size)
+    raise ValueError(f"Unknown EVENT_BROKER: {settings.event_broker}")
+
+broker = create_broker()
+
+async def publish(user_id: str, action: str, files: Iterable[str] = (), folders: Iterable[str] = ()):
+    """Tell ``user_id``'s streams that ``action`` happened to the given file and folder ids.
+
+    ``action`` is one of created, updated, trashed, restored or deleted. The
+    write has already happened, so a failure here is logged and not raised.
+    """
+    files, folders = [str(i) for i in files], [str(i) for i in folders]
+    if not files and not folders:
+        return
+    event = {"action": action, "files": files, "folders": folders}
+    try:
+        await broker.publish(user_id, event)
+    except Exception as e:
+        print(f"Warning: failed to publish {action} event: {e}")
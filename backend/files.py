@@ -1,48 +1,56 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from typing import Optional, List
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from typing import Optional, List, Tuple
+from email.utils import format_datetime, parsedate_to_datetime
+from urllib.parse import quote
+import hashlib
 import os
-import shutil
 import uuid
-from datetime import datetime
-from supabase_client import supabase, FILES_TABLE
-from schemas import FileResponse
-from auth_utils import get_current_user_email
+from datetime import datetime, timezone
+from config import settings
+from supabase_client import FILES_TABLE
+from repository import db
+from serialization import json_response
+from schemas import FileResponse, FileListResponse
+from auth_utils import get_current_user_id
+from conditional import cached_listing, etag_matches, listing_response
+from concurrency import run_blocking, upload_slots
+from storage import storage
+import blob_store
+import events
+import listing_cache
+import thumbnails
+import usage
+from pagination import FileSortField, SortOrder, apply_page, page_rows
 
 router = APIRouter()
 
 # File storage directory
-UPLOAD_DIR = "uploads"
+UPLOAD_DIR = settings.upload_dir
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 @router.post("/upload", response_model=FileResponse)
 async def upload_file(
     file: UploadFile = File(...),
     folder_id: Optional[str] = Form(None),
-    current_user_email: str = Depends(get_current_user_email)
+    user_id: str = Depends(get_current_user_id)
 ):
     try:
-        # Get user ID from email
-        user_result = supabase.table("users").select("id").eq("email", current_user_email).execute()
-        if not user_result.data:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        user_id = user_result.data[0]["id"]
-        
-        # Generate unique filename
-        file_extension = os.path.splitext(file.filename)[1]
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        
-        # Create user directory if it doesn't exist
-        user_dir = os.path.join(UPLOAD_DIR, user_id)
-        os.makedirs(user_dir, exist_ok=True)
-        
-        # Save file
-        file_path = os.path.join(user_dir, unique_filename)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Get file size
-        file_size = os.path.getsize(file_path)
+        # The multipart body is already spooled, so its size is known before
+        # anything is written to the blob store
+        await usage.check_quota(user_id, file.size or 0)
+
+        # Save file on the I/O pool, hashing while it streams; identical
+        # content is stored once in the blob store
+        async with upload_slots:
+            digest, file_size, temp_path = await run_blocking(
+                blob_store.write_temp_blob, file.file, settings.upload_buffer_size
+            )
+        try:
+            file_path = await blob_store.commit_blob(temp_path, digest, file_size)
+        except Exception:
+            await run_blocking(blob_store.remove_file, temp_path)
+            raise
         
         # Create file record in database
         file_id = str(uuid.uuid4())
@@ -62,12 +70,21 @@ async def upload_file(
             "updated_at": datetime.utcnow().isoformat()
         }
         
-        result = supabase.table(FILES_TABLE).insert(new_file).execute()
+        try:
+            result = await db.table(FILES_TABLE).insert(new_file).execute()
+        except Exception:
+            await blob_store.release_blob(file_path)
+            raise
         
         if not result.data:
+            await blob_store.release_blob(file_path)
             raise HTTPException(status_code=500, detail="Failed to create file record")
         
         created_file = result.data[0]
+        # Rendered on the thumbnail pool; the response does not wait for it
+        thumbnails.schedule(created_file["storage_path"], created_file["mime_type"])
+        await listing_cache.invalidate(user_id, created_file["folder_id"])
+        await events.publish(user_id, "created", files=[created_file["id"]])
         return FileResponse(
             id=created_file["id"],
             name=created_file["name"],
@@ -87,22 +104,19 @@ async def upload_file(
         print(f"Upload error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
-@router.get("/list", response_model=List[FileResponse])
+@router.get("/list", response_model=FileListResponse)
 async def list_files(
+    request: Request,
     folder_id: Optional[str] = None,
-    current_user_email: str = Depends(get_current_user_email)
+    sort: FileSortField = "name",
+    order: SortOrder = "asc",
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.default_page_size, ge=1, le=settings.max_page_size),
+    user_id: str = Depends(get_current_user_id)
 ):
-    try:
-        # Get user ID from email
-        user_result = supabase.table("users").select("id").eq("email", current_user_email).execute()
-        if not user_result.data:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        user_id = user_result.data[0]["id"]
-        
-        # Build query
+    async def build():
         # Only list non-trashed files
-        query = supabase.table(FILES_TABLE).select("*").eq("owner_id", user_id).eq("is_trashed", False)
+        query = db.table(FILES_TABLE).select("*").eq("owner_id", user_id).eq("is_trashed", False)
 
         if folder_id:
             query = query.eq("folder_id", folder_id)
@@ -110,28 +124,15 @@ async def list_files(
             # Supabase/PostgREST expects the string 'null' for IS NULL checks
             query = query.is_("folder_id", "null")
         
-        result = query.execute()
-        
-        if not result.data:
-            return []
-        
-        # Convert to FileResponse objects
-        files = []
-        for file_data in result.data:
-            files.append(FileResponse(
-                id=file_data["id"],
-                name=file_data["name"],
-                mime_type=file_data["mime_type"],
-                size=file_data["size"],
-                storage_path=file_data["storage_path"],
-                folder_id=file_data["folder_id"],
-                owner_id=file_data["owner_id"],
-                is_starred=file_data["is_starred"],
-                created_at=datetime.fromisoformat(file_data["created_at"]),
-                updated_at=datetime.fromisoformat(file_data["updated_at"]) if file_data["updated_at"] else None
-            ))
+        query = apply_page(query, sort, order == "desc", cursor, limit)
+        result = await query.execute()
+        rows, next_cursor = page_rows(result.data or [], sort, order == "desc", limit)
         
-        return files
+        return json_response(FileListResponse, {"items": rows, "next_cursor": next_cursor})
+
+    try:
+        view = ("files", sort, order, cursor, limit)
+        return await cached_listing(request, user_id, folder_id, view, build)
         
     except HTTPException:
         raise
@@ -139,125 +140,94 @@ async def list_files(
         print(f"List files error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
-@router.get("/trash", response_model=List[FileResponse])
+@router.get("/trash", response_model=FileListResponse)
 async def list_trashed_files(
-    current_user_email: str = Depends(get_current_user_email)
+    request: Request,
+    sort: FileSortField = "updated_at",
+    order: SortOrder = "desc",
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.default_page_size, ge=1, le=settings.max_page_size),
+    user_id: str = Depends(get_current_user_id)
 ):
-    try:
-        user_result = supabase.table("users").select("id").eq("email", current_user_email).execute()
-        if not user_result.data:
-            raise HTTPException(status_code=404, detail="User not found")
-        user_id = user_result.data[0]["id"]
-
-        result = (
-            supabase
+    async def build():
+        query = (
+            db
             .table(FILES_TABLE)
             .select("*")
             .eq("owner_id", user_id)
             .eq("is_trashed", True)
-            .execute()
         )
+        query = apply_page(query, sort, order == "desc", cursor, limit)
+        result = await query.execute()
+        rows, next_cursor = page_rows(result.data or [], sort, order == "desc", limit)
+
+        return json_response(FileListResponse, {"items": rows, "next_cursor": next_cursor})
 
-        files: List[FileResponse] = []
-        for file_data in result.data or []:
-            files.append(FileResponse(
-                id=file_data["id"],
-                name=file_data["name"],
-                mime_type=file_data["mime_type"],
-                size=file_data["size"],
-                storage_path=file_data["storage_path"],
-                folder_id=file_data["folder_id"],
-                owner_id=file_data["owner_id"],
-                is_starred=file_data["is_starred"],
-                created_at=datetime.fromisoformat(file_data["created_at"]),
-                updated_at=datetime.fromisoformat(file_data["updated_at"]) if file_data["updated_at"] else None
-            ))
-
-        return files
+    try:
+        return await listing_response(request, user_id, "trash", build)
     except HTTPException:
         raise
     except Exception as e:
         print(f"List trashed files error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
-@router.get("/starred", response_model=List[FileResponse])
+@router.get("/starred", response_model=FileListResponse)
 async def list_starred_files(
-    current_user_email: str = Depends(get_current_user_email)
+    request: Request,
+    sort: FileSortField = "name",
+    order: SortOrder = "asc",
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.default_page_size, ge=1, le=settings.max_page_size),
+    user_id: str = Depends(get_current_user_id)
 ):
-    try:
-        user_result = supabase.table("users").select("id").eq("email", current_user_email).execute()
-        if not user_result.data:
-            raise HTTPException(status_code=404, detail="User not found")
-        user_id = user_result.data[0]["id"]
-
-        result = (
-            supabase
+    async def build():
+        query = (
+            db
             .table(FILES_TABLE)
             .select("*")
             .eq("owner_id", user_id)
             .eq("is_starred", True)
             .eq("is_trashed", False)
-            .execute()
         )
+        query = apply_page(query, sort, order == "desc", cursor, limit)
+        result = await query.execute()
+        rows, next_cursor = page_rows(result.data or [], sort, order == "desc", limit)
+
+        return json_response(FileListResponse, {"items": rows, "next_cursor": next_cursor})
 
-        files: List[FileResponse] = []
-        for file_data in result.data or []:
-            files.append(FileResponse(
-                id=file_data["id"],
-                name=file_data["name"],
-                mime_type=file_data["mime_type"],
-                size=file_data["size"],
-                storage_path=file_data["storage_path"],
-                folder_id=file_data["folder_id"],
-                owner_id=file_data["owner_id"],
-                is_starred=file_data["is_starred"],
-                created_at=datetime.fromisoformat(file_data["created_at"]),
-                updated_at=datetime.fromisoformat(file_data["updated_at"]) if file_data["updated_at"] else None
-            ))
-
-        return files
+    try:
+        return await listing_response(request, user_id, "starred", build)
     except HTTPException:
         raise
     except Exception as e:
         print(f"List starred files error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
-@router.get("/recent", response_model=List[FileResponse])
+@router.get("/recent", response_model=FileListResponse)
 async def list_recent_files(
-    current_user_email: str = Depends(get_current_user_email)
+    request: Request,
+    sort: FileSortField = "updated_at",
+    order: SortOrder = "desc",
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.default_page_size, ge=1, le=settings.max_page_size),
+    user_id: str = Depends(get_current_user_id)
 ):
-    try:
-        user_result = supabase.table("users").select("id").eq("email", current_user_email).execute()
-        if not user_result.data:
-            raise HTTPException(status_code=404, detail="User not found")
-        user_id = user_result.data[0]["id"]
-
-        result = (
-            supabase
+    async def build():
+        query = (
+            db
             .table(FILES_TABLE)
             .select("*")
             .eq("owner_id", user_id)
             .eq("is_trashed", False)
-            .order("updated_at", desc=True)
-            .execute()
         )
+        query = apply_page(query, sort, order == "desc", cursor, limit)
+        result = await query.execute()
+        rows, next_cursor = page_rows(result.data or [], sort, order == "desc", limit)
+
+        return json_response(FileListResponse, {"items": rows, "next_cursor": next_cursor})
 
-        files: List[FileResponse] = []
-        for file_data in result.data or []:
-            files.append(FileResponse(
-                id=file_data["id"],
-                name=file_data["name"],
-                mime_type=file_data["mime_type"],
-                size=file_data["size"],
-                storage_path=file_data["storage_path"],
-                folder_id=file_data["folder_id"],
-                owner_id=file_data["owner_id"],
-                is_starred=file_data["is_starred"],
-                created_at=datetime.fromisoformat(file_data["created_at"]),
-                updated_at=datetime.fromisoformat(file_data["updated_at"]) if file_data["updated_at"] else None
-            ))
-
-        return files
+    try:
+        return await listing_response(request, user_id, "recent", build)
     except HTTPException:
         raise
     except Exception as e:
@@ -267,19 +237,12 @@ async def list_recent_files(
 @router.get("/{file_id}", response_model=FileResponse)
 async def get_file(
     file_id: str,
-    current_user_email: str = Depends(get_current_user_email)
+    user_id: str = Depends(get_current_user_id)
 ):
     try:
-        # Get user ID from email
-        user_result = supabase.table("users").select("id").eq("email", current_user_email).execute()
-        if not user_result.data:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        user_id = user_result.data[0]["id"]
-        
         # Get file from database (non-trashed only)
-        result = (
-            supabase
+        result = await (
+            db
             .table(FILES_TABLE)
             .select("*")
             .eq("id", file_id)
@@ -314,37 +277,233 @@ async def get_file(
         print(f"Get file error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
-@router.delete("/{file_id}")
-async def delete_file(
+def _file_etag(file_data: dict) -> str:
+    # Strong validator derived from the stored row: any re-upload or update bumps updated_at
+    stamp = file_data.get("updated_at") or file_data["created_at"]
+    digest = hashlib.sha1(f"{file_data['id']}:{file_data['size']}:{stamp}".encode()).hexdigest()
+    return f'"{digest}"'
+
+def _file_last_modified(file_data: dict) -> datetime:
+    modified = datetime.fromisoformat(file_data.get("updated_at") or file_data["created_at"])
+    if modified.tzinfo is None:
+        modified = modified.replace(tzinfo=timezone.utc)
+    # HTTP dates only carry whole seconds
+    return modified.astimezone(timezone.utc).replace(microsecond=0)
+
+def _parse_http_date(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+def _is_not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match takes precedence over If-Modified-Since
+        return etag_matches(if_none_match, etag)
+    since = _parse_http_date(request.headers.get("if-modified-since"))
+    return since is not None and last_modified <= since
+
+def _if_range_allows(request: Request, etag: str, last_modified: datetime) -> bool:
+    if_range = request.headers.get("if-range")
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        # Strong comparison: weak validators never satisfy If-Range
+        return if_range == etag
+    return _parse_http_date(if_range) == last_modified
+
+def _parse_range(header: str, file_size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single-range ``bytes=`` header into an inclusive (start, end) pair.
+
+    Returns None when the header should be ignored (malformed or multi-range) and
+    raises 416 when it is well-formed but cannot be satisfied.
+    """
+    unit, _, ranges = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+    start_text, sep, end_text = ranges.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if start_text == "":
+            # Suffix range: the last N bytes
+            suffix = int(end_text)
+            if suffix <= 0:
+                raise ValueError
+            start, end = max(file_size - suffix, 0), file_size - 1
+        else:
+            start = int(start_text)
+            end = int(end_text) if end_text else max(start, file_size - 1)
+            if start < 0 or end < start:
+                return None
+            end = min(end, file_size - 1)
+    except ValueError:
+        return None
+
+    if file_size == 0 or start >= file_size:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{file_size}"}
+        )
+    return start, end
+
+@router.api_route("/{file_id}/content", methods=["GET", "HEAD"])
+async def download_file(
     file_id: str,
-    current_user_email: str = Depends(get_current_user_email)
+    request: Request,
+    download: bool = True,
+    user_id: str = Depends(get_current_user_id)
 ):
     try:
-        # Get user ID from email
-        user_result = supabase.table("users").select("id").eq("email", current_user_email).execute()
-        if not user_result.data:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        user_id = user_result.data[0]["id"]
-        
-        # Get file from database
-        result = supabase.table(FILES_TABLE).select("*").eq("id", file_id).eq("owner_id", user_id).execute()
-        
+        result = await (
+            db
+            .table(FILES_TABLE)
+            .select("*")
+            .eq("id", file_id)
+            .eq("owner_id", user_id)
+            .eq("is_trashed", False)
+            .execute()
+        )
         if not result.data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="File not found"
-            )
-        
+            raise HTTPException(status_code=404, detail="File not found")
+
+        file_data = result.data[0]
+        etag = _file_etag(file_data)
+        last_modified = _file_last_modified(file_data)
+        headers = {
+            "ETag": etag,
+            "Last-Modified": format_datetime(last_modified, usegmt=True),
+            "Accept-Ranges": "bytes",
+            "Cache-Control": "private, no-cache",
+        }
+
+        if _is_not_modified(request, etag, last_modified):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        driver, key = blob_store.locate(file_data["storage_path"])
+        file_size = await run_blocking(driver.stat, key)
+        if file_size is None:
+            raise HTTPException(status_code=404, detail="File content not found")
+
+        disposition = "attachment" if download else "inline"
+        headers["Content-Disposition"] = f"{disposition}; filename*=UTF-8''{quote(file_data['name'])}"
+
+        start, end = 0, file_size - 1
+        status_code = status.HTTP_200_OK
+        range_header = request.headers.get("range")
+        if range_header and _if_range_allows(request, etag, last_modified):
+            byte_range = _parse_range(range_header, file_size)
+            if byte_range is not None:
+                start, end = byte_range
+                status_code = status.HTTP_206_PARTIAL_CONTENT
+                headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+
+        length = end - start + 1
+        headers["Content-Length"] = str(length)
+        media_type = file_data["mime_type"] or "application/octet-stream"
+
+        if request.method == "HEAD" or length == 0:
+            return Response(status_code=status_code, headers=headers, media_type=media_type)
+
+        return StreamingResponse(
+            # Sync iterator: Starlette drains it in the threadpool, keeping storage reads off the event loop
+            driver.get_range(key, start, length, settings.download_chunk_size),
+            status_code=status_code,
+            headers=headers,
+            media_type=media_type
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Download file error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/{file_id}/thumbnail")
+async def get_thumbnail(
+    file_id: str,
+    request: Request,
+    size: int = Query(256, ge=1, le=4096),
+    user_id: str = Depends(get_current_user_id)
+):
+    try:
+        result = await (
+            db
+            .table(FILES_TABLE)
+            .select("storage_path, mime_type")
+            .eq("id", file_id)
+            .eq("owner_id", user_id)
+            .eq("is_trashed", False)
+            .execute()
+        )
+        if not result.data:
+            raise HTTPException(status_code=404, detail="File not found")
+
         file_data = result.data[0]
+        if not thumbnails.supports(file_data["mime_type"]):
+            raise HTTPException(status_code=404, detail="No thumbnail for this file type")
+
+        key = blob_store.thumbnail_key(file_data["storage_path"], thumbnails.pick_size(size))
+        # Keyed by content digest, so the bytes behind this URL never change
+        headers = {
+            "ETag": f'"{key}"',
+            "Cache-Control": "private, max-age=31536000, immutable",
+        }
+        if etag_matches(request.headers.get("if-none-match") or "", headers["ETag"]):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        length = await run_blocking(storage.stat, key)
+        if length is None:
+            # Not rendered yet (still queued, or stored before thumbnails existed)
+            if not await thumbnails.ensure(file_data["storage_path"], file_data["mime_type"]):
+                raise HTTPException(status_code=404, detail="Thumbnail not available")
+            length = await run_blocking(storage.stat, key)
+            if length is None:
+                # Deleted with its blob in the meantime
+                raise HTTPException(status_code=404, detail="Thumbnail not available")
+
+        headers["Content-Length"] = str(length)
+        return StreamingResponse(
+            storage.get_range(key, 0, length, settings.download_chunk_size),
+            headers=headers,
+            media_type=thumbnails.MEDIA_TYPE
+        )
 
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Get thumbnail error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.delete("/{file_id}")
+async def delete_file(
+    file_id: str,
+    user_id: str = Depends(get_current_user_id)
+):
+    try:
         # Soft delete: mark as trashed
-        supabase.table(FILES_TABLE).update({
+        result = await db.table(FILES_TABLE).update({
             "is_trashed": True,
             "trashed_at": datetime.utcnow().isoformat(),
             "updated_at": datetime.utcnow().isoformat()
-        }).eq("id", file_id).execute()
+        }).eq("id", file_id).eq("owner_id", user_id).execute()
+
+        if not result.data:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="File not found"
+            )
 
+        await listing_cache.invalidate(user_id, result.data[0]["folder_id"])
+        await events.publish(user_id, "trashed", files=[file_id])
         return {"message": "File moved to trash"}
         
     except HTTPException:
@@ -356,32 +515,22 @@ async def delete_file(
 @router.put("/{file_id}/star")
 async def toggle_file_star(
     file_id: str,
-    current_user_email: str = Depends(get_current_user_email)
+    user_id: str = Depends(get_current_user_id)
 ):
     try:
-        # Get user ID from email
-        user_result = supabase.table("users").select("id").eq("email", current_user_email).execute()
-        if not user_result.data:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        user_id = user_result.data[0]["id"]
-        
-        # Get file from database
-        result = supabase.table(FILES_TABLE).select("*").eq("id", file_id).eq("owner_id", user_id).execute()
-        
+        # Flipped in the database, so concurrent toggles cannot lose an update
+        result = await db.rpc("toggle_file_star", {"p_file_id": file_id, "p_owner_id": user_id}).execute()
+
         if not result.data:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="File not found"
             )
-        
-        file_data = result.data[0]
-        new_starred_status = not file_data["is_starred"]
-        
-        # Update star status
-        supabase.table(FILES_TABLE).update({"is_starred": new_starred_status}).eq("id", file_id).execute()
-        
-        return {"message": f"File {'starred' if new_starred_status else 'unstarred'}"}
+
+        is_starred = result.data[0]["is_starred"]
+        await listing_cache.invalidate(user_id, result.data[0]["folder_id"])
+        await events.publish(user_id, "updated", files=[file_id])
+        return {"message": f"File {'starred' if is_starred else 'unstarred'}", "is_starred": is_starred}
         
     except HTTPException:
         raise
@@ -392,19 +541,18 @@ async def toggle_file_star(
 @router.put("/{file_id}/restore")
 async def restore_file(
     file_id: str,
-    current_user_email: str = Depends(get_current_user_email)
+    user_id: str = Depends(get_current_user_id)
 ):
     try:
-        user_result = supabase.table("users").select("id").eq("email", current_user_email).execute()
-        if not user_result.data:
-            raise HTTPException(status_code=404, detail="User not found")
-        user_id = user_result.data[0]["id"]
-
-        # Ensure file belongs to user and is trashed
-        result = (
-            supabase
+        # Only restores the file if it belongs to the user and is in the trash
+        result = await (
+            db
             .table(FILES_TABLE)
-            .select("*")
+            .update({
+                "is_trashed": False,
+                "trashed_at": None,
+                "updated_at": datetime.utcnow().isoformat()
+            })
             .eq("id", file_id)
             .eq("owner_id", user_id)
             .eq("is_trashed", True)
@@ -413,12 +561,8 @@ async def restore_file(
         if not result.data:
             raise HTTPException(status_code=404, detail="File not found or not in trash")
 
-        supabase.table(FILES_TABLE).update({
-            "is_trashed": False,
-            "trashed_at": None,
-            "updated_at": datetime.utcnow().isoformat()
-        }).eq("id", file_id).execute()
-
+        await listing_cache.invalidate(user_id, result.data[0]["folder_id"])
+        await events.publish(user_id, "restored", files=[file_id])
         return {"message": "File restored"}
     except HTTPException:
         raise
@@ -429,29 +573,25 @@ async def restore_file(
 @router.delete("/{file_id}/permanent")
 async def permanently_delete_file(
     file_id: str,
-    current_user_email: str = Depends(get_current_user_email)
+    user_id: str = Depends(get_current_user_id)
 ):
     try:
-        user_result = supabase.table("users").select("id").eq("email", current_user_email).execute()
-        if not user_result.data:
-            raise HTTPException(status_code=404, detail="User not found")
-        user_id = user_result.data[0]["id"]
-
-        result = supabase.table(FILES_TABLE).select("*").eq("id", file_id).eq("owner_id", user_id).execute()
+        # The deleted row comes back with its storage path
+        result = await db.table(FILES_TABLE).delete().eq("id", file_id).eq("owner_id", user_id).execute()
         if not result.data:
             raise HTTPException(status_code=404, detail="File not found")
 
         file_data = result.data[0]
 
-        # Delete physical file if exists
+        # Drop this row's reference to the blob; it is unlinked once unreferenced
         try:
-            if os.path.exists(file_data["storage_path"]):
-                os.remove(file_data["storage_path"])
+            await blob_store.release_blob(file_data["storage_path"])
         except Exception as e:
             # Do not block permanent delete on fs error
-            print(f"Warning: failed to remove file from disk: {e}")
+            print(f"Warning: failed to release file blob: {e}")
 
-        supabase.table(FILES_TABLE).delete().eq("id", file_id).execute()
+        await listing_cache.invalidate(user_id, file_data["folder_id"])
+        await events.publish(user_id, "deleted", files=[file_id])
         return {"message": "File permanently deleted"}
     except HTTPException:
         raise
@@ -1,10 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
 from typing import Optional, List
 from uuid import UUID
-from supabase_client import supabase, FOLDERS_TABLE, FILES_TABLE
-from schemas import FolderCreate, FolderResponse
-from auth_utils import get_current_user_email
+from supabase_client import FOLDERS_TABLE, FILES_TABLE
+from repository import db
+from serialization import json_response
+from schemas import FolderCreate, FolderResponse, FolderListResponse, FolderContentsResponse, FolderUsageResponse
+from auth_utils import get_current_user_id
+from conditional import cached_listing, listing_response
+from config import settings
+from pagination import FolderSortField, SortOrder, apply_page, page_rows
+from postgrest.exceptions import APIError
+from urllib.parse import quote
+import archive
+import blob_store
+import events
+import listing_cache
 from datetime import datetime
+import asyncio
 import uuid
 
 router = APIRouter()
@@ -13,17 +26,12 @@ router = APIRouter()
 @router.post("/create", response_model=FolderResponse)
 async def create_folder(
     folder_data: FolderCreate,
-    current_user_email: str = Depends(get_current_user_email)
+    user_id: str = Depends(get_current_user_id)
 ):
     try:
-        user_result = supabase.table("users").select("id").eq("email", current_user_email).execute()
-        if not user_result.data:
-            raise HTTPException(status_code=404, detail="User not found")
-        user_id = user_result.data[0]["id"]
-
         # Validate parent folder
         if folder_data.parent_id:
-            parent_result = supabase.table(FOLDERS_TABLE).select("id").eq("id", folder_data.parent_id).eq("owner_id", user_id).execute()
+            parent_result = await db.table(FOLDERS_TABLE).select("id").eq("id", folder_data.parent_id).eq("owner_id", user_id).execute()
             if not parent_result.data:
                 raise HTTPException(status_code=404, detail="Parent folder not found")
 
@@ -37,14 +45,16 @@ async def create_folder(
             "owner_id": user_id,
             "is_starred": False,
             "created_at": now,
-            "updated_at": None
+            "updated_at": now
         }
 
-        result = supabase.table(FOLDERS_TABLE).insert(new_folder).execute()
+        result = await db.table(FOLDERS_TABLE).insert(new_folder).execute()
         if not result.data:
             raise HTTPException(status_code=500, detail="Failed to create folder")
 
         created_folder = result.data[0]
+        await listing_cache.invalidate(user_id, created_folder["parent_id"])
+        await events.publish(user_id, "created", folders=[created_folder["id"]])
         return FolderResponse(
             id=created_folder["id"],
             name=created_folder["name"],
@@ -60,170 +70,325 @@ async def create_folder(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 # 📂 List Folders
-@router.get("/list", response_model=List[FolderResponse])
+@router.get("/list", response_model=FolderListResponse)
 async def list_folders(
+    request: Request,
     parent_id: Optional[str] = None,
-    current_user_email: str = Depends(get_current_user_email)
+    sort: FolderSortField = "name",
+    order: SortOrder = "asc",
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.default_page_size, ge=1, le=settings.max_page_size),
+    user_id: str = Depends(get_current_user_id)
 ):
-    try:
-        user_result = supabase.table("users").select("id").eq("email", current_user_email).execute()
-        if not user_result.data:
-            raise HTTPException(status_code=404, detail="User not found")
-        user_id = user_result.data[0]["id"]
-
+    async def build():
         # Only list non-trashed folders
-        query = supabase.table(FOLDERS_TABLE).select("*").eq("owner_id", user_id).eq("is_trashed", False)
+        query = db.table(FOLDERS_TABLE).select("*").eq("owner_id", user_id).eq("is_trashed", False)
         if parent_id:
             query = query.eq("parent_id", parent_id)
         else:
             # Supabase/PostgREST expects the string 'null' for IS NULL checks
             query = query.is_("parent_id", "null")
 
-        result = query.execute()
-        if not result.data:
-            return []
-
-        return [
-            FolderResponse(
-                id=folder["id"],
-                name=folder["name"],
-                parent_id=folder["parent_id"],
-                owner_id=folder["owner_id"],
-                is_starred=folder["is_starred"],
-                created_at=datetime.fromisoformat(folder["created_at"]),
-                updated_at=datetime.fromisoformat(folder["updated_at"]) if folder["updated_at"] else None
-            )
-            for folder in result.data
-        ]
+        query = apply_page(query, sort, order == "desc", cursor, limit)
+        result = await query.execute()
+        rows, next_cursor = page_rows(result.data or [], sort, order == "desc", limit)
+
+        return json_response(FolderListResponse, {"items": rows, "next_cursor": next_cursor})
+
+    try:
+        view = ("folders", sort, order, cursor, limit)
+        return await cached_listing(request, user_id, parent_id, view, build)
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"List folders error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
-@router.get("/trash", response_model=List[FolderResponse])
+@router.get("/trash", response_model=FolderListResponse)
 async def list_trashed_folders(
-    current_user_email: str = Depends(get_current_user_email)
+    request: Request,
+    sort: FolderSortField = "updated_at",
+    order: SortOrder = "desc",
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.default_page_size, ge=1, le=settings.max_page_size),
+    user_id: str = Depends(get_current_user_id)
 ):
-    try:
-        user_result = supabase.table("users").select("id").eq("email", current_user_email).execute()
-        if not user_result.data:
-            raise HTTPException(status_code=404, detail="User not found")
-        user_id = user_result.data[0]["id"]
-
-        result = (
-            supabase
+    async def build():
+        query = (
+            db
             .table(FOLDERS_TABLE)
             .select("*")
             .eq("owner_id", user_id)
             .eq("is_trashed", True)
-            .execute()
         )
+        query = apply_page(query, sort, order == "desc", cursor, limit)
+        result = await query.execute()
+        rows, next_cursor = page_rows(result.data or [], sort, order == "desc", limit)
+
+        return json_response(FolderListResponse, {"items": rows, "next_cursor": next_cursor})
 
-        return [
-            FolderResponse(
-                id=folder["id"],
-                name=folder["name"],
-                parent_id=folder["parent_id"],
-                owner_id=folder["owner_id"],
-                is_starred=folder["is_starred"],
-                created_at=datetime.fromisoformat(folder["created_at"]),
-                updated_at=datetime.fromisoformat(folder["updated_at"]) if folder["updated_at"] else None
-            )
-            for folder in (result.data or [])
-        ]
+    try:
+        return await listing_response(request, user_id, "trash", build)
     except HTTPException:
         raise
     except Exception as e:
         print(f"List trashed folders error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
-@router.get("/starred", response_model=List[FolderResponse])
+@router.get("/starred", response_model=FolderListResponse)
 async def list_starred_folders(
-    current_user_email: str = Depends(get_current_user_email)
+    request: Request,
+    sort: FolderSortField = "name",
+    order: SortOrder = "asc",
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.default_page_size, ge=1, le=settings.max_page_size),
+    user_id: str = Depends(get_current_user_id)
 ):
-    try:
-        user_result = supabase.table("users").select("id").eq("email", current_user_email).execute()
-        if not user_result.data:
-            raise HTTPException(status_code=404, detail="User not found")
-        user_id = user_result.data[0]["id"]
-
-        result = (
-            supabase
+    async def build():
+        query = (
+            db
             .table(FOLDERS_TABLE)
             .select("*")
             .eq("owner_id", user_id)
             .eq("is_starred", True)
             .eq("is_trashed", False)
-            .execute()
         )
+        query = apply_page(query, sort, order == "desc", cursor, limit)
+        result = await query.execute()
+        rows, next_cursor = page_rows(result.data or [], sort, order == "desc", limit)
+
+        return json_response(FolderListResponse, {"items": rows, "next_cursor": next_cursor})
 
-        return [
-            FolderResponse(
-                id=folder["id"],
-                name=folder["name"],
-                parent_id=folder["parent_id"],
-                owner_id=folder["owner_id"],
-                is_starred=folder["is_starred"],
-                created_at=datetime.fromisoformat(folder["created_at"]),
-                updated_at=datetime.fromisoformat(folder["updated_at"]) if folder["updated_at"] else None
-            )
-            for folder in (result.data or [])
-        ]
+    try:
+        return await listing_response(request, user_id, "starred", build)
     except HTTPException:
         raise
     except Exception as e:
         print(f"List starred folders error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
-@router.get("/recent", response_model=List[FolderResponse])
+@router.get("/recent", response_model=FolderListResponse)
 async def list_recent_folders(
-    current_user_email: str = Depends(get_current_user_email)
+    request: Request,
+    sort: FolderSortField = "updated_at",
+    order: SortOrder = "desc",
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.default_page_size, ge=1, le=settings.max_page_size),
+    user_id: str = Depends(get_current_user_id)
 ):
+    async def build():
+        query = (
+            db
+            .table(FOLDERS_TABLE)
+            .select("*")
+            .eq("owner_id", user_id)
+            .eq("is_trashed", False)
+        )
+        query = apply_page(query, sort, order == "desc", cursor, limit)
+        result = await query.execute()
+        rows, next_cursor = page_rows(result.data or [], sort, order == "desc", limit)
+
+        return json_response(FolderListResponse, {"items": rows, "next_cursor": next_cursor})
+
     try:
-        user_result = supabase.table("users").select("id").eq("email", current_user_email).execute()
-        if not user_result.data:
-            raise HTTPException(status_code=404, detail="User not found")
-        user_id = user_result.data[0]["id"]
+        return await listing_response(request, user_id, "recent", build)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"List recent folders error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
 
-        result = (
-            supabase
+async def _folder_contents(
+    user_id: str,
+    folder_id: Optional[str],
+    sort: str,
+    order: str,
+    folder_cursor: Optional[str],
+    file_cursor: Optional[str],
+    limit: int
+) -> dict:
+    desc = order == "desc"
+    # Once the client is paging, only the kinds it still holds a cursor for are fetched
+    paging = folder_cursor is not None or file_cursor is not None
+
+    async def fetch_folder():
+        return await (
+            db
             .table(FOLDERS_TABLE)
             .select("*")
+            .eq("id", folder_id)
             .eq("owner_id", user_id)
             .eq("is_trashed", False)
-            .order("updated_at", desc=True)
             .execute()
         )
 
-        return [
-            FolderResponse(
-                id=folder["id"],
-                name=folder["name"],
-                parent_id=folder["parent_id"],
-                owner_id=folder["owner_id"],
-                is_starred=folder["is_starred"],
-                created_at=datetime.fromisoformat(folder["created_at"]),
-                updated_at=datetime.fromisoformat(folder["updated_at"]) if folder["updated_at"] else None
-            )
-            for folder in (result.data or [])
-        ]
+    async def fetch_subfolders():
+        # Totals are only counted on the first page
+        query = (
+            db
+            .table(FOLDERS_TABLE)
+            .select("*", count=None if folder_cursor else "exact")
+            .eq("owner_id", user_id)
+            .eq("is_trashed", False)
+        )
+        query = query.eq("parent_id", folder_id) if folder_id else query.is_("parent_id", "null")
+        return await apply_page(query, sort, desc, folder_cursor, limit).execute()
+
+    async def fetch_files():
+        query = (
+            db
+            .table(FILES_TABLE)
+            .select("*", count=None if file_cursor else "exact")
+            .eq("owner_id", user_id)
+            .eq("is_trashed", False)
+        )
+        query = query.eq("folder_id", folder_id) if folder_id else query.is_("folder_id", "null")
+        return await apply_page(query, sort, desc, file_cursor, limit).execute()
+
+    async def skipped():
+        return None
+
+    folder_result, subfolder_result, file_result = await asyncio.gather(
+        fetch_folder() if folder_id else skipped(),
+        fetch_subfolders() if folder_cursor or not paging else skipped(),
+        fetch_files() if file_cursor or not paging else skipped()
+    )
+
+    if folder_id and not folder_result.data:
+        raise HTTPException(status_code=404, detail="Folder not found")
+
+    folder_rows, next_folder_cursor = page_rows(subfolder_result.data or [], sort, desc, limit) if subfolder_result else ([], None)
+    file_rows, next_file_cursor = page_rows(file_result.data or [], sort, desc, limit) if file_result else ([], None)
+
+    return {
+        "folder": folder_result.data[0] if folder_id else None,
+        "folders": folder_rows,
+        "files": file_rows,
+        "folder_count": subfolder_result.count if subfolder_result else None,
+        "file_count": file_result.count if file_result else None,
+        "next_folder_cursor": next_folder_cursor,
+        "next_file_cursor": next_file_cursor
+    }
+
+async def _cached_contents(
+    request: Request,
+    user_id: str,
+    folder_id: Optional[str],
+    sort: str,
+    order: str,
+    folder_cursor: Optional[str],
+    file_cursor: Optional[str],
+    limit: int
+):
+    async def build():
+        contents = await _folder_contents(user_id, folder_id, sort, order, folder_cursor, file_cursor, limit)
+        return json_response(FolderContentsResponse, contents)
+
+    view = ("contents", sort, order, folder_cursor, file_cursor, limit)
+    return await cached_listing(request, user_id, folder_id, view, build)
+
+# 📂 Root Contents
+@router.get("/contents", response_model=FolderContentsResponse)
+async def get_root_contents(
+    request: Request,
+    sort: FolderSortField = "name",
+    order: SortOrder = "asc",
+    folder_cursor: Optional[str] = None,
+    file_cursor: Optional[str] = None,
+    limit: int = Query(settings.default_page_size, ge=1, le=settings.max_page_size),
+    user_id: str = Depends(get_current_user_id)
+):
+    try:
+        return await _cached_contents(request, user_id, None, sort, order, folder_cursor, file_cursor, limit)
     except HTTPException:
         raise
     except Exception as e:
-        print(f"List recent folders error: {e}")
+        print(f"Get root contents error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+# 📂 Folder Contents
+@router.get("/{folder_id}/contents", response_model=FolderContentsResponse)
+async def get_folder_contents(
+    request: Request,
+    folder_id: UUID,
+    sort: FolderSortField = "name",
+    order: SortOrder = "asc",
+    folder_cursor: Optional[str] = None,
+    file_cursor: Optional[str] = None,
+    limit: int = Query(settings.default_page_size, ge=1, le=settings.max_page_size),
+    user_id: str = Depends(get_current_user_id)
+):
+    try:
+        return await _cached_contents(request, user_id, str(folder_id), sort, order, folder_cursor, file_cursor, limit)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Get folder contents error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+# 📂 Folder Path
+@router.get("/{folder_id}/path", response_model=List[FolderResponse])
+async def get_folder_path(folder_id: UUID, user_id: str = Depends(get_current_user_id)):
+    try:
+        # Ancestors from the root down to the folder itself, resolved from the
+        # folder's materialized path in a single query
+        result = await db.rpc("folder_ancestors", {"p_folder_id": str(folder_id), "p_owner_id": user_id}).execute()
+        if not result.data:
+            raise HTTPException(status_code=404, detail="Folder not found")
+
+        return json_response(List[FolderResponse], result.data)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Get folder path error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+# 📊 Folder Usage
+@router.get("/{folder_id}/usage", response_model=FolderUsageResponse)
+async def get_folder_usage(folder_id: UUID, user_id: str = Depends(get_current_user_id)):
+    try:
+        # Subtree totals are maintained incrementally (add_usage_aggregates.sql)
+        result = await db.rpc("get_folder_usage", {"p_folder_id": str(folder_id), "p_owner_id": user_id}).execute()
+        if not result.data:
+            raise HTTPException(status_code=404, detail="Folder not found")
+
+        return FolderUsageResponse(**result.data)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Get folder usage error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+# 📂 Download Folder
+@router.get("/{folder_id}/archive")
+async def download_folder_archive(folder_id: UUID, user_id: str = Depends(get_current_user_id)):
+    try:
+        tree = await archive.folder_tree(str(folder_id), user_id)
+        if not tree:
+            raise HTTPException(status_code=404, detail="Folder not found")
+
+        # Built while it is sent, so the size isn't known up front
+        return StreamingResponse(
+            archive.stream(tree, user_id),
+            media_type="application/zip",
+            headers={
+                "Content-Disposition": f"attachment; filename*=UTF-8''{quote(tree[0]['name'] + '.zip')}",
+                "Cache-Control": "private, no-store",
+            }
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Download folder error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 # 📂 Get Folder
 @router.get("/{folder_id}", response_model=FolderResponse)
-async def get_folder(folder_id: UUID, current_user_email: str = Depends(get_current_user_email)):
+async def get_folder(folder_id: UUID, user_id: str = Depends(get_current_user_id)):
     try:
-        user_result = supabase.table("users").select("id").eq("email", current_user_email).execute()
-        if not user_result.data:
-            raise HTTPException(status_code=404, detail="User not found")
-        user_id = user_result.data[0]["id"]
-
-        result = (
-            supabase
+        result = await (
+            db
             .table(FOLDERS_TABLE)
             .select("*")
             .eq("id", str(folder_id))
@@ -253,31 +418,31 @@ async def get_folder(folder_id: UUID, current_user_email: str = Depends(get_curr
 async def update_folder(
     folder_id: UUID,
     folder_data: FolderCreate,
-    current_user_email: str = Depends(get_current_user_email)
+    user_id: str = Depends(get_current_user_id)
 ):
     try:
-        user_result = supabase.table("users").select("id").eq("email", current_user_email).execute()
-        if not user_result.data:
-            raise HTTPException(status_code=404, detail="User not found")
-        user_id = user_result.data[0]["id"]
-
-        folder = supabase.table(FOLDERS_TABLE).select("*").eq("id", str(folder_id)).eq("owner_id", user_id).execute()
-        if not folder.data:
-            raise HTTPException(status_code=404, detail="Folder not found")
-
-        if folder_data.parent_id:
-            parent = supabase.table(FOLDERS_TABLE).select("id").eq("id", folder_data.parent_id).eq("owner_id", user_id).execute()
-            if not parent.data:
+        # One statement: the function checks the new parent's owner and the
+        # set_folder_path trigger rejects moves into the folder's own subtree
+        try:
+            result = await db.rpc("update_folder", {
+                "p_folder_id": str(folder_id),
+                "p_owner_id": user_id,
+                "p_name": folder_data.name,
+                "p_parent_id": folder_data.parent_id
+            }).execute()
+        except APIError as e:
+            if e.code in ("P0002", "23503"):
                 raise HTTPException(status_code=404, detail="Parent folder not found")
+            if e.code == "23514":
+                raise HTTPException(status_code=400, detail="Cannot move a folder into itself or one of its subfolders")
+            raise
+        if not result.data:
+            raise HTTPException(status_code=404, detail="Folder not found")
 
-        update_data = {
-            "name": folder_data.name,
-            "parent_id": folder_data.parent_id,
-            "updated_at": datetime.utcnow().isoformat()
-        }
-        supabase.table(FOLDERS_TABLE).update(update_data).eq("id", str(folder_id)).execute()
-
-        updated = supabase.table(FOLDERS_TABLE).select("*").eq("id", str(folder_id)).execute().data[0]
+        updated = result.data[0]
+        # Its own contents show the folder itself; a move changes both parents
+        await listing_cache.invalidate(user_id, updated["id"], updated["parent_id"], updated["previous_parent_id"])
+        await events.publish(user_id, "updated", folders=[updated["id"]])
         return FolderResponse(
             id=updated["id"],
             name=updated["name"],
@@ -287,51 +452,46 @@ async def update_folder(
             created_at=datetime.fromisoformat(updated["created_at"]),
             updated_at=datetime.fromisoformat(updated["updated_at"]) if updated["updated_at"] else None
         )
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Update folder error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 # 📂 Delete Folder
 @router.delete("/{folder_id}")
-async def delete_folder(folder_id: UUID, current_user_email: str = Depends(get_current_user_email)):
+async def delete_folder(folder_id: UUID, user_id: str = Depends(get_current_user_id)):
     try:
-        user_result = supabase.table("users").select("id").eq("email", current_user_email).execute()
-        if not user_result.data:
-            raise HTTPException(status_code=404, detail="User not found")
-        user_id = user_result.data[0]["id"]
-
-        folder = supabase.table(FOLDERS_TABLE).select("id").eq("id", str(folder_id)).eq("owner_id", user_id).execute()
+        folder = await db.table(FOLDERS_TABLE).select("id").eq("id", str(folder_id)).eq("owner_id", user_id).execute()
         if not folder.data:
             raise HTTPException(status_code=404, detail="Folder not found")
 
-        # Soft delete folder (do not require empty)
-        supabase.table(FOLDERS_TABLE).update({
-            "is_trashed": True,
-            "trashed_at": datetime.utcnow().isoformat(),
-            "updated_at": datetime.utcnow().isoformat()
-        }).eq("id", str(folder_id)).execute()
-        return {"message": "Folder moved to trash"}
+        # Soft delete the folder with all of its subfolders and files (do not require empty)
+        result = await db.rpc("trash_folder_tree", {"p_folder_id": str(folder_id), "p_owner_id": user_id}).execute()
+        # Its whole subtree is gone from the listings
+        await listing_cache.invalidate_owner(user_id)
+        await events.publish(user_id, "trashed", folders=[folder_id])
+        return {"message": "Folder moved to trash", **result.data}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Delete folder error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 # ⭐ Toggle Star
 @router.put("/{folder_id}/star")
-async def toggle_folder_star(folder_id: UUID, current_user_email: str = Depends(get_current_user_email)):
+async def toggle_folder_star(folder_id: UUID, user_id: str = Depends(get_current_user_id)):
     try:
-        user_result = supabase.table("users").select("id").eq("email", current_user_email).execute()
-        if not user_result.data:
-            raise HTTPException(status_code=404, detail="User not found")
-        user_id = user_result.data[0]["id"]
-
-        result = supabase.table(FOLDERS_TABLE).select("is_starred").eq("id", str(folder_id)).eq("owner_id", user_id).execute()
+        result = await db.rpc("toggle_folder_star", {"p_folder_id": str(folder_id), "p_owner_id": user_id}).execute()
         if not result.data:
             raise HTTPException(status_code=404, detail="Folder not found")
 
-        current_star = result.data[0]["is_starred"]
-        supabase.table(FOLDERS_TABLE).update({"is_starred": not current_star}).eq("id", str(folder_id)).execute()
-
-        return {"message": f"Folder {'starred' if not current_star else 'unstarred'}"}
+        is_starred = result.data[0]["is_starred"]
+        await listing_cache.invalidate(user_id, str(folder_id), result.data[0]["parent_id"])
+        await events.publish(user_id, "updated", folders=[folder_id])
+        return {"message": f"Folder {'starred' if is_starred else 'unstarred'}", "is_starred": is_starred}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Toggle folder star error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -339,16 +499,11 @@ async def toggle_folder_star(folder_id: UUID, current_user_email: str = Depends(
 @router.put("/{folder_id}/restore")
 async def restore_folder(
     folder_id: UUID,
-    current_user_email: str = Depends(get_current_user_email)
+    user_id: str = Depends(get_current_user_id)
 ):
     try:
-        user_result = supabase.table("users").select("id").eq("email", current_user_email).execute()
-        if not user_result.data:
-            raise HTTPException(status_code=404, detail="User not found")
-        user_id = user_result.data[0]["id"]
-
-        result = (
-            supabase
+        result = await (
+            db
             .table(FOLDERS_TABLE)
             .select("*")
             .eq("id", str(folder_id))
@@ -359,13 +514,12 @@ async def restore_folder(
         if not result.data:
             raise HTTPException(status_code=404, detail="Folder not found or not in trash")
 
-        supabase.table(FOLDERS_TABLE).update({
-            "is_trashed": False,
-            "trashed_at": None,
-            "updated_at": datetime.utcnow().isoformat()
-        }).eq("id", str(folder_id)).execute()
+        # Brings back everything that was trashed together with the folder
+        restored = await db.rpc("restore_folder_tree", {"p_folder_id": str(folder_id), "p_owner_id": user_id}).execute()
 
-        return {"message": "Folder restored"}
+        await listing_cache.invalidate_owner(user_id)
+        await events.publish(user_id, "restored", folders=[folder_id])
+        return {"message": "Folder restored", **restored.data}
     except HTTPException:
         raise
     except Exception as e:
@@ -375,16 +529,12 @@ async def restore_folder(
 @router.delete("/{folder_id}/permanent")
 async def permanently_delete_folder(
     folder_id: UUID,
-    current_user_email: str = Depends(get_current_user_email)
+    background_tasks: BackgroundTasks,
+    user_id: str = Depends(get_current_user_id)
 ):
     try:
-        user_result = supabase.table("users").select("id").eq("email", current_user_email).execute()
-        if not user_result.data:
-            raise HTTPException(status_code=404, detail="User not found")
-        user_id = user_result.data[0]["id"]
-
-        result = (
-            supabase
+        result = await (
+            db
             .table(FOLDERS_TABLE)
             .select("*")
             .eq("id", str(folder_id))
@@ -394,9 +544,22 @@ async def permanently_delete_folder(
         if not result.data:
             raise HTTPException(status_code=404, detail="Folder not found")
 
-        # Note: If you also want to permanently delete contained files/subfolders, handle here
-        supabase.table(FOLDERS_TABLE).delete().eq("id", str(folder_id)).execute()
-        return {"message": "Folder permanently deleted"}
+        # Delete the whole subtree and its files in one call, then drop the
+        # blob references in batches
+        purged = await db.rpc("purge_folder_tree", {"p_folder_id": str(folder_id), "p_owner_id": user_id}).execute()
+        storage_paths = purged.data or []
+        try:
+            unreferenced = await blob_store.release_blobs(storage_paths)
+        except Exception as e:
+            # Do not block permanent delete on blob bookkeeping errors
+            print(f"Warning: failed to release folder blobs: {e}")
+            unreferenced = []
+
+        # Unlinking thousands of blobs should not hold up the response
+        background_tasks.add_task(blob_store.delete_blobs, unreferenced)
+        await listing_cache.invalidate_owner(user_id)
+        await events.publish(user_id, "deleted", folders=[folder_id])
+        return {"message": "Folder permanently deleted", "files": len(storage_paths)}
     except HTTPException:
         raise
     except Exception as e:
@@ -0,0 +1,271 @@
+import itertools
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Tuple
+from fastapi.responses import Response
+from cache import TTLCache
+from config import settings
+
+# Read-through cache of folder listing responses (/files/list, /folders/list
+# and the folder contents routes), kept as the JSON bytes that were sent. Pages
+# are grouped per (owner, folder), and a view key tells apart the endpoint,
+# sort, cursor and limit within a folder. The handlers that write invalidate
+# the folders whose listings they change: dropping a folder's group drops
+# every view of it. Writes whose folders aren't known without another query
+# (folder trees, bulk operations) invalidate the owner's whole cache instead.
+#
+# A listing read while a write commits must not be cached after the write has
+# invalidated it. Each read takes a token (the owner's generation and the
+# folder's version) before querying, and its result is only stored if the
+# token is still current.
+#
+# A page is kept with the ETag it was sent with (see conditional.py). Writes
+# made through another worker don't reach a local cache, so its hits are
+# checked against the folder's current ETag first, which costs one small
+# query instead of the listing's; Redis hits are answered without the database.
+
+# Stands in for the root in keys
+ROOT = "root"
+
+def _folder_key(folder_id: Optional[str]) -> str:
+    if not folder_id:
+        return ROOT
+    # Query strings may spell an id differently from the rows the writes see
+    try:
+        return str(uuid.UUID(str(folder_id)))
+    except ValueError:
+        return str(folder_id)
+
+class _Stats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # Hits found out of date by their ETag, counted as misses too
+        self.stale = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "invalidations": self.invalidations,
+            "stale": self.stale,
+        }
+
+# A cached page: the response body and its ETag, if it had one
+Page = Tuple[bytes, Optional[str]]
+
+# Per-page bookkeeping counted against LISTING_CACHE_BYTES besides the body
+PAGE_OVERHEAD = 200
+
+def _bucket_weight(bucket: Tuple[Any, Dict[Hashable, Page]]) -> int:
+    return PAGE_OVERHEAD + sum(PAGE_OVERHEAD + len(body) for body, _ in bucket[1].values())
+
+class LocalListingCache:
+    """Listings cached in this process, LRU within LISTING_CACHE_BYTES."""
+
+    # Other workers' writes don't invalidate it
+    shared = False
+
+    def __init__(self, max_bytes: int, ttl: float):
+        # (owner, generation, folder) -> (version, {view: page}). An
+        # invalidated folder keeps an empty group with a new version.
+        self._buckets = TTLCache(maxsize=max_bytes, ttl=ttl, weigh=_bucket_weight)
+        # owner -> generation, bounded too: there are never more owners with
+        # pages than there is room for groups
+        self._generations = TTLCache(maxsize=max(1, max_bytes // PAGE_OVERHEAD), ttl=ttl)
+        self._versions = itertools.count(1)
+        self.stats = _Stats()
+
+    def _generation(self, user_id: str) -> int:
+        generation = self._generations.get(user_id)
+        if generation is None:
+            # New, expired or evicted: a fresh generation can't reach any
+            # group left behind under an older one
+            generation = next(self._versions)
+            self._generations.set(user_id, generation)
+        return generation
+
+    def _bucket_key(self, user_id: str, folder_id: Optional[str]) -> Tuple[str, int, str]:
+        return user_id, self._generation(user_id), _folder_key(folder_id)
+
+    async def get(self, user_id: str, folder_id: Optional[str], view: Hashable) -> Tuple[Optional[Page], Any]:
+        key = self._bucket_key(user_id, folder_id)
+        bucket = self._buckets.get(key)
+        token = (key, bucket[0] if bucket else None)
+        return (bucket[1].get(view) if bucket else None), token
+
+    async def set(self, user_id: str, folder_id: Optional[str], view: Hashable, page: Page, token: Any):
+        key = self._bucket_key(user_id, folder_id)
+        bucket = self._buckets.get(key)
+        if token != (key, bucket[0] if bucket else None):
+            return
+        version, pages = bucket if bucket else (None, {})
+        self._buckets.set(key, (version, {**pages, view: page}))
+        # Outlive the groups stored under it
+        self._generations.set(user_id, key[1])
+
+    async def invalidate(self, user_id: str, folder_ids: Iterable[Optional[str]]):
+        for folder_id in folder_ids:
+            self._buckets.set(self._bucket_key(user_id, folder_id), (next(self._versions), {}))
+
+    async def invalidate_owner(self, user_id: str):
+        # The old generation's groups are no longer looked up and age out
+        self._generations.set(user_id, next(self._versions))
+
+    def metrics(self) -> Dict[str, Any]:
+        buckets = self._buckets.stats()
+        return {**self.stats.as_dict(), "folders": buckets["entries"], "bytes": buckets["size"], "max_bytes": buckets["maxsize"]}
+
+    async def close(self):
+        pass
+
+class RedisListingCache:
+    """Listings cached in Redis and shared by every worker.
+
+    A folder's pages are one hash, each page a body field and an ETag field,
+    so invalidating it is a single write. Set
+    ``maxmemory`` with an LRU eviction policy on the Redis server to bound it.
+    """
+
+    PREFIX = "drive:listing:"
+    shared = True
+
+    def __init__(self, url: str, ttl: float):
+        try:
+            import redis.asyncio as redis
+            from redis.exceptions import WatchError
+        except ImportError:
+            raise RuntimeError("LISTING_CACHE=redis requires redis>=5 (pip install redis)")
+
+        self._redis = redis.from_url(url)
+        self._watch_error = WatchError
+        self.ttl = int(ttl)
+        self.stats = _Stats()
+
+    def _generation_key(self, user_id: str) -> str:
+        return f"{self.PREFIX}gen:{user_id}"
+
+    def _bucket_key(self, user_id: str, generation: Optional[bytes], folder_id: Optional[str]) -> str:
+        return f"{self.PREFIX}{user_id}:{(generation or b'0').decode()}:{_folder_key(folder_id)}"
+
+    async def get(self, user_id: str, folder_id: Optional[str], view: Hashable) -> Tuple[Optional[Page], Any]:
+        generation = await self._redis.get(self._generation_key(user_id))
+        key = self._bucket_key(user_id, generation, folder_id)
+        version, body, etag = await self._redis.hmget(key, "v", repr(view), f"etag:{view!r}")
+        page = (body, etag.decode() or None) if body is not None and etag is not None else None
+        return page, (generation, version)
+
+    async def set(self, user_id: str, folder_id: Optional[str], view: Hashable, page: Page, token: Any):
+        generation_key = self._generation_key(user_id)
+        try:
+            async with self._redis.pipeline() as pipe:
+                # Store only if neither key changes between checking the token and writing
+                await pipe.watch(generation_key)
+                generation = await pipe.get(generation_key)
+                key = self._bucket_key(user_id, generation, folder_id)
+                await pipe.watch(key)
+                if (generation, await pipe.hget(key, "v")) != token:
+                    return
+                body, etag = page
+                pipe.multi()
+                pipe.hset(key, mapping={repr(view): body, f"etag:{view!r}": etag or ""})
+                pipe.expire(key, self.ttl)
+                await pipe.execute()
+        except self._watch_error:
+            pass
+
+    async def invalidate(self, user_id: str, folder_ids: Iterable[Optional[str]]):
+        generation = await self._redis.get(self._generation_key(user_id))
+        async with self._redis.pipeline(transaction=True) as pipe:
+            for folder_id in folder_ids:
+                key = self._bucket_key(user_id, generation, folder_id)
+                pipe.delete(key)
+                pipe.hset(key, "v", uuid.uuid4().hex)
+                pipe.expire(key, self.ttl)
+            await pipe.execute()
+
+    async def invalidate_owner(self, user_id: str):
+        await self._redis.incr(self._generation_key(user_id))
+
+    def metrics(self) -> Dict[str, Any]:
+        return self.stats.as_dict()
+
+    async def close(self):
+        await self._redis.aclose()
+
+def create_listing_cache():
+    backend = settings.listing_cache.lower()
+    if backend == "local":
+        return LocalListingCache(settings.listing_cache_bytes, settings.listing_cache_ttl_seconds)
+    if backend == "redis":
+        return RedisListingCache(settings.redis_url, settings.listing_cache_ttl_seconds)
+    if backend == "off":
+        return None
+    raise ValueError(f"Unknown LISTING_CACHE: {settings.listing_cache}")
+
+listing_cache = create_listing_cache()
+
+async def read_through(
+    user_id: str,
+    folder_id: Optional[str],
+    view: Hashable,
+    build: Callable[[], Awaitable[Response]],
+    current_etag: Optional[Callable[[], Awaitable[Optional[str]]]] = None
+) -> Response:
+    """The cached response for ``view`` of the folder, or ``build()`` stored for next time.
+
+    Only 200 responses are stored, with their ETag. Unless the cache is
+    shared, a hit is only served while its ETag is still ``current_etag()``.
+    """
+    if listing_cache is None:
+        return await build()
+    try:
+        page, token = await listing_cache.get(user_id, folder_id, view)
+    except Exception as e:
+        print(f"Warning: listing cache read failed: {e}")
+        return await build()
+    if page is not None:
+        body, etag = page
+        if listing_cache.shared or current_etag is None or await current_etag() == etag:
+            listing_cache.stats.hits += 1
+            return Response(body, media_type="application/json", headers={"ETag": etag} if etag else None)
+        # Changed by a write on another worker; the page built below replaces it
+        listing_cache.stats.stale += 1
+
+    listing_cache.stats.misses += 1
+    response = await build()
+    if response.status_code != 200:
+        return response
+    try:
+        await listing_cache.set(user_id, folder_id, view, (response.body, response.headers.get("etag")), token)
+    except Exception as e:
+        print(f"Warning: listing cache write failed: {e}")
+    return response
+
+async def invalidate(user_id: str, *folder_ids: Optional[str]):
+    """Drop the cached listings of the given folders (None for the root)."""
+    if listing_cache is None:
+        return
+    listing_cache.stats.invalidations += 1
+    try:
+        await listing_cache.invalidate(user_id, set(_folder_key(f) for f in folder_ids))
+    except Exception as e:
+        # The write went through; without the invalidation the listing could
+        # stay stale until it expires, so fall back to dropping everything
+        print(f"Warning: listing cache invalidation failed: {e}")
+        await invalidate_owner(user_id)
+
+async def invalidate_owner(user_id: str):
+    """Drop every cached listing of the user."""
+    if listing_cache is None:
+        return
+    listing_cache.stats.invalidations += 1
+    try:
+        await listing_cache.invalidate_owner(user_id)
+    except Exception as e:
+        print(f"Warning: listing cache invalidation failed: {e}")
+
+def metrics() -> Optional[Dict[str, Any]]:
+    return listing_cache.metrics() if listing_cache is not None else None
@@ -0,0 +1,44 @@
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, Tuple
+
+def _format_value(value: Any) -> str:
+    text = str(value)
+    if not text or any(c in text for c in ' "=\n'):
+        return json.dumps(text)
+    return text
+
+class RateLimitedLogger:
+    """Logger that writes each event at most once per ``interval`` seconds.
+
+    Lines are ``event key=value ...`` so they can be grepped and parsed. Repeats
+    dropped in between are counted and reported as ``suppressed=N`` on the next
+    line written for the event, so a client retrying in a loop can't flood the log.
+    """
+
+    def __init__(self, name: str, interval: float):
+        self.logger = logging.getLogger(name)
+        self.interval = interval
+        # event -> (time last written, repeats dropped since)
+        self._events: Dict[str, Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    def log(self, level: int, event: str, **fields: Any):
+        now = time.monotonic()
+        with self._lock:
+            written_at, suppressed = self._events.get(event, (None, 0))
+            if written_at is not None and now - written_at < self.interval:
+                self._events[event] = (written_at, suppressed + 1)
+                return
+            self._events[event] = (now, 0)
+        if suppressed:
+            fields["suppressed"] = suppressed
+        self.logger.log(level, " ".join([event] + [f"{key}={_format_value(value)}" for key, value in fields.items()]))
+
+    def info(self, event: str, **fields: Any):
+        self.log(logging.INFO, event, **fields)
+
+    def warning(self, event: str, **fields: Any):
+        self.log(logging.WARNING, event, **fields)
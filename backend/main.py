@@ -1,7 +1,9 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from config import settings
-import auth, files, folders
+from repository import db
+import auth, bulk, changes, events, files, folders, listing_cache, search, thumbnails, upload_sessions, usage
 
 # Create FastAPI app
 app = FastAPI(
@@ -26,8 +28,38 @@ app.add_middleware(
 
 # Include routers
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
+app.include_router(upload_sessions.router, prefix="/files/uploads", tags=["Files"])
 app.include_router(files.router, prefix="/files", tags=["Files"])
 app.include_router(folders.router, prefix="/folders", tags=["Folders"])
+app.include_router(search.router, prefix="/search", tags=["Search"])
+app.include_router(bulk.router, prefix="/bulk", tags=["Bulk"])
+app.include_router(usage.router, prefix="/usage", tags=["Usage"])
+app.include_router(changes.router, prefix="/changes", tags=["Changes"])
+
+@app.on_event("startup")
+async def start_upload_session_purge():
+    app.state.upload_session_purge = asyncio.create_task(upload_sessions.purge_expired_sessions_periodically())
+
+@app.on_event("shutdown")
+async def stop_upload_session_purge():
+    app.state.upload_session_purge.cancel()
+
+@app.on_event("shutdown")
+async def close_database_pool():
+    await db.close()
+
+@app.on_event("shutdown")
+async def close_event_broker():
+    await events.broker.close()
+
+@app.on_event("shutdown")
+async def close_listing_cache():
+    if listing_cache.listing_cache is not None:
+        await listing_cache.listing_cache.close()
+
+@app.on_event("shutdown")
+def stop_thumbnail_workers():
+    thumbnails.shutdown()
 
 @app.get("/")
 def root():
@@ -42,6 +74,13 @@ def root():
 def health_check():
     return {"status": "healthy"}
 
+# Counters since this worker started. Unauthenticated, so only served when
+# METRICS_ENABLED is set, typically where only operators can reach the port.
+if settings.metrics_enabled:
+    @app.get("/metrics")
+    def metrics():
+        return {"listing_cache": listing_cache.metrics()}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -0,0 +1,64 @@
+import base64
+import json
+from typing import Any, List, Literal, Optional, Tuple
+from fastapi import HTTPException
+
+# Keyset (cursor) pagination for PostgREST listing queries.
+#
+# Rows are ordered by (sort column, id), and the cursor carries the sort value
+# and id of the last row returned. The next page is everything strictly after
+# that pair, so pages stay stable while rows are inserted or removed and no
+# OFFSET scan is needed. Sort columns are NOT NULL (add_listing_indexes.sql),
+# so each ascending index also serves the descending order, scanned backwards.
+
+FileSortField = Literal["name", "size", "created_at", "updated_at"]
+FolderSortField = Literal["name", "created_at", "updated_at"]
+SortOrder = Literal["asc", "desc"]
+
+def encode_cursor(sort: str, desc: bool, value: Any, last_id: str) -> str:
+    raw = json.dumps({"s": sort, "d": desc, "v": value, "id": last_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort: str, desc: bool) -> Tuple[Any, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value, last_id = data["v"], data["id"]
+        matches = data["s"] == sort and data["d"] == desc
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not matches:
+        raise HTTPException(status_code=400, detail="Cursor does not match the requested sort order")
+    if value is None:
+        # Only cursors from before sort columns were made NOT NULL carry one
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return value, last_id
+
+def _quote(value: Any) -> str:
+    # Double-quote filter values so commas, dots and parentheses are taken literally
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{text}"'
+
+def _after(sort: str, desc: bool, value: Any, last_id: str) -> str:
+    op = "lt" if desc else "gt"
+    return f"({sort}.{op}.{_quote(value)},and({sort}.eq.{_quote(value)},id.{op}.{_quote(last_id)}))"
+
+def apply_page(query, sort: str, desc: bool, cursor: Optional[str], limit: int):
+    """Add keyset ordering, the cursor filter and a limit to a select query.
+
+    One extra row is requested so page_rows can tell whether another page exists.
+    """
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort, desc)
+        query.params = query.params.add("or", _after(sort, desc, value, last_id))
+    direction = "desc" if desc else "asc"
+    query.params = query.params.add("order", f"{sort}.{direction},id.{direction}")
+    return query.limit(limit + 1)
+
+def page_rows(rows: List[dict], sort: str, desc: bool, limit: int) -> Tuple[List[dict], Optional[str]]:
+    """Trim the look-ahead row and build the cursor for the next page, if any."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(sort, desc, last[sort], last["id"])
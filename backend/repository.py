@@ -0,0 +1,97 @@
+import asyncio
+from typing import Any, Dict, Union
+import httpx
+from postgrest import AsyncPostgrestClient
+from config import settings
+
+# Methods that are safe to resend after a failure part-way through a request
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRYABLE_STATUS_CODES = {502, 503, 504}
+
+class RetryTransport(httpx.AsyncBaseTransport):
+    """Retry transient failures with exponential backoff.
+
+    Requests that never reached the server (connection errors) are always
+    retried; idempotent requests are also retried on read errors and 502/503/504.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, retries: int, backoff: float):
+        self._transport = transport
+        self._retries = retries
+        self._backoff = backoff
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        idempotent = request.method in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            try:
+                response = await self._transport.handle_async_request(request)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout):
+                if attempt >= self._retries:
+                    raise
+            except (httpx.ReadError, httpx.ReadTimeout, httpx.RemoteProtocolError):
+                if not idempotent or attempt >= self._retries:
+                    raise
+            else:
+                if not idempotent or response.status_code not in RETRYABLE_STATUS_CODES or attempt >= self._retries:
+                    return response
+                await response.aclose()
+
+            await asyncio.sleep(self._backoff * (2 ** attempt))
+            attempt += 1
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+class PooledPostgrestClient(AsyncPostgrestClient):
+    """PostgREST client whose session is a pooled HTTP/2 connection with retries."""
+
+    def create_session(
+        self,
+        base_url: str,
+        headers: Dict[str, str],
+        timeout: Union[int, float, httpx.Timeout],
+    ) -> httpx.AsyncClient:
+        transport = httpx.AsyncHTTPTransport(
+            http2=settings.db_http2,
+            limits=httpx.Limits(
+                max_connections=settings.db_pool_size,
+                max_keepalive_connections=settings.db_pool_size,
+                keepalive_expiry=settings.db_keepalive_seconds,
+            ),
+        )
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            transport=RetryTransport(transport, settings.db_retries, settings.db_retry_backoff_seconds),
+        )
+
+class Repository:
+    """Async data access for the Supabase tables.
+
+    Mirrors the supabase client's query builder, so handlers write
+    ``await db.table(FILES_TABLE).select("*").eq(...).execute()``; each query
+    runs on the shared connection pool without blocking the event loop.
+    """
+
+    def __init__(self, supabase_url: str, supabase_key: str):
+        self._client = PooledPostgrestClient(
+            f"{supabase_url}/rest/v1",
+            headers={
+                "apiKey": supabase_key,
+                "Authorization": f"Bearer {supabase_key}",
+            },
+            timeout=httpx.Timeout(settings.db_timeout_seconds, connect=settings.db_connect_timeout_seconds),
+        )
+
+    def table(self, name: str):
+        return self._client.from_(name)
+
+    def rpc(self, func: str, params: Dict[str, Any]):
+        return self._client.rpc(func, params)
+
+    async def close(self):
+        await self._client.aclose()
+
+db = Repository(settings.supabase_url, settings.supabase_key)
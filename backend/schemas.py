@@ -1,6 +1,7 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from typing import Optional, List, Literal
 from datetime import datetime
+from uuid import UUID
 
 # User schemas
 class UserBase(BaseModel):
@@ -44,6 +45,29 @@ class FileResponse(FileBase):
     class Config:
         from_attributes = True
 
+class FileListResponse(BaseModel):
+    items: List[FileResponse]
+    next_cursor: Optional[str] = None
+
+# Upload session schemas
+class UploadSessionCreate(BaseModel):
+    name: str
+    size: int
+    mime_type: Optional[str] = None
+    folder_id: Optional[str] = None
+    chunk_size: Optional[int] = None
+
+class UploadSessionResponse(BaseModel):
+    id: str
+    name: str
+    size: int
+    chunk_size: int
+    total_chunks: int
+    received_chunks: List[int]
+    received_bytes: int
+    received_ranges: List[List[int]]
+    expires_at: datetime
+
 # Folder schemas
 class FolderBase(BaseModel):
     name: str
@@ -62,10 +86,107 @@ class FolderResponse(FolderBase):
     class Config:
         from_attributes = True
 
+class FolderListResponse(BaseModel):
+    items: List[FolderResponse]
+    next_cursor: Optional[str] = None
+
+class FolderContentsResponse(BaseModel):
+    folder: Optional[FolderResponse] = None
+    folders: List[FolderResponse]
+    files: List[FileResponse]
+    folder_count: Optional[int] = None
+    file_count: Optional[int] = None
+    next_folder_cursor: Optional[str] = None
+    next_file_cursor: Optional[str] = None
+
+# Search schemas
+class SearchResult(BaseModel):
+    type: Literal["file", "folder"]
+    id: str
+    name: str
+    mime_type: Optional[str] = None
+    size: Optional[int] = None
+    parent_id: Optional[str] = None
+    is_starred: bool
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    score: float
+
+class SearchResponse(BaseModel):
+    items: List[SearchResult]
+    next_cursor: Optional[str] = None
+
+# Change feed schemas
+class ChangeItem(BaseModel):
+    type: Literal["file", "folder"]
+    id: str
+    # Permanently deleted: drop the item (file and folder are then null)
+    deleted: bool
+    # Moved to trash, or restored when false
+    trashed: bool = False
+    file: Optional[FileResponse] = None
+    folder: Optional[FolderResponse] = None
+
+class ChangesResponse(BaseModel):
+    items: List[ChangeItem]
+    # Pass back as since to get what changed after these items
+    cursor: str
+    has_more: bool = False
+
+# Bulk operation schemas
+class BulkItems(BaseModel):
+    file_ids: List[UUID] = []
+    folder_ids: List[UUID] = []
+
+class BulkMove(BulkItems):
+    # None moves the items to the root
+    target_folder_id: Optional[UUID] = None
+
+class BulkStar(BulkItems):
+    starred: bool = True
+
+class BulkItemResult(BaseModel):
+    id: str
+    type: Literal["file", "folder"]
+    status: Literal["ok", "not_found", "invalid"]
+    detail: Optional[str] = None
+
+class BulkResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BulkItemResult]
+
+# Usage schemas
+class UsageByType(BaseModel):
+    mime_type: str
+    bytes: int
+    file_count: int
+
+class UsageResponse(BaseModel):
+    # All stored files, including those in the trash
+    total_bytes: int
+    file_count: int
+    trashed_bytes: int
+    trashed_file_count: int
+    # None when the user has no quota
+    quota_bytes: Optional[int] = None
+    # Files outside the trash, largest type first
+    by_type: List[UsageByType]
+
+class FolderUsageResponse(BaseModel):
+    folder_id: str
+    # Files outside the trash in the folder and all of its subfolders
+    bytes: int
+    file_count: int
+
 # Token schemas
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     email: Optional[str] = None
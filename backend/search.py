@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Literal, Optional
+from datetime import datetime
+from repository import db
+from serialization import json_response
+from schemas import SearchResponse
+from auth_utils import get_current_user_id
+from config import settings
+from pagination import decode_cursor, page_rows
+
+router = APIRouter()
+
+@router.get("", response_model=SearchResponse)
+async def search(
+    q: str = Query(..., min_length=1, max_length=255),
+    match: Literal["substring", "prefix"] = "substring",
+    kind: Optional[Literal["file", "folder"]] = Query(None, alias="type"),
+    mime_type: Optional[str] = None,
+    min_size: Optional[int] = Query(None, ge=0),
+    max_size: Optional[int] = Query(None, ge=0),
+    modified_after: Optional[datetime] = None,
+    modified_before: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.default_page_size, ge=1, le=settings.max_page_size),
+    user_id: str = Depends(get_current_user_id)
+):
+    try:
+        # Results are ranked by score (best first), so the cursor is keyed on it
+        after_score, after_id = decode_cursor(cursor, "score", True) if cursor else (None, None)
+
+        # Matching, ranking and filtering run in the database against the
+        # trigram and prefix name indexes (see add_search_index.sql)
+        result = await db.rpc("search_items", {
+            "p_owner_id": user_id,
+            "p_query": q,
+            "p_prefix": match == "prefix",
+            "p_kind": kind,
+            "p_mime_type": mime_type,
+            "p_min_size": min_size,
+            "p_max_size": max_size,
+            "p_modified_after": modified_after.isoformat() if modified_after else None,
+            "p_modified_before": modified_before.isoformat() if modified_before else None,
+            "p_after_score": after_score,
+            "p_after_id": after_id,
+            "p_limit": limit + 1
+        }).execute()
+        rows, next_cursor = page_rows(result.data or [], "score", True, limit)
+
+        items = [{**row, "type": row["kind"]} for row in rows]
+        return json_response(SearchResponse, {"items": items, "next_cursor": next_cursor})
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Search error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
@@ -0,0 +1,45 @@
+from functools import lru_cache
+from typing import Any, get_args, get_origin
+from fastapi.responses import Response
+from pydantic import BaseModel, TypeAdapter
+from typing_extensions import NotRequired, TypedDict
+
+# Fast path for listing responses. Building a response model per row in
+# Python, then letting FastAPI validate and serialize the result again, costs
+# more CPU than the query on large pages. Instead the raw rows are validated
+# in one call against a TypedDict mirror of the response model, which
+# pydantic-core does in Rust without creating model instances, and dumped
+# straight to JSON bytes. Timestamps are parsed and written exactly as the
+# models would, and columns the model doesn't declare are dropped, so the
+# output is unchanged. Routes keep their response_model for the OpenAPI schema.
+
+@lru_cache(maxsize=None)
+def _typed_dict(model: type) -> type:
+    fields = {}
+    for name, field in model.model_fields.items():
+        annotation = _mirror(field.annotation)
+        fields[name] = annotation if field.is_required() else NotRequired[annotation]
+    return TypedDict(f"{model.__name__}Row", fields)
+
+def _mirror(annotation: Any) -> Any:
+    """``annotation`` with every response model in it replaced by its TypedDict."""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return _typed_dict(annotation)
+    args = get_args(annotation)
+    if not args or get_origin(annotation) is None:
+        return annotation
+    return get_origin(annotation)[tuple(_mirror(arg) for arg in args)]
+
+@lru_cache(maxsize=None)
+def _adapter(annotation: Any) -> TypeAdapter:
+    return TypeAdapter(_mirror(annotation))
+
+def json_response(annotation: Any, content: Any) -> Response:
+    """Serialize ``content`` (plain rows and dicts) as ``annotation`` would.
+
+    ``annotation`` is the route's response model, e.g. ``FileListResponse`` or
+    ``List[FolderResponse]``. Give every field: unlike the model, a field with
+    a default that is missing from ``content`` is left out, not filled in.
+    """
+    adapter = _adapter(annotation)
+    return Response(adapter.dump_json(adapter.validate_python(content)), media_type="application/json")
@@ -0,0 +1,238 @@
+import errno
+import hashlib
+import os
+import shutil
+import uuid
+from typing import BinaryIO, Iterator, List, Optional
+from config import settings
+
+# Storage drivers hold file content by key. Their methods block (disk or
+# network I/O), so callers run them via concurrency.run_blocking; get_range
+# returns a sync iterator that Starlette drains in its threadpool.
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+class StorageDriver:
+    """Interface implemented by every storage backend."""
+
+    def put(self, key: str, source: BinaryIO) -> None:
+        """Store everything read from ``source`` under ``key``."""
+        raise NotImplementedError
+
+    def put_file(self, key: str, path: str) -> None:
+        """Store the local file at ``path`` under ``key``, consuming the file."""
+        with open(path, "rb") as source:
+            self.put(key, source)
+        os.remove(path)
+
+    def get_range(self, key: str, start: int, length: int, chunk_size: int) -> Iterator[bytes]:
+        """Yield ``length`` bytes of ``key`` starting at ``start``."""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        """Remove ``key``; missing keys are ignored."""
+        raise NotImplementedError
+
+    def stat(self, key: str) -> Optional[int]:
+        """Return the stored size of ``key``, or None if it does not exist."""
+        raise NotImplementedError
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Return a local filesystem path for ``key`` if the driver has one."""
+        return None
+
+class LocalStorage(StorageDriver):
+    """Files under a single directory, fanned out as ``aa/bb/<key>``."""
+
+    def __init__(self, root: str, fanout: bool = True):
+        self.root = root
+        self.fanout = fanout
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        if self.fanout:
+            # Two levels of fan-out keep directories small
+            return os.path.join(self.root, key[:2], key[2:4], key)
+        return os.path.join(self.root, key)
+
+    def put(self, key: str, source: BinaryIO) -> None:
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write beside the target and rename, so readers never see a partial file
+        partial = f"{path}.{uuid.uuid4().hex}.part"
+        try:
+            with open(partial, "wb") as target:
+                shutil.copyfileobj(source, target, COPY_BUFFER_SIZE)
+            os.replace(partial, path)
+        except BaseException:
+            _remove(partial)
+            raise
+
+    def put_file(self, key: str, path: str) -> None:
+        target = self.path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            os.replace(path, target)
+        except OSError as e:
+            # Different filesystem: fall back to copying
+            if e.errno != errno.EXDEV:
+                raise
+            super().put_file(key, path)
+
+    def get_range(self, key: str, start: int, length: int, chunk_size: int) -> Iterator[bytes]:
+        with open(self.path(key), "rb") as f:
+            f.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    def delete(self, key: str) -> None:
+        _remove(self.path(key))
+
+    def stat(self, key: str) -> Optional[int]:
+        try:
+            return os.stat(self.path(key)).st_size
+        except FileNotFoundError:
+            return None
+
+    def local_path(self, key: str) -> Optional[str]:
+        return self.path(key)
+
+class ShardedLocalStorage(StorageDriver):
+    """Local storage spread over several directories, typically one per disk.
+
+    Each key is placed by rendezvous hashing, so adding a directory only moves
+    the keys that now rank it highest instead of reshuffling everything.
+    """
+
+    def __init__(self, roots: List[str]):
+        if not roots:
+            raise ValueError("Sharded storage needs at least one root directory")
+        self.shards = [LocalStorage(root) for root in roots]
+
+    def shard(self, key: str) -> LocalStorage:
+        return max(self.shards, key=lambda shard: hashlib.md5(f"{shard.root}\0{key}".encode()).digest())
+
+    def put(self, key: str, source: BinaryIO) -> None:
+        self.shard(key).put(key, source)
+
+    def put_file(self, key: str, path: str) -> None:
+        self.shard(key).put_file(key, path)
+
+    def get_range(self, key: str, start: int, length: int, chunk_size: int) -> Iterator[bytes]:
+        return self.shard(key).get_range(key, start, length, chunk_size)
+
+    def delete(self, key: str) -> None:
+        self.shard(key).delete(key)
+
+    def stat(self, key: str) -> Optional[int]:
+        return self.shard(key).stat(key)
+
+    def local_path(self, key: str) -> Optional[str]:
+        return self.shard(key).path(key)
+
+class S3Storage(StorageDriver):
+    """Objects in an S3-compatible bucket (AWS S3, MinIO, Ceph RGW, ...)."""
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        access_key_id: Optional[str] = None,
+        secret_access_key: Optional[str] = None,
+    ):
+        try:
+            import boto3
+            from botocore.config import Config
+            from botocore.exceptions import ClientError
+        except ImportError:
+            raise RuntimeError("STORAGE_DRIVER=s3 requires boto3 (pip install boto3)")
+
+        self._client_error = ClientError
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            region_name=region or None,
+            aws_access_key_id=access_key_id or None,
+            aws_secret_access_key=secret_access_key or None,
+            config=Config(
+                # One connection per I/O worker thread
+                max_pool_connections=settings.io_thread_pool_size,
+                # Self-hosted endpoints rarely have per-bucket DNS names
+                s3={"addressing_style": "path"} if endpoint_url else None,
+            ),
+        )
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def put(self, key: str, source: BinaryIO) -> None:
+        # Switches to a multipart upload for large objects
+        self.client.upload_fileobj(source, self.bucket, self._key(key))
+
+    def put_file(self, key: str, path: str) -> None:
+        self.client.upload_file(path, self.bucket, self._key(key))
+        os.remove(path)
+
+    def get_range(self, key: str, start: int, length: int, chunk_size: int) -> Iterator[bytes]:
+        if length <= 0:
+            return
+        response = self.client.get_object(
+            Bucket=self.bucket,
+            Key=self._key(key),
+            Range=f"bytes={start}-{start + length - 1}",
+        )
+        body = response["Body"]
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+    def delete(self, key: str) -> None:
+        # Deleting a missing object is not an error in S3
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def stat(self, key: str) -> Optional[int]:
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except self._client_error as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return response["ContentLength"]
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def create_storage() -> StorageDriver:
+    driver = settings.storage_driver.lower()
+    if driver == "local":
+        return LocalStorage(os.path.join(settings.upload_dir, "blobs"))
+    if driver == "sharded":
+        roots = [root.strip() for root in settings.storage_roots.split(",") if root.strip()]
+        return ShardedLocalStorage(roots)
+    if driver == "s3":
+        if not settings.s3_bucket:
+            raise ValueError("STORAGE_DRIVER=s3 requires S3_BUCKET")
+        return S3Storage(
+            settings.s3_bucket,
+            prefix=settings.s3_prefix,
+            endpoint_url=settings.s3_endpoint_url,
+            region=settings.s3_region,
+            access_key_id=settings.s3_access_key_id,
+            secret_access_key=settings.s3_secret_access_key,
+        )
+    raise ValueError(f"Unknown STORAGE_DRIVER: {settings.storage_driver}")
+
+storage = create_storage()
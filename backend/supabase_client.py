@@ -13,3 +13,5 @@ if settings.supabase_url == "your_supabase_url_here" or settings.supabase_key ==
 USERS_TABLE = "users"
 FILES_TABLE = "files"
 FOLDERS_TABLE = "folders"
+REFRESH_SESSIONS_TABLE = "refresh_sessions"
+LISTING_VERSIONS_TABLE = "listing_versions"
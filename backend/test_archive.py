@@ -0,0 +1,91 @@
+import asyncio
+import io
+import os
+import zipfile
+import archive
+from archive import _date_time, _Names, _Sink
+
+def _tree():
+    return [
+        {"id": "root", "parent_id": None, "name": "Photos", "updated_at": "2024-05-01T10:00:00+00:00"},
+        {"id": "sub", "parent_id": "root", "name": "a/b", "updated_at": None, "created_at": "2023-01-02T03:04:06"},
+    ]
+
+def _archive(monkeypatch, tmp_path, files):
+    rows = {}
+    for folder_id, name, content, mime_type in files:
+        path = tmp_path / f"{len(rows.get(folder_id, []))}-{folder_id}-{abs(hash(name))}"
+        if content is not None:
+            path.write_bytes(content)
+        rows.setdefault(folder_id, []).append({
+            "id": name, "name": name, "mime_type": mime_type, "storage_path": str(path),
+            "updated_at": "2024-05-01T10:00:00+00:00",
+        })
+
+    async def folder_files(folder_id, user_id):
+        for row in rows.get(folder_id, []):
+            yield row
+
+    monkeypatch.setattr(archive, "_folder_files", folder_files)
+    monkeypatch.setattr(archive, "BATCH_SIZE", 1024)
+
+    async def collect():
+        return [piece async for piece in archive.stream(_tree(), "u1")]
+    return asyncio.run(collect())
+
+def test_streamed_archive_is_readable(monkeypatch, tmp_path):
+    text = b"hello world\n" * 1000
+    image = os.urandom(5000)
+    pieces = _archive(monkeypatch, tmp_path, [
+        ("root", "notes.txt", text, "text/plain"),
+        ("root", "NOTES.txt", b"other", "text/plain"),
+        ("root", "empty.txt", b"", "text/plain"),
+        ("sub", "photo.jpg", image, "image/jpeg"),
+    ])
+    # Sent in several pieces, not built whole
+    assert len(pieces) > 3
+
+    with zipfile.ZipFile(io.BytesIO(b"".join(pieces))) as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == [
+            "Photos/", "Photos/notes.txt", "Photos/NOTES (1).txt", "Photos/empty.txt",
+            "Photos/a_b/", "Photos/a_b/photo.jpg",
+        ]
+        assert zf.read("Photos/notes.txt") == text
+        assert zf.read("Photos/NOTES (1).txt") == b"other"
+        assert zf.read("Photos/empty.txt") == b""
+        assert zf.read("Photos/a_b/photo.jpg") == image
+        assert zf.getinfo("Photos/notes.txt").compress_type == zipfile.ZIP_DEFLATED
+        # Already compressed formats are stored as they are
+        assert zf.getinfo("Photos/a_b/photo.jpg").compress_type == zipfile.ZIP_STORED
+        assert zf.getinfo("Photos/a_b/").date_time == (2023, 1, 2, 3, 4, 6)
+
+def test_missing_blob_is_skipped(monkeypatch, tmp_path):
+    pieces = _archive(monkeypatch, tmp_path, [
+        ("root", "gone.txt", None, "text/plain"),
+        ("root", "kept.txt", b"kept", "text/plain"),
+    ])
+    with zipfile.ZipFile(io.BytesIO(b"".join(pieces))) as zf:
+        assert zf.namelist() == ["Photos/", "Photos/kept.txt", "Photos/a_b/"]
+
+def test_sink_drains_what_was_written():
+    sink = _Sink()
+    sink.write(b"ab")
+    sink.write(memoryview(b"cd"))
+    assert sink.tell() == 4
+    assert sink.drain() == b"abcd"
+    assert sink.drain() == b""
+    assert sink.tell() == 4
+
+def test_date_time_falls_back_to_created_at():
+    assert _date_time({"updated_at": None, "created_at": "2023-01-02T03:04:05"}) == (2023, 1, 2, 3, 4, 5)
+    assert _date_time({"updated_at": "2024-05-01T10:00:00", "created_at": "2023-01-02T03:04:05"})[:3] == (2024, 5, 1)
+    assert _date_time({"updated_at": "1970-01-01T00:00:00"}) == (1980, 1, 1, 0, 0, 0)
+
+def test_names_are_made_safe_and_unique():
+    names = _Names()
+    assert names.add("", "..") == "_"
+    assert names.add("d/", "a\\b") == "d/a_b"
+    assert names.add("d/", "A_B") == "d/A_B (1)"
+    assert names.add("d/", "x.tar.gz") == "d/x.tar.gz"
+    assert names.add("d/", "x.tar.gz") == "d/x.tar (1).gz"
@@ -0,0 +1,46 @@
+import uuid
+import pytest
+import auth_utils
+from auth_utils import create_refresh_token, hash_refresh_secret, next_refresh_token, parse_refresh_token
+
+SESSION = str(uuid.uuid4())
+
+def test_refresh_token_round_trip():
+    token, token_hash = create_refresh_token(SESSION)
+    session_id, secret = parse_refresh_token(token)
+    assert session_id == SESSION
+    assert hash_refresh_secret(secret) == token_hash
+
+def test_refresh_tokens_are_unique():
+    assert create_refresh_token(SESSION)[0] != create_refresh_token(SESSION)[0]
+
+@pytest.mark.parametrize("token", ["", "no-dot", f"{SESSION}.", "not-a-uuid.secret", f".{SESSION}"])
+def test_malformed_refresh_token(token):
+    assert parse_refresh_token(token) is None
+
+def test_next_refresh_token_is_derived_from_the_old_secret():
+    token, _ = create_refresh_token(SESSION)
+    _, secret = parse_refresh_token(token)
+    # Two refreshes racing on the same token are handed the same replacement
+    assert next_refresh_token(SESSION, secret) == next_refresh_token(SESSION, secret)
+
+def test_next_refresh_token_round_trip():
+    token, _ = create_refresh_token(SESSION)
+    new_token, new_hash = next_refresh_token(*parse_refresh_token(token))
+    assert new_token != token
+    session_id, new_secret = parse_refresh_token(new_token)
+    assert session_id == SESSION
+    assert hash_refresh_secret(new_secret) == new_hash
+
+def test_next_refresh_token_differs_per_secret_and_session():
+    tokens = {
+        next_refresh_token(SESSION, "a")[0],
+        next_refresh_token(SESSION, "b")[0],
+        next_refresh_token(str(uuid.uuid4()), "a")[0].partition(".")[2],
+    }
+    assert len(tokens) == 3
+
+def test_next_refresh_token_depends_on_server_key(monkeypatch):
+    before = next_refresh_token(SESSION, "a")
+    monkeypatch.setattr(auth_utils.settings, "secret_key", auth_utils.settings.secret_key + "-rotated")
+    assert next_refresh_token(SESSION, "a") != before
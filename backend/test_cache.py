@@ -0,0 +1,107 @@
+import hashlib
+from datetime import timedelta
+import pytest
+import auth_utils
+import cache
+from cache import TTLCache
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(cache, "time", clock)
+    return clock
+
+def test_entry_expires_after_ttl(clock):
+    entries = TTLCache(maxsize=10, ttl=30)
+    entries.set("a", 1)
+    clock.now += 29.9
+    assert entries.get("a") == 1
+    clock.now += 0.1
+    assert entries.get("a") is None
+    assert len(entries) == 0
+
+def test_entry_ttl_overrides_default(clock):
+    entries = TTLCache(maxsize=10, ttl=30)
+    entries.set("a", 1, ttl=5)
+    clock.now += 5
+    assert entries.get("a", "gone") == "gone"
+
+def test_set_restarts_ttl(clock):
+    entries = TTLCache(maxsize=10, ttl=30)
+    entries.set("a", 1)
+    clock.now += 20
+    entries.set("a", 2)
+    clock.now += 20
+    assert entries.get("a") == 2
+
+def test_least_recently_used_is_evicted(clock):
+    entries = TTLCache(maxsize=2, ttl=30)
+    entries.set("a", 1)
+    entries.set("b", 2)
+    entries.get("a")
+    entries.set("c", 3)
+    assert entries.get("b") is None
+    assert entries.get("a") == 1
+    assert entries.get("c") == 3
+
+def test_weight_bounds_total(clock):
+    entries = TTLCache(maxsize=10, ttl=30, weigh=len)
+    entries.set("a", "xxxx")
+    entries.set("b", "xxxx")
+    entries.set("c", "xxxx")
+    assert entries.get("a") is None
+    assert entries.stats()["size"] == 8
+
+def test_value_heavier_than_cache_is_not_kept(clock):
+    entries = TTLCache(maxsize=10, ttl=30, weigh=len)
+    entries.set("a", "xxxx")
+    entries.set("b", "small")
+    entries.set("b", "x" * 11)
+    # The old value is dropped rather than left stale, and nothing else is evicted
+    assert entries.get("b") is None
+    assert entries.get("a") == "xxxx"
+    assert entries.stats()["size"] == 4
+
+def test_zero_size_stores_nothing(clock):
+    entries = TTLCache(maxsize=0, ttl=30)
+    entries.set("a", 1)
+    assert entries.get("a") is None
+
+def test_stats_count_lookups(clock):
+    entries = TTLCache(maxsize=10, ttl=30)
+    entries.set("a", 1)
+    entries.get("a")
+    entries.get("b")
+    stats = entries.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+def _cached_payload(token: str):
+    return auth_utils._token_cache.get(hashlib.sha256(token.encode()).digest())
+
+def test_verified_token_cached_until_it_expires(clock):
+    auth_utils._token_cache.clear()
+    token = auth_utils.create_access_token({"sub": "user-1"}, timedelta(seconds=60))
+    assert auth_utils.decode_token(token)["sub"] == "user-1"
+    assert _cached_payload(token)["sub"] == "user-1"
+    clock.now += 61
+    assert _cached_payload(token) is None
+
+def test_rejected_token_is_not_cached(clock):
+    auth_utils._token_cache.clear()
+    token = auth_utils.create_access_token({"sub": "user-1"}, timedelta(seconds=60))
+    tampered = token[:-2] + ("AA" if not token.endswith("AA") else "BB")
+    assert auth_utils.decode_token(tampered) is None
+    assert _cached_payload(tampered) is None
+
+def test_expired_token_is_not_cached(clock):
+    auth_utils._token_cache.clear()
+    token = auth_utils.create_access_token({"sub": "user-1"}, timedelta(seconds=-1))
+    assert auth_utils.decode_token(token) is None
+    assert _cached_payload(token) is None
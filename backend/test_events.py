@@ -0,0 +1,69 @@
+import asyncio
+import events
+from events import RESYNC, LocalBroker
+
+def _event(n: int) -> dict:
+    return {"action": "updated", "files": [str(n)], "folders": []}
+
+def _backlog(queue: asyncio.Queue) -> list:
+    items = []
+    while not queue.empty():
+        items.append(queue.get_nowait())
+    return items
+
+def test_events_reach_only_the_owners_streams():
+    async def main():
+        broker = LocalBroker(queue_size=10)
+        async with broker.subscribe("u1") as first, broker.subscribe("u1") as second, broker.subscribe("u2") as other:
+            await broker.publish("u1", _event(1))
+            assert _backlog(first) == [_event(1)]
+            assert _backlog(second) == [_event(1)]
+            assert _backlog(other) == []
+    asyncio.run(main())
+
+def test_full_queue_is_replaced_by_resync():
+    async def main():
+        broker = LocalBroker(queue_size=3)
+        async with broker.subscribe("u1") as slow, broker.subscribe("u1") as fast:
+            for n in range(3):
+                await broker.publish("u1", _event(n))
+            _backlog(fast)
+            await broker.publish("u1", _event(3))
+            # The stream that stopped reading catches up from /changes instead
+            assert _backlog(slow) == [RESYNC]
+            assert _backlog(fast) == [_event(3)]
+            await broker.publish("u1", _event(4))
+            assert _backlog(slow) == [_event(4)]
+    asyncio.run(main())
+
+def test_resync_all_replaces_every_backlog():
+    async def main():
+        broker = LocalBroker(queue_size=10)
+        async with broker.subscribe("u1") as first, broker.subscribe("u2") as second:
+            await broker.publish("u1", _event(1))
+            broker.resync_all()
+            assert _backlog(first) == [RESYNC]
+            assert _backlog(second) == [RESYNC]
+    asyncio.run(main())
+
+def test_closed_stream_is_unsubscribed():
+    async def main():
+        broker = LocalBroker(queue_size=10)
+        async with broker.subscribe("u1") as queue:
+            pass
+        await broker.publish("u1", _event(1))
+        assert queue.empty()
+        assert broker._subscribers == {}
+    asyncio.run(main())
+
+def test_publish_skips_events_naming_nothing(monkeypatch):
+    broker = LocalBroker(queue_size=10)
+    monkeypatch.setattr(events, "broker", broker)
+
+    async def main():
+        async with broker.subscribe("u1") as queue:
+            await events.publish("u1", "updated")
+            assert queue.empty()
+            await events.publish("u1", "trashed", folders=[7])
+            assert _backlog(queue) == [{"action": "trashed", "files": [], "folders": ["7"]}]
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+from datetime import datetime, timezone
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+from files import _if_range_allows, _parse_range
+
+def _request(**headers) -> Request:
+    raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "headers": raw})
+
+ETAG = '"0123abcd"'
+LAST_MODIFIED = datetime(2024, 5, 1, 10, 0, 0, tzinfo=timezone.utc)
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=10-10", (10, 10)),
+    ("bytes=900-", (900, 999)),
+    # An end past the file is cut to its last byte
+    ("bytes=900-5000", (900, 999)),
+    ("BYTES = 0-0", (0, 0)),
+])
+def test_range(header, expected):
+    assert _parse_range(header, 1000) == expected
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=-100", (900, 999)),
+    # Longer than the file: the whole file
+    ("bytes=-5000", (0, 999)),
+])
+def test_suffix_range(header, expected):
+    assert _parse_range(header, 1000) == expected
+
+@pytest.mark.parametrize("header", [
+    "bytes=0-1,5-6",
+    "bytes=0-99, 200-",
+    "items=0-99",
+    "bytes=",
+    "bytes=abc",
+    "bytes=5-1",
+    "bytes=-0",
+    "bytes=--5",
+    "bytes=x-5",
+])
+def test_ignored_range(header):
+    # Multi-range and malformed headers are ignored and answered with the whole file
+    assert _parse_range(header, 1000) is None
+
+@pytest.mark.parametrize("header, file_size", [
+    ("bytes=1000-", 1000),
+    ("bytes=1000-2000", 1000),
+    ("bytes=0-", 0),
+    ("bytes=-10", 0),
+])
+def test_unsatisfiable_range(header, file_size):
+    with pytest.raises(HTTPException) as exc:
+        _parse_range(header, file_size)
+    assert exc.value.status_code == 416
+    assert exc.value.headers["Content-Range"] == f"bytes */{file_size}"
+
+def test_if_range_absent_allows_range():
+    assert _if_range_allows(_request(), ETAG, LAST_MODIFIED)
+
+@pytest.mark.parametrize("if_range, allowed", [
+    (ETAG, True),
+    ('"other"', False),
+    # Weak validators never match
+    (f"W/{ETAG}", False),
+])
+def test_if_range_etag(if_range, allowed):
+    assert _if_range_allows(_request(if_range=if_range), ETAG, LAST_MODIFIED) is allowed
+
+@pytest.mark.parametrize("if_range, allowed", [
+    ("Wed, 01 May 2024 10:00:00 GMT", True),
+    ("Wed, 01 May 2024 09:59:59 GMT", False),
+    ("Wed, 01 May 2024 10:00:01 GMT", False),
+    ("not a date", False),
+])
+def test_if_range_date(if_range, allowed):
+    assert _if_range_allows(_request(if_range=if_range), ETAG, LAST_MODIFIED) is allowed
@@ -0,0 +1,176 @@
+import asyncio
+import uuid
+import pytest
+from fastapi.responses import Response
+import cache
+import listing_cache
+from listing_cache import PAGE_OVERHEAD, LocalListingCache
+
+FOLDER = str(uuid.uuid4())
+PAGE = (b'{"items":[]}', 'W/"1"')
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+@pytest.fixture
+def local_cache(monkeypatch):
+    listings = LocalListingCache(max_bytes=1 << 20, ttl=60)
+    monkeypatch.setattr(listing_cache, "listing_cache", listings)
+    return listings
+
+async def _store(listings, user_id, folder_id, view, page):
+    _, token = await listings.get(user_id, folder_id, view)
+    await listings.set(user_id, folder_id, view, page, token)
+
+def test_stored_page_is_returned(local_cache):
+    async def main():
+        await _store(local_cache, "u1", FOLDER, "v", PAGE)
+        # Spelled differently in the query string
+        page, _ = await local_cache.get("u1", FOLDER.upper(), "v")
+        assert page == PAGE
+        assert (await local_cache.get("u2", FOLDER, "v"))[0] is None
+        assert (await local_cache.get("u1", None, "v"))[0] is None
+    asyncio.run(main())
+
+def test_invalidate_drops_every_view_of_the_folder_only(local_cache):
+    async def main():
+        await _store(local_cache, "u1", FOLDER, "a", PAGE)
+        await _store(local_cache, "u1", FOLDER, "b", PAGE)
+        await _store(local_cache, "u1", None, "a", PAGE)
+        await local_cache.invalidate("u1", [FOLDER])
+        assert (await local_cache.get("u1", FOLDER, "a"))[0] is None
+        assert (await local_cache.get("u1", FOLDER, "b"))[0] is None
+        assert (await local_cache.get("u1", None, "a"))[0] == PAGE
+    asyncio.run(main())
+
+def test_page_read_before_invalidate_is_not_stored(local_cache):
+    async def main():
+        _, token = await local_cache.get("u1", FOLDER, "v")
+        # A write commits and invalidates while the listing is being built
+        await local_cache.invalidate("u1", [FOLDER])
+        await local_cache.set("u1", FOLDER, "v", PAGE, token)
+        assert (await local_cache.get("u1", FOLDER, "v"))[0] is None
+    asyncio.run(main())
+
+def test_page_read_before_owner_invalidate_is_not_stored(local_cache):
+    async def main():
+        _, token = await local_cache.get("u1", FOLDER, "v")
+        await local_cache.invalidate_owner("u1")
+        await local_cache.set("u1", FOLDER, "v", PAGE, token)
+        assert (await local_cache.get("u1", FOLDER, "v"))[0] is None
+    asyncio.run(main())
+
+def test_lost_generation_does_not_revive_older_pages(local_cache):
+    async def main():
+        await _store(local_cache, "u1", FOLDER, "v", PAGE)
+        await local_cache.invalidate_owner("u1")
+        local_cache._generations.clear()
+        assert (await local_cache.get("u1", FOLDER, "v"))[0] is None
+    asyncio.run(main())
+
+def test_generations_are_bounded():
+    async def main():
+        listings = LocalListingCache(max_bytes=PAGE_OVERHEAD * 10, ttl=60)
+        for i in range(100):
+            await _store(listings, f"u{i}", None, "v", (b"x", None))
+        assert len(listings._generations) <= 10
+    asyncio.run(main())
+
+def test_pages_expire(monkeypatch, local_cache):
+    clock = _Clock()
+    monkeypatch.setattr(cache, "time", clock)
+
+    async def main():
+        await _store(local_cache, "u1", FOLDER, "v", PAGE)
+        clock.now += 59
+        assert (await local_cache.get("u1", FOLDER, "v"))[0] == PAGE
+        clock.now += 1
+        assert (await local_cache.get("u1", FOLDER, "v"))[0] is None
+    asyncio.run(main())
+
+def test_read_through_serves_hits_with_their_etag(local_cache):
+    builds = []
+
+    async def build():
+        builds.append(1)
+        return Response(PAGE[0], media_type="application/json", headers={"ETag": PAGE[1]})
+
+    async def main():
+        first = await listing_cache.read_through("u1", FOLDER, "v", build)
+        second = await listing_cache.read_through("u1", FOLDER, "v", build)
+        assert len(builds) == 1
+        assert second.body == first.body
+        assert second.headers["etag"] == PAGE[1]
+    asyncio.run(main())
+    assert local_cache.stats.as_dict()["hits"] == 1
+
+def test_read_through_does_not_store_errors(local_cache):
+    async def build():
+        return Response(b"{}", status_code=404)
+
+    async def main():
+        await listing_cache.read_through("u1", FOLDER, "v", build)
+        assert (await local_cache.get("u1", FOLDER, "v"))[0] is None
+    asyncio.run(main())
+
+def test_read_through_racing_a_write_builds_again(local_cache):
+    builds = []
+
+    async def build():
+        builds.append(1)
+        if len(builds) == 1:
+            await listing_cache.invalidate("u1", FOLDER)
+        return Response(PAGE[0], media_type="application/json")
+
+    async def main():
+        await listing_cache.read_through("u1", FOLDER, "v", build)
+        await listing_cache.read_through("u1", FOLDER, "v", build)
+        assert len(builds) == 2
+        await listing_cache.read_through("u1", FOLDER, "v", build)
+        assert len(builds) == 2
+    asyncio.run(main())
+
+def test_read_through_rebuilds_hits_with_an_outdated_etag(local_cache):
+    current = {"etag": PAGE[1]}
+    builds = []
+
+    async def build():
+        builds.append(1)
+        return Response(PAGE[0], media_type="application/json", headers={"ETag": current["etag"]})
+
+    async def current_etag():
+        return current["etag"]
+
+    async def main():
+        await listing_cache.read_through("u1", FOLDER, "v", build, current_etag)
+        await listing_cache.read_through("u1", FOLDER, "v", build, current_etag)
+        assert len(builds) == 1
+        # Written through another worker: this worker's cache never heard of it
+        current["etag"] = 'W/"2"'
+        response = await listing_cache.read_through("u1", FOLDER, "v", build, current_etag)
+        assert len(builds) == 2
+        assert response.headers["etag"] == 'W/"2"'
+        response = await listing_cache.read_through("u1", FOLDER, "v", build, current_etag)
+        assert len(builds) == 2
+        assert response.headers["etag"] == 'W/"2"'
+    asyncio.run(main())
+    assert local_cache.stats.as_dict()["stale"] == 1
+
+def test_read_through_trusts_a_shared_cache(monkeypatch, local_cache):
+    monkeypatch.setattr(local_cache, "shared", True)
+
+    async def build():
+        return Response(PAGE[0], media_type="application/json", headers={"ETag": PAGE[1]})
+
+    async def current_etag():
+        raise AssertionError("shared hits need no version check")
+
+    async def main():
+        await listing_cache.read_through("u1", FOLDER, "v", build, current_etag)
+        await listing_cache.read_through("u1", FOLDER, "v", build, current_etag)
+    asyncio.run(main())
+    assert local_cache.stats.as_dict()["hits"] == 1
@@ -0,0 +1,64 @@
+import pytest
+from fastapi import HTTPException
+from postgrest import AsyncPostgrestClient
+from pagination import _after, apply_page, decode_cursor, encode_cursor, page_rows
+
+@pytest.mark.parametrize("value", ["report.pdf", 'a "quoted", (odd) name', 0, 1048576, "2024-05-01T10:00:00+00:00"])
+def test_cursor_round_trip(value):
+    cursor = encode_cursor("name", True, value, "id-1")
+    assert "=" not in cursor
+    assert decode_cursor(cursor, "name", True) == (value, "id-1")
+
+@pytest.mark.parametrize("sort, desc", [("size", True), ("name", False)])
+def test_cursor_rejects_other_sort_order(sort, desc):
+    cursor = encode_cursor("name", True, "a", "id-1")
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor, sort, desc)
+    assert exc.value.status_code == 400
+
+@pytest.mark.parametrize("cursor", [
+    "not-a-cursor", "", "e30", encode_cursor("name", True, "a", "id-1")[:-3],
+    # Sort columns are NOT NULL, so a null can only come from an old cursor
+    encode_cursor("name", True, None, "id-1"),
+])
+def test_malformed_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor, "name", True)
+    assert exc.value.status_code == 400
+
+def test_after_breaks_ties_on_id():
+    assert _after("size", False, 10, "b") == '(size.gt."10",and(size.eq."10",id.gt."b"))'
+    assert _after("size", True, 10, "b") == '(size.lt."10",and(size.eq."10",id.lt."b"))'
+
+def test_after_quotes_values():
+    assert _after("name", False, 'a,b.(c)"d', "x") == (
+        '(name.gt."a,b.(c)\\"d",and(name.eq."a,b.(c)\\"d",id.gt."x"))'
+    )
+
+def _query():
+    # Built offline: nothing is sent until execute()
+    return AsyncPostgrestClient("http://localhost").table("files").select("*")
+
+def test_apply_page_orders_by_sort_then_id():
+    query = apply_page(_query(), "updated_at", True, None, 10)
+    # No NULLS LAST, so the ascending index serves it scanned backwards
+    assert query.params["order"] == "updated_at.desc,id.desc"
+    assert query.params["limit"] == "11"
+    assert "or" not in query.params
+
+def test_apply_page_starts_after_the_cursor():
+    cursor = encode_cursor("name", False, "b", "id-1")
+    query = apply_page(_query(), "name", False, cursor, 10)
+    assert query.params["order"] == "name.asc,id.asc"
+    assert query.params["or"] == _after("name", False, "b", "id-1")
+
+def test_page_rows_without_look_ahead_row_is_last_page():
+    rows = [{"id": "a", "name": "x"}, {"id": "b", "name": "x"}]
+    assert page_rows(rows, "name", False, 2) == (rows, None)
+
+def test_page_rows_cursor_points_at_last_row_returned():
+    rows = [{"id": "a", "name": "x"}, {"id": "b", "name": "x"}, {"id": "c", "name": "y"}]
+    page, cursor = page_rows(rows, "name", False, 2)
+    assert page == rows[:2]
+    # Same name as the first row: only the id tells them apart
+    assert decode_cursor(cursor, "name", False) == ("x", "b")
@@ -0,0 +1,181 @@
+import asyncio
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+from cache import TTLCache
+from config import settings
+from storage import storage
+import blob_store
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+    print("Warning: Pillow is not installed; thumbnails are disabled")
+
+# Thumbnails are rendered off the request path on a small dedicated pool, so
+# uploads never wait for them and a burst of renders can't tie up the I/O
+# threads. Pillow releases the GIL while decoding and resizing, so the
+# threads do run in parallel. Every size is rendered from a single decode and
+# stored through the storage driver beside the blob (blob_store.thumbnail_key).
+# A digest always names the same content, so a stored thumbnail never changes.
+
+IMAGE_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp", "image/bmp", "image/tiff"}
+PDF_TYPE = "application/pdf"
+# Office documents are converted to PDF by LibreOffice first; the suffix picks
+# its import filter
+OFFICE_SUFFIXES = {
+    "application/msword": ".doc",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": ".docx",
+    "application/vnd.ms-excel": ".xls",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": ".xlsx",
+    "application/vnd.ms-powerpoint": ".ppt",
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation": ".pptx",
+    "application/vnd.oasis.opendocument.text": ".odt",
+    "application/vnd.oasis.opendocument.spreadsheet": ".ods",
+    "application/vnd.oasis.opendocument.presentation": ".odp",
+}
+JPEG_QUALITY = 85
+MEDIA_TYPE = "image/jpeg"
+
+# Document previews need these on PATH; without them only images get thumbnails
+PDFTOPPM = shutil.which("pdftoppm")
+SOFFICE = shutil.which("soffice") or shutil.which("libreoffice")
+
+_executor = ThreadPoolExecutor(max_workers=settings.thumbnail_workers, thread_name_prefix="thumbnails")
+# Renders in flight, keyed like the largest thumbnail, so an upload and a
+# request for the same content share one render
+_pending: Dict[str, Future] = {}
+# Content that could not be rendered (corrupt, too large), so repeated
+# requests don't decode it again; retried after the TTL
+_failed = TTLCache(maxsize=10000, ttl=3600)
+
+def supports(mime_type: Optional[str]) -> bool:
+    if Image is None or not mime_type:
+        return False
+    if mime_type in IMAGE_TYPES:
+        return True
+    if mime_type == PDF_TYPE:
+        return PDFTOPPM is not None
+    return mime_type in OFFICE_SUFFIXES and PDFTOPPM is not None and SOFFICE is not None
+
+def pick_size(requested: int) -> int:
+    """Smallest rendered size that covers ``requested``, else the largest."""
+    for size in blob_store.THUMBNAIL_SIZES:
+        if size >= requested:
+            return size
+    return blob_store.THUMBNAIL_SIZES[-1]
+
+def _render_in_pool(storage_path: str, mime_type: str) -> "Future[bool]":
+    key = blob_store.thumbnail_key(storage_path, blob_store.THUMBNAIL_SIZES[-1])
+    future = _pending.get(key)
+    if future is None:
+        if _failed.get(key):
+            future = Future()
+            future.set_result(False)
+            return future
+        future = _executor.submit(_render, storage_path, mime_type)
+        _pending[key] = future
+        future.add_done_callback(lambda done: _finished(key, done))
+    return future
+
+def _finished(key: str, future: Future):
+    _pending.pop(key, None)
+    if not future.cancelled() and future.result() is False:
+        _failed.set(key, True)
+
+def schedule(storage_path: str, mime_type: Optional[str]):
+    """Queue thumbnails for a newly stored file and return immediately."""
+    if supports(mime_type):
+        _render_in_pool(storage_path, mime_type)
+
+async def ensure(storage_path: str, mime_type: str) -> bool:
+    """Render thumbnails now if they are missing; True once they exist."""
+    # Shielded: a client giving up must not cancel a render others may share
+    return await asyncio.shield(asyncio.wrap_future(_render_in_pool(storage_path, mime_type)))
+
+def shutdown():
+    _executor.shutdown(wait=False, cancel_futures=True)
+
+def _render(storage_path: str, mime_type: str) -> bool:
+    sizes = blob_store.THUMBNAIL_SIZES
+    try:
+        # The largest is stored last, so its presence means the set is complete
+        if storage.stat(blob_store.thumbnail_key(storage_path, sizes[-1])) is not None:
+            return True
+
+        driver, key = blob_store.locate(storage_path)
+        source_size = driver.stat(key)
+        if source_size is None or source_size > settings.thumbnail_max_source_bytes:
+            return False
+
+        with tempfile.TemporaryDirectory(dir=blob_store.TMP_DIR) as workdir:
+            source = driver.local_path(key)
+            if source is None or mime_type in OFFICE_SUFFIXES:
+                source = os.path.join(workdir, "source" + OFFICE_SUFFIXES.get(mime_type, ""))
+                with open(source, "wb") as f:
+                    for chunk in driver.get_range(key, 0, source_size, settings.download_chunk_size):
+                        f.write(chunk)
+
+            image = _open_preview(source, mime_type, workdir, sizes[-1])
+            with image:
+                rendered = _scale(image, sizes)
+
+        for size, data in rendered:
+            storage.put(blob_store.thumbnail_key(storage_path, size), io.BytesIO(data))
+        return True
+    except Exception as e:
+        print(f"Warning: thumbnail failed for {storage_path}: {e}")
+        return False
+
+def _open_preview(path: str, mime_type: str, workdir: str, largest: int) -> "Image.Image":
+    if mime_type in IMAGE_TYPES:
+        image = Image.open(path)
+        # JPEGs decode straight to a reduced scale, much faster than full size
+        image.draft("RGB", (largest, largest))
+        return image
+
+    timeout = settings.thumbnail_timeout_seconds
+    pdf = path
+    if mime_type in OFFICE_SUFFIXES:
+        subprocess.run(
+            [
+                SOFFICE,
+                # A private profile per run, so conversions can run in parallel
+                f"-env:UserInstallation=file://{os.path.join(workdir, 'profile')}",
+                "--headless", "--convert-to", "pdf", "--outdir", workdir, path,
+            ],
+            check=True, capture_output=True, timeout=timeout,
+        )
+        pdf = os.path.splitext(path)[0] + ".pdf"
+
+    page = os.path.join(workdir, "page")
+    subprocess.run(
+        [PDFTOPPM, "-f", "1", "-l", "1", "-singlefile", "-jpeg", "-scale-to", str(largest), pdf, page],
+        check=True, capture_output=True, timeout=timeout,
+    )
+    return Image.open(page + ".jpg")
+
+def _scale(image: "Image.Image", sizes: List[int]) -> List[tuple]:
+    """Return (size, JPEG bytes) pairs, smallest first."""
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info):
+        # JPEG has no alpha: flatten onto white
+        rgba = image.convert("RGBA")
+        image = Image.new("RGB", rgba.size, "white")
+        image.paste(rgba, mask=rgba.getchannel("A"))
+    else:
+        image = image.convert("RGB")
+
+    rendered = []
+    # Largest first, each one scaled down from the previous
+    for size in reversed(sizes):
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True)
+        rendered.append((size, buffer.getvalue()))
+    return rendered[::-1]
@@ -0,0 +1,430 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Request
+from typing import List, Optional, Tuple
+import asyncio
+import json
+import math
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime, timedelta
+from config import settings
+from supabase_client import FILES_TABLE
+from repository import db
+from schemas import FileResponse, UploadSessionCreate, UploadSessionResponse
+from auth_utils import get_current_user_id
+from concurrency import run_blocking, upload_slots
+from files import UPLOAD_DIR
+import blob_store
+import events
+import listing_cache
+import thumbnails
+import usage
+
+router = APIRouter()
+
+# Session state lives next to the uploads so every worker on the host sees it.
+# Each received chunk is recorded as its own marker file, which keeps parallel
+# chunk PUTs free of read-modify-write races on a shared state file.
+SESSIONS_DIR = os.path.join(UPLOAD_DIR, ".sessions")
+os.makedirs(SESSIONS_DIR, exist_ok=True)
+
+# files.size is BIGINT (add_bigint_file_size.sql): refused up front rather than
+# at the insert, after every byte has been uploaded
+MAX_FILE_SIZE = 2 ** 63 - 1
+
+def _session_dir(session_id: str) -> str:
+    # Reject anything that is not a plain UUID so the id can't escape SESSIONS_DIR
+    try:
+        return os.path.join(SESSIONS_DIR, str(uuid.UUID(session_id)))
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+
+def _chunks_dir(session_id: str) -> str:
+    return os.path.join(_session_dir(session_id), "chunks")
+
+# The plain helpers below block on disk I/O; handlers run them via run_blocking
+
+def _read_session(session_dir: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(session_dir, "session.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+async def _load_session(session_id: str, user_id: str) -> dict:
+    session = await run_blocking(_read_session, _session_dir(session_id))
+    if session is None or session["owner_id"] != user_id:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    if datetime.fromisoformat(session["expires_at"]) < datetime.utcnow():
+        await run_blocking(_discard_session, session)
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Upload session expired")
+    return session
+
+def _create_session_files(session: dict):
+    # Chunks are written in place into a local staging file, preallocated
+    # (sparse) to the full size so they can land in any order. Finalizing
+    # hands it to the storage driver (a rename for the local driver).
+    with open(session["storage_path"], "wb") as buffer:
+        buffer.truncate(session["size"])
+    os.makedirs(_chunks_dir(session["id"]))
+    with open(os.path.join(_session_dir(session["id"]), "session.json"), "w") as f:
+        json.dump(session, f)
+
+def _mark_chunk_received(session_id: str, index: int):
+    open(os.path.join(_chunks_dir(session_id), str(index)), "w").close()
+
+# Finishing a session is claimed by creating COMPLETING exclusively, so
+# concurrent /complete calls (a client retrying, say) can't both store the
+# file. The file row created is kept in COMPLETED until the session expires,
+# to answer repeated calls with.
+COMPLETING = "completing"
+COMPLETED = "file.json"
+
+def _claim_completion(session_id: str) -> bool:
+    try:
+        os.close(os.open(os.path.join(_session_dir(session_id), COMPLETING), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return True
+    except FileExistsError:
+        return False
+
+def _release_completion(session_id: str):
+    blob_store.remove_file(os.path.join(_session_dir(session_id), COMPLETING))
+
+def _is_claimed(session_id: str) -> bool:
+    return os.path.exists(os.path.join(_session_dir(session_id), COMPLETING))
+
+def _completion_state(session_id: str) -> Tuple[bool, Optional[dict]]:
+    """Whether completion was claimed, and the file row created if it finished."""
+    session_dir = _session_dir(session_id)
+    try:
+        with open(os.path.join(session_dir, COMPLETED)) as f:
+            return True, json.load(f)
+    except FileNotFoundError:
+        return os.path.exists(os.path.join(session_dir, COMPLETING)), None
+
+def _record_completion(session_id: str, created_file: dict):
+    path = os.path.join(_session_dir(session_id), COMPLETED)
+    with open(path + ".tmp", "w") as f:
+        json.dump(created_file, f)
+    os.replace(path + ".tmp", path)
+
+# Completion hashes the staging file and hands it to the blob store, where
+# other files may share it, so no chunk may be written into it from then on.
+# Each chunk PUT keeps a marker in WRITING and touches it before every write,
+# then checks the session isn't claimed; completion claims first, then refuses
+# while any marker is fresh. Whichever comes second sees the other. A marker
+# untouched for CHUNK_WRITE_STALE_SECONDS was left by a worker that died
+# mid-write, or belongs to a stalled PUT that re-checks before writing again.
+WRITING = "writing"
+CHUNK_WRITE_STALE_SECONDS = 60
+
+def _start_chunk_write(session_id: str) -> str:
+    writing_dir = os.path.join(_session_dir(session_id), WRITING)
+    os.makedirs(writing_dir, exist_ok=True)
+    marker = os.path.join(writing_dir, uuid.uuid4().hex)
+    open(marker, "w").close()
+    return marker
+
+def _write_chunk_data(session_id: str, marker: str, buffer, data: bytes):
+    try:
+        os.utime(marker)
+    except FileNotFoundError:
+        # Aborted or expired mid-write
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    if _is_claimed(session_id):
+        raise HTTPException(status_code=409, detail="Upload session is being completed")
+    buffer.write(data)
+
+def _chunk_writes_in_progress(session_id: str) -> bool:
+    writing_dir = os.path.join(_session_dir(session_id), WRITING)
+    cutoff = time.time() - CHUNK_WRITE_STALE_SECONDS
+    try:
+        markers = os.listdir(writing_dir)
+    except FileNotFoundError:
+        return False
+    for marker in markers:
+        try:
+            if os.stat(os.path.join(writing_dir, marker)).st_mtime > cutoff:
+                return True
+        except FileNotFoundError:
+            continue
+    return False
+
+def _discard_session(session: dict, keep_data: bool = False):
+    if not keep_data:
+        try:
+            os.remove(session["storage_path"])
+        except FileNotFoundError:
+            pass
+    shutil.rmtree(os.path.join(SESSIONS_DIR, session["id"]), ignore_errors=True)
+
+def _purge_expired_sessions():
+    now = datetime.utcnow()
+    for entry in os.listdir(SESSIONS_DIR):
+        try:
+            with open(os.path.join(SESSIONS_DIR, entry, "session.json")) as f:
+                session = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if datetime.fromisoformat(session["expires_at"]) < now:
+            _discard_session(session)
+
+def _received_chunks(session_id: str) -> List[int]:
+    return sorted(int(name) for name in os.listdir(_chunks_dir(session_id)))
+
+async def purge_expired_sessions_periodically():
+    """Discard abandoned sessions and their staging files, forever; run as a task."""
+    while True:
+        try:
+            await run_blocking(_purge_expired_sessions)
+        except Exception as e:
+            print(f"Warning: purging expired upload sessions failed: {e}")
+        await asyncio.sleep(settings.upload_session_purge_interval_seconds)
+
+def _chunk_bounds(session: dict, index: int):
+    start = index * session["chunk_size"]
+    return start, min(start + session["chunk_size"], session["size"])
+
+async def _session_response(session: dict) -> UploadSessionResponse:
+    received = await run_blocking(_received_chunks, session["id"])
+
+    # Collapse received chunks into inclusive byte ranges
+    ranges: List[List[int]] = []
+    for index in received:
+        start, end = _chunk_bounds(session, index)
+        if ranges and ranges[-1][1] == start - 1:
+            ranges[-1][1] = end - 1
+        else:
+            ranges.append([start, end - 1])
+
+    return UploadSessionResponse(
+        id=session["id"],
+        name=session["name"],
+        size=session["size"],
+        chunk_size=session["chunk_size"],
+        total_chunks=session["total_chunks"],
+        received_chunks=received,
+        received_bytes=sum(end - start + 1 for start, end in ranges),
+        received_ranges=ranges,
+        expires_at=datetime.fromisoformat(session["expires_at"])
+    )
+
+@router.post("", response_model=UploadSessionResponse)
+async def create_upload_session(
+    session_data: UploadSessionCreate,
+    user_id: str = Depends(get_current_user_id)
+):
+    try:
+        chunk_size = session_data.chunk_size or settings.upload_chunk_size
+        if session_data.size < 0 or session_data.size > MAX_FILE_SIZE:
+            raise HTTPException(status_code=400, detail="Invalid file size")
+        if chunk_size <= 0 or chunk_size > settings.max_upload_chunk_size:
+            raise HTTPException(status_code=400, detail="Invalid chunk size")
+        # Checked against the declared size before any chunk is accepted
+        await usage.check_quota(user_id, session_data.size)
+
+        storage_path = blob_store.new_temp_path()
+        session_id = str(uuid.uuid4())
+        session = {
+            "id": session_id,
+            "name": session_data.name,
+            "size": session_data.size,
+            "mime_type": session_data.mime_type or "application/octet-stream",
+            "folder_id": None if session_data.folder_id in (None, "", "null") else session_data.folder_id,
+            "owner_id": user_id,
+            "chunk_size": chunk_size,
+            "total_chunks": math.ceil(session_data.size / chunk_size),
+            "storage_path": storage_path,
+            "expires_at": (datetime.utcnow() + timedelta(hours=settings.upload_session_ttl_hours)).isoformat()
+        }
+        await run_blocking(_create_session_files, session)
+
+        return await _session_response(session)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Create upload session error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/{session_id}", response_model=UploadSessionResponse)
+async def get_upload_session(
+    session_id: str,
+    user_id: str = Depends(get_current_user_id)
+):
+    try:
+        return await _session_response(await _load_session(session_id, user_id))
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Get upload session error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.put("/{session_id}/chunks/{index}", response_model=UploadSessionResponse)
+async def upload_chunk(
+    session_id: str,
+    index: int,
+    request: Request,
+    user_id: str = Depends(get_current_user_id)
+):
+    try:
+        session = await _load_session(session_id, user_id)
+
+        if index < 0 or index >= session["total_chunks"]:
+            raise HTTPException(status_code=400, detail="Chunk index out of range")
+
+        start, end = _chunk_bounds(session, index)
+        expected = end - start
+
+        # Optional sanity check for clients that send explicit offsets
+        offset = request.headers.get("upload-offset")
+        if offset is not None and offset != str(start):
+            raise HTTPException(status_code=409, detail=f"Chunk {index} starts at offset {start}")
+
+        marker = await run_blocking(_start_chunk_write, session_id)
+        try:
+            # Checked after the marker is in place, so completion can't claim unseen
+            if await run_blocking(_is_claimed, session_id):
+                raise HTTPException(status_code=409, detail="Upload session is already complete")
+
+            written = 0
+            async with upload_slots:
+                buffer = await run_blocking(open, session["storage_path"], "r+b")
+                try:
+                    await run_blocking(buffer.seek, start)
+                    # Coalesce small network reads into buffer-sized writes on the I/O pool
+                    pending = bytearray()
+                    async for data in request.stream():
+                        written += len(data)
+                        if written > expected:
+                            raise HTTPException(status_code=400, detail=f"Chunk {index} must be {expected} bytes")
+                        pending += data
+                        if len(pending) >= settings.upload_buffer_size:
+                            await run_blocking(_write_chunk_data, session_id, marker, buffer, bytes(pending))
+                            pending.clear()
+                    if pending:
+                        await run_blocking(_write_chunk_data, session_id, marker, buffer, bytes(pending))
+                finally:
+                    await run_blocking(buffer.close)
+
+            if written != expected:
+                raise HTTPException(status_code=400, detail=f"Chunk {index} must be {expected} bytes")
+
+            # Only mark the chunk as received once all of its bytes are on disk
+            await run_blocking(_mark_chunk_received, session_id, index)
+        finally:
+            await run_blocking(blob_store.remove_file, marker)
+
+        return await _session_response(session)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Upload chunk error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+async def _finish_session(session: dict, user_id: str) -> dict:
+    missing = set(range(session["total_chunks"])) - set(await run_blocking(_received_chunks, session["id"]))
+    if missing:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Upload incomplete: {len(missing)} chunk(s) missing"
+        )
+
+    # Chunks arrive out of order, so the content hash is taken once complete
+    digest = await run_blocking(blob_store.hash_file, session["storage_path"])
+    storage_path = await blob_store.commit_blob(session["storage_path"], digest, session["size"])
+
+    now = datetime.utcnow().isoformat()
+    new_file = {
+        "id": str(uuid.uuid4()),
+        "name": session["name"],
+        "mime_type": session["mime_type"],
+        "size": session["size"],
+        "storage_path": storage_path,
+        "folder_id": session["folder_id"],
+        "owner_id": user_id,
+        "is_starred": False,
+        "created_at": now,
+        "updated_at": now
+    }
+
+    # The staging file now belongs to the blob store, so the session can't
+    # be retried past this point
+    try:
+        result = await db.table(FILES_TABLE).insert(new_file).execute()
+    except Exception:
+        await blob_store.release_blob(storage_path)
+        await run_blocking(_discard_session, session, keep_data=True)
+        raise
+    if not result.data:
+        await blob_store.release_blob(storage_path)
+        await run_blocking(_discard_session, session, keep_data=True)
+        raise HTTPException(status_code=500, detail="Failed to create file record")
+
+    created_file = result.data[0]
+    await run_blocking(_record_completion, session["id"], created_file)
+    # Rendered on the thumbnail pool; the response does not wait for it
+    thumbnails.schedule(created_file["storage_path"], created_file["mime_type"])
+    await listing_cache.invalidate(user_id, created_file["folder_id"])
+    await events.publish(user_id, "created", files=[created_file["id"]])
+    return created_file
+
+@router.post("/{session_id}/complete", response_model=FileResponse)
+async def complete_upload_session(
+    session_id: str,
+    user_id: str = Depends(get_current_user_id)
+):
+    try:
+        session = await _load_session(session_id, user_id)
+
+        # A repeated call gets the file the first one created
+        _, created_file = await run_blocking(_completion_state, session_id)
+        if created_file is None:
+            if not await run_blocking(_claim_completion, session_id):
+                raise HTTPException(status_code=409, detail="Upload session is already being completed")
+            try:
+                if await run_blocking(_chunk_writes_in_progress, session_id):
+                    raise HTTPException(status_code=409, detail="A chunk is still being uploaded")
+                created_file = await _finish_session(session, user_id)
+            except BaseException:
+                await run_blocking(_release_completion, session_id)
+                raise
+
+        return FileResponse(
+            id=created_file["id"],
+            name=created_file["name"],
+            mime_type=created_file["mime_type"],
+            size=created_file["size"],
+            storage_path=created_file["storage_path"],
+            folder_id=created_file["folder_id"],
+            owner_id=created_file["owner_id"],
+            is_starred=created_file["is_starred"],
+            created_at=datetime.fromisoformat(created_file["created_at"]),
+            updated_at=datetime.fromisoformat(created_file["updated_at"]) if created_file["updated_at"] else None
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Complete upload session error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.delete("/{session_id}")
+async def abort_upload_session(
+    session_id: str,
+    user_id: str = Depends(get_current_user_id)
+):
+    try:
+        session = await _load_session(session_id, user_id)
+        claimed, created_file = await run_blocking(_completion_state, session_id)
+        if claimed and created_file is None:
+            raise HTTPException(status_code=409, detail="Upload session is being completed")
+        await run_blocking(_discard_session, session)
+        return {"message": "Upload session aborted"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Abort upload session error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
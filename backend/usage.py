@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, HTTPException
+from repository import db
+from schemas import UsageResponse
+from auth_utils import get_current_user_id
+from config import settings
+
+router = APIRouter()
+
+# Totals are kept current by triggers on files and folders (see
+# add_usage_aggregates.sql), so reading them never scans a user's files.
+
+async def get_usage(user_id: str) -> dict:
+    result = await db.rpc("get_usage", {"p_owner_id": user_id}).execute()
+    if not result.data:
+        raise HTTPException(status_code=404, detail="User not found")
+    usage = result.data
+    # A per-user quota wins over the configured default
+    if usage["quota_bytes"] is None and settings.storage_quota_bytes > 0:
+        usage["quota_bytes"] = settings.storage_quota_bytes
+    return usage
+
+async def check_quota(user_id: str, size: int):
+    """Raise 413 if storing ``size`` more bytes would take the user over quota.
+
+    Called before any bytes are written. Concurrent uploads are each checked
+    against the usage committed so far, so together they can overshoot the
+    quota by at most what is in flight.
+    """
+    usage = await get_usage(user_id)
+    quota = usage["quota_bytes"]
+    if quota is not None and usage["total_bytes"] + size > quota:
+        raise HTTPException(status_code=413, detail="Storage quota exceeded")
+
+@router.get("", response_model=UsageResponse)
+async def get_storage_usage(user_id: str = Depends(get_current_user_id)):
+    try:
+        return UsageResponse(**await get_usage(user_id))
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Get usage error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
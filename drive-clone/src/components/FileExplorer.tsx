@@ -39,6 +39,38 @@ interface FileExplorerProps {
   onRefresh?: () => void;
 }
 
+// Types the backend renders previews for
+const hasThumbnail = (mimeType: string) =>
+  mimeType.startsWith('image/') ||
+  mimeType === 'application/pdf' ||
+  mimeType.startsWith('application/vnd.openxmlformats-officedocument') ||
+  mimeType.startsWith('application/vnd.ms-') ||
+  mimeType === 'application/msword';
+
+const FileThumbnail: React.FC<{ fileId: string; fallback: React.ReactNode }> = ({ fileId, fallback }) => {
+  const [url, setUrl] = useState<string | null>(null);
+
+  useEffect(() => {
+    let objectUrl: string | null = null;
+    let cancelled = false;
+    apiService.getThumbnailUrl(fileId).then((result) => {
+      objectUrl = result;
+      if (cancelled && result) {
+        URL.revokeObjectURL(result);
+      } else {
+        setUrl(result);
+      }
+    }).catch(() => {});
+    return () => {
+      cancelled = true;
+      if (objectUrl) URL.revokeObjectURL(objectUrl);
+    };
+  }, [fileId]);
+
+  if (!url) return <>{fallback}</>;
+  return <img src={url} alt="" className="h-24 w-full object-cover rounded" loading="lazy" />;
+};
+
 const FileExplorer: React.FC<FileExplorerProps> = ({
   files,
   viewMode,
@@ -330,7 +362,11 @@ const FileExplorer: React.FC<FileExplorerProps> = ({
             >
               <div className="flex flex-col items-center">
                 <div className="mb-2">
-                  {getFileIcon(file.mimeType, file.type)}
+                  {file.type === 'file' && hasThumbnail(file.mimeType) ? (
+                    <FileThumbnail fileId={file.id} fallback={getFileIcon(file.mimeType, file.type)} />
+                  ) : (
+                    getFileIcon(file.mimeType, file.type)
+                  )}
                 </div>
                 <h3 className="text-sm font-medium text-gray-900 text-center line-clamp-2 mb-1">
                   {file.name}
@@ -0,0 +1,25 @@
+import React from 'react';
+
+interface LoadMoreProps {
+  loading: boolean;
+  onLoadMore: () => void;
+}
+
+// Shown under a listing while the server has more pages for it
+const LoadMore: React.FC<LoadMoreProps> = ({ loading, onLoadMore }) => (
+  <div className="flex justify-center mt-6">
+    <button
+      type="button"
+      onClick={onLoadMore}
+      disabled={loading}
+      className="inline-flex items-center px-4 py-2 border border-gray-300 text-sm font-medium rounded-md text-gray-700 bg-white hover:bg-gray-50 disabled:opacity-50"
+    >
+      {loading && (
+        <div className="animate-spin rounded-full h-4 w-4 border-b-2 border-blue-600 mr-2"></div>
+      )}
+      {loading ? 'Loading...' : 'Load more'}
+    </button>
+  </div>
+);
+
+export default LoadMore;
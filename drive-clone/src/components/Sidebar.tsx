@@ -21,7 +21,7 @@ interface SidebarProps {
 const Sidebar: React.FC<SidebarProps> = ({ isOpen = true, onClose }) => {
   const [showNewMenu, setShowNewMenu] = useState(false);
   const [storageUsage, setStorageUsage] = useState({ used: 0, total: 0 });
-  const [trashedCount, setTrashedCount] = useState(0);
+  const [trashedCount, setTrashedCount] = useState('');
   const navigate = useNavigate();
 
   useEffect(() => {
@@ -40,11 +40,14 @@ const Sidebar: React.FC<SidebarProps> = ({ isOpen = true, onClose }) => {
 
   const loadTrashedCount = async () => {
     try {
+      // First pages only: past a page the badge just says there are more
       const [files, folders] = await Promise.all([
         apiService.listTrashedFiles(),
         apiService.listTrashedFolders()
       ]);
-      setTrashedCount(files.length + folders.length);
+      const count = files.items.length + folders.items.length;
+      const more = Boolean(files.next_cursor || folders.next_cursor);
+      setTrashedCount(count ? `${count}${more ? '+' : ''}` : '');
     } catch (error) {
       console.error('Failed to load trashed count:', error);
     }
@@ -112,7 +115,7 @@ interface SidebarContentProps {
     name: string;
     icon: React.ComponentType<any>;
     href: string;
-    count: number | null;
+    count: number | string | null;
   }>;
   storageUsage: { used: number; total: number };
   navigate: (path: string) => void;
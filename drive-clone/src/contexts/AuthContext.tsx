@@ -1,5 +1,6 @@
 import React, { createContext, useContext, useState, ReactNode } from 'react';
 import { User, AuthContextType } from '../types';
+import apiService from '../services/api';
 
 const AuthContext = createContext<AuthContextType | undefined>(undefined);
 
@@ -39,8 +40,11 @@ export const AuthProvider: React.FC<AuthProviderProps> = ({ children }) => {
       if (response.ok) {
         const data = await response.json();
         
-        // Store the token
+        // Store the tokens
         localStorage.setItem('auth_token', data.access_token);
+        if (data.refresh_token) {
+          localStorage.setItem('refresh_token', data.refresh_token);
+        }
         
         // Get user info
         const userResponse = await fetch(`${base}/auth/me`, {
@@ -113,8 +117,7 @@ export const AuthProvider: React.FC<AuthProviderProps> = ({ children }) => {
 
   const logout = () => {
     setUser(null);
-    localStorage.removeItem('drive-clone-user');
-    localStorage.removeItem('auth_token');
+    apiService.logout();
   };
 
   const value: AuthContextType = {
@@ -2,49 +2,68 @@ import React, { useState, useEffect, useCallback } from 'react';
 import Layout from '../components/Layout';
 import FileExplorer from '../components/FileExplorer';
 import Breadcrumbs from '../components/Breadcrumbs';
+import LoadMore from '../components/LoadMore';
 import apiService from '../services/api';
 import { FileItem } from '../types';
 
+const formatFileSize = (bytes: number): string => {
+  if (bytes === 0) return '0 Bytes';
+  const k = 1024;
+  const sizes = ['Bytes', 'KB', 'MB', 'GB'];
+  const i = Math.floor(Math.log(bytes) / Math.log(k));
+  return parseFloat((bytes / Math.pow(k, i)).toFixed(2)) + ' ' + sizes[i];
+};
+
+const toFolderItem = (folder: any): FileItem => ({
+  id: folder.id,
+  name: folder.name,
+  type: 'folder' as const,
+  size: '0 items',
+  modifiedAt: new Date(folder.updated_at || folder.created_at).toLocaleDateString(),
+  owner: 'You',
+  mimeType: 'folder',
+  starred: folder.is_starred || false
+});
+
+const toFileItem = (file: any): FileItem => ({
+  id: file.id,
+  name: file.name,
+  type: 'file' as const,
+  size: formatFileSize(file.size),
+  modifiedAt: new Date(file.updated_at || file.created_at).toLocaleDateString(),
+  owner: 'You',
+  mimeType: file.mime_type,
+  starred: file.is_starred || false
+});
+
 const Dashboard: React.FC = () => {
   const [viewMode, setViewMode] = useState<'grid' | 'list'>('grid');
   const [currentPath] = useState([
     { name: 'My Drive', path: '/' }
   ]);
+  const [folders, setFolders] = useState<FileItem[]>([]);
   const [files, setFiles] = useState<FileItem[]>([]);
+  // Where each list continues; null once it is fully shown
+  const [folderCursor, setFolderCursor] = useState<string | null>(null);
+  const [fileCursor, setFileCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [currentFolderId] = useState<string | undefined>(undefined);
 
-  const loadFilesAndFolders = useCallback(async () => {
+  // Quiet reloads (after a pushed change) keep the current view up meanwhile.
+  // Either way only the first page is fetched; the rest loads on demand.
+  const loadFilesAndFolders = useCallback(async (quiet = false) => {
     try {
-      setLoading(true);
+      if (!quiet) {
+        setLoading(true);
+      }
       
-      // Load folders
-      const foldersResponse = await apiService.listFolders(currentFolderId);
-      const folders: FileItem[] = Array.isArray(foldersResponse) ? foldersResponse.map((folder: any) => ({
-        id: folder.id,
-        name: folder.name,
-        type: 'folder' as const,
-        size: '0 items',
-        modifiedAt: new Date(folder.updated_at || folder.created_at).toLocaleDateString(),
-        owner: 'You',
-        mimeType: 'folder',
-        starred: folder.is_starred || false
-      })) : [];
-
-      // Load files
-      const filesResponse = await apiService.listFiles(currentFolderId);
-      const filesData: FileItem[] = Array.isArray(filesResponse) ? filesResponse.map((file: any) => ({
-        id: file.id,
-        name: file.name,
-        type: 'file' as const,
-        size: formatFileSize(file.size),
-        modifiedAt: new Date(file.updated_at || file.created_at).toLocaleDateString(),
-        owner: 'You',
-        mimeType: file.mime_type,
-        starred: file.is_starred || false
-      })) : [];
-
-      setFiles([...folders, ...filesData]);
+      // Load folders and files together
+      const page = await apiService.getFolderContents(currentFolderId);
+      setFolders(page.folders.map(toFolderItem));
+      setFiles(page.files.map(toFileItem));
+      setFolderCursor(page.next_folder_cursor || null);
+      setFileCursor(page.next_file_cursor || null);
     } catch (error) {
       console.error('Failed to load files and folders:', error);
     } finally {
@@ -56,12 +75,34 @@ const Dashboard: React.FC = () => {
     loadFilesAndFolders();
   }, [currentFolderId, loadFilesAndFolders]);
 
-  const formatFileSize = (bytes: number): string => {
-    if (bytes === 0) return '0 Bytes';
-    const k = 1024;
-    const sizes = ['Bytes', 'KB', 'MB', 'GB'];
-    const i = Math.floor(Math.log(bytes) / Math.log(k));
-    return parseFloat((bytes / Math.pow(k, i)).toFixed(2)) + ' ' + sizes[i];
+  // Reload when files or folders change elsewhere instead of polling
+  useEffect(() => {
+    return apiService.subscribeToChanges(() => {
+      loadFilesAndFolders(true);
+    });
+  }, [loadFilesAndFolders]);
+
+  // Next page of whichever lists have more; the server skips the finished one
+  const loadMore = async () => {
+    try {
+      setLoadingMore(true);
+      const page = await apiService.getFolderContents(currentFolderId, {
+        folder_cursor: folderCursor,
+        file_cursor: fileCursor
+      });
+      if (folderCursor) {
+        setFolders(prev => [...prev, ...page.folders.map(toFolderItem)]);
+        setFolderCursor(page.next_folder_cursor || null);
+      }
+      if (fileCursor) {
+        setFiles(prev => [...prev, ...page.files.map(toFileItem)]);
+        setFileCursor(page.next_file_cursor || null);
+      }
+    } catch (error) {
+      console.error('Failed to load more files and folders:', error);
+    } finally {
+      setLoadingMore(false);
+    }
   };
 
   const handleFileUpload = async (file: File) => {
@@ -108,16 +149,21 @@ const Dashboard: React.FC = () => {
               <div className="animate-spin rounded-full h-12 w-12 border-b-2 border-blue-600"></div>
             </div>
           ) : (
-            <FileExplorer
-              files={files}
-              viewMode={viewMode}
-              onViewModeChange={setViewMode}
-              onFileUpload={handleFileUpload}
-              onFolderCreate={handleFolderCreate}
-              onFileDelete={handleFileDelete}
-              currentFolderId={currentFolderId}
-              onRefresh={loadFilesAndFolders}
-            />
+            <>
+              <FileExplorer
+                files={[...folders, ...files]}
+                viewMode={viewMode}
+                onViewModeChange={setViewMode}
+                onFileUpload={handleFileUpload}
+                onFolderCreate={handleFolderCreate}
+                onFileDelete={handleFileDelete}
+                currentFolderId={currentFolderId}
+                onRefresh={() => loadFilesAndFolders()}
+              />
+              {(folderCursor || fileCursor) && (
+                <LoadMore loading={loadingMore} onLoadMore={loadMore} />
+              )}
+            </>
           )}
         </div>
       </div>
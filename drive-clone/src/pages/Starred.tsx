@@ -1,46 +1,63 @@
 import React, { useCallback, useEffect, useState } from 'react';
 import Layout from '../components/Layout';
 import FileExplorer from '../components/FileExplorer';
+import LoadMore from '../components/LoadMore';
 import apiService from '../services/api';
 import { FileItem } from '../types';
 
+const formatFileSize = (bytes: number): string => {
+  if (bytes === 0) return '0 Bytes';
+  const k = 1024;
+  const sizes = ['Bytes', 'KB', 'MB', 'GB'];
+  const i = Math.floor(Math.log(bytes) / Math.log(k));
+  return parseFloat((bytes / Math.pow(k, i)).toFixed(2)) + ' ' + sizes[i];
+};
+
+const toFolderItem = (folder: any): FileItem => ({
+  id: folder.id,
+  name: folder.name,
+  type: 'folder',
+  size: '0 items',
+  modifiedAt: new Date(folder.updated_at || folder.created_at).toLocaleDateString(),
+  owner: 'You',
+  mimeType: 'folder',
+  starred: folder.is_starred || false
+});
+
+const toFileItem = (file: any): FileItem => ({
+  id: file.id,
+  name: file.name,
+  type: 'file',
+  size: formatFileSize(file.size),
+  modifiedAt: new Date(file.updated_at || file.created_at).toLocaleDateString(),
+  owner: 'You',
+  mimeType: file.mime_type,
+  starred: file.is_starred || false
+});
+
 const Starred: React.FC = () => {
   const [viewMode, setViewMode] = useState<'grid' | 'list'>('grid');
-  const [items, setItems] = useState<FileItem[]>([]);
+  const [folders, setFolders] = useState<FileItem[]>([]);
+  const [files, setFiles] = useState<FileItem[]>([]);
+  // Where each list continues; null once it is fully shown
+  const [folderCursor, setFolderCursor] = useState<string | null>(null);
+  const [fileCursor, setFileCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   const loadStarred = useCallback(async () => {
     try {
       setLoading(true);
 
-      const [foldersResponse, filesResponse] = await Promise.all([
+      const [foldersPage, filesPage] = await Promise.all([
         apiService.listStarredFolders(),
         apiService.listStarredFiles()
       ]);
 
-      const folders: FileItem[] = (foldersResponse || []).map((folder: any) => ({
-        id: folder.id,
-        name: folder.name,
-        type: 'folder',
-        size: '0 items',
-        modifiedAt: new Date(folder.updated_at || folder.created_at).toLocaleDateString(),
-        owner: 'You',
-        mimeType: 'folder',
-        starred: folder.is_starred || false
-      }));
-
-      const files: FileItem[] = (filesResponse || []).map((file: any) => ({
-        id: file.id,
-        name: file.name,
-        type: 'file',
-        size: formatFileSize(file.size),
-        modifiedAt: new Date(file.updated_at || file.created_at).toLocaleDateString(),
-        owner: 'You',
-        mimeType: file.mime_type,
-        starred: file.is_starred || false
-      }));
-
-      setItems([...folders, ...files]);
+      setFolders(foldersPage.items.map(toFolderItem));
+      setFiles(filesPage.items.map(toFileItem));
+      setFolderCursor(foldersPage.next_cursor || null);
+      setFileCursor(filesPage.next_cursor || null);
     } catch (error) {
       console.error('Failed to load starred items:', error);
     } finally {
@@ -52,12 +69,29 @@ const Starred: React.FC = () => {
     loadStarred();
   }, [loadStarred]);
 
-  const formatFileSize = (bytes: number): string => {
-    if (bytes === 0) return '0 Bytes';
-    const k = 1024;
-    const sizes = ['Bytes', 'KB', 'MB', 'GB'];
-    const i = Math.floor(Math.log(bytes) / Math.log(k));
-    return parseFloat((bytes / Math.pow(k, i)).toFixed(2)) + ' ' + sizes[i];
+  // Next page of whichever lists have more
+  const loadMore = async () => {
+    try {
+      setLoadingMore(true);
+
+      const [foldersPage, filesPage] = await Promise.all([
+        folderCursor ? apiService.listStarredFolders(folderCursor) : null,
+        fileCursor ? apiService.listStarredFiles(fileCursor) : null
+      ]);
+
+      if (foldersPage) {
+        setFolders(prev => [...prev, ...foldersPage.items.map(toFolderItem)]);
+        setFolderCursor(foldersPage.next_cursor || null);
+      }
+      if (filesPage) {
+        setFiles(prev => [...prev, ...filesPage.items.map(toFileItem)]);
+        setFileCursor(filesPage.next_cursor || null);
+      }
+    } catch (error) {
+      console.error('Failed to load more starred items:', error);
+    } finally {
+      setLoadingMore(false);
+    }
   };
 
   const handleFileDelete = async (id: string, type: 'file' | 'folder') => {
@@ -73,13 +107,18 @@ const Starred: React.FC = () => {
             <div className="animate-spin rounded-full h-12 w-12 border-b-2 border-blue-600"></div>
           </div>
         ) : (
-          <FileExplorer
-            files={items}
-            viewMode={viewMode}
-            onViewModeChange={setViewMode}
-            onFileDelete={handleFileDelete}
-            onRefresh={loadStarred}
-          />
+          <>
+            <FileExplorer
+              files={[...folders, ...files]}
+              viewMode={viewMode}
+              onViewModeChange={setViewMode}
+              onFileDelete={handleFileDelete}
+              onRefresh={loadStarred}
+            />
+            {(folderCursor || fileCursor) && (
+              <LoadMore loading={loadingMore} onLoadMore={loadMore} />
+            )}
+          </>
         )}
       </div>
     </Layout>
@@ -87,5 +126,3 @@ const Starred: React.FC = () => {
 };
 
 export default Starred;
-
-
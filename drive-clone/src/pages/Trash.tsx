@@ -7,45 +7,65 @@ import {
   FileIcon,
   FolderIcon
 } from 'lucide-react';
+import LoadMore from '../components/LoadMore';
 import apiService from '../services/api';
 import { FileItem } from '../types';
 
+const formatFileSize = (bytes: number): string => {
+  if (bytes === 0) return '0 Bytes';
+  const k = 1024;
+  const sizes = ['Bytes', 'KB', 'MB', 'GB'];
+  const i = Math.floor(Math.log(bytes) / Math.log(k));
+  return parseFloat((bytes / Math.pow(k, i)).toFixed(2)) + ' ' + sizes[i];
+};
+
+const toFolderItem = (folder: any): FileItem => ({
+  id: folder.id,
+  name: folder.name,
+  type: 'folder' as const,
+  size: '0 items',
+  modifiedAt: new Date(folder.updated_at || folder.created_at).toLocaleDateString(),
+  owner: 'You',
+  mimeType: 'folder',
+  starred: folder.is_starred || false
+});
+
+const toFileItem = (file: any): FileItem => ({
+  id: file.id,
+  name: file.name,
+  type: 'file' as const,
+  size: formatFileSize(file.size),
+  modifiedAt: new Date(file.updated_at || file.created_at).toLocaleDateString(),
+  owner: 'You',
+  mimeType: file.mime_type,
+  starred: file.is_starred || false
+});
+
 const Trash: React.FC = () => {
-  const [trashedItems, setTrashedItems] = useState<FileItem[]>([]);
+  const [trashedFolders, setTrashedFolders] = useState<FileItem[]>([]);
+  const [trashedFiles, setTrashedFiles] = useState<FileItem[]>([]);
+  // Where each list continues; null once it is fully shown
+  const [folderCursor, setFolderCursor] = useState<string | null>(null);
+  const [fileCursor, setFileCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [selectedItems, setSelectedItems] = useState<string[]>([]);
+  const trashedItems = [...trashedFolders, ...trashedFiles];
 
   const loadTrashedItems = useCallback(async () => {
     try {
       setLoading(true);
       
-      // Load trashed folders
-      const foldersResponse = await apiService.listTrashedFolders();
-      const folders: FileItem[] = Array.isArray(foldersResponse) ? foldersResponse.map((folder: any) => ({
-        id: folder.id,
-        name: folder.name,
-        type: 'folder' as const,
-        size: '0 items',
-        modifiedAt: new Date(folder.updated_at || folder.created_at).toLocaleDateString(),
-        owner: 'You',
-        mimeType: 'folder',
-        starred: folder.is_starred || false
-      })) : [];
+      // Load the first page of trashed folders and files
+      const [foldersPage, filesPage] = await Promise.all([
+        apiService.listTrashedFolders(),
+        apiService.listTrashedFiles()
+      ]);
 
-      // Load trashed files
-      const filesResponse = await apiService.listTrashedFiles();
-      const files: FileItem[] = Array.isArray(filesResponse) ? filesResponse.map((file: any) => ({
-        id: file.id,
-        name: file.name,
-        type: 'file' as const,
-        size: formatFileSize(file.size),
-        modifiedAt: new Date(file.updated_at || file.created_at).toLocaleDateString(),
-        owner: 'You',
-        mimeType: file.mime_type,
-        starred: file.is_starred || false
-      })) : [];
-
-      setTrashedItems([...folders, ...files]);
+      setTrashedFolders(foldersPage.items.map(toFolderItem));
+      setTrashedFiles(filesPage.items.map(toFileItem));
+      setFolderCursor(foldersPage.next_cursor || null);
+      setFileCursor(filesPage.next_cursor || null);
     } catch (error) {
       console.error('Failed to load trashed items:', error);
     } finally {
@@ -57,12 +77,29 @@ const Trash: React.FC = () => {
     loadTrashedItems();
   }, [loadTrashedItems]);
 
-  const formatFileSize = (bytes: number): string => {
-    if (bytes === 0) return '0 Bytes';
-    const k = 1024;
-    const sizes = ['Bytes', 'KB', 'MB', 'GB'];
-    const i = Math.floor(Math.log(bytes) / Math.log(k));
-    return parseFloat((bytes / Math.pow(k, i)).toFixed(2)) + ' ' + sizes[i];
+  // Next page of whichever lists have more
+  const loadMore = async () => {
+    try {
+      setLoadingMore(true);
+
+      const [foldersPage, filesPage] = await Promise.all([
+        folderCursor ? apiService.listTrashedFolders(folderCursor) : null,
+        fileCursor ? apiService.listTrashedFiles(fileCursor) : null
+      ]);
+
+      if (foldersPage) {
+        setTrashedFolders(prev => [...prev, ...foldersPage.items.map(toFolderItem)]);
+        setFolderCursor(foldersPage.next_cursor || null);
+      }
+      if (filesPage) {
+        setTrashedFiles(prev => [...prev, ...filesPage.items.map(toFileItem)]);
+        setFileCursor(filesPage.next_cursor || null);
+      }
+    } catch (error) {
+      console.error('Failed to load more trashed items:', error);
+    } finally {
+      setLoadingMore(false);
+    }
   };
 
   const handleRestore = async (itemId: string, type: 'file' | 'folder') => {
@@ -277,6 +314,10 @@ const Trash: React.FC = () => {
           </div>
         )}
 
+        {!loading && (folderCursor || fileCursor) && (
+          <LoadMore loading={loadingMore} onLoadMore={loadMore} />
+        )}
+
         {trashedItems.length > 0 && (
           <div className="mt-4 p-4 bg-yellow-50 rounded-lg border border-yellow-200">
             <div className="flex">
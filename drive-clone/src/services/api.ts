@@ -4,6 +4,7 @@ const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
 interface LoginResponse {
   access_token: string;
   token_type: string;
+  refresh_token?: string;
 }
 
 interface UserResponse {
@@ -38,16 +39,118 @@ interface FolderResponse {
   updated_at?: string;
 }
 
+interface PageResponse<T> {
+  items: T[];
+  next_cursor?: string | null;
+}
+
+interface FolderContentsResponse {
+  folder?: FolderResponse | null;
+  folders: FolderResponse[];
+  files: FileResponse[];
+  folder_count?: number | null;
+  file_count?: number | null;
+  next_folder_cursor?: string | null;
+  next_file_cursor?: string | null;
+}
+
+interface SearchResult {
+  type: 'file' | 'folder';
+  id: string;
+  name: string;
+  mime_type?: string | null;
+  size?: number | null;
+  parent_id?: string | null;
+  is_starred: boolean;
+  created_at: string;
+  updated_at?: string | null;
+  score: number;
+}
+
+interface BulkResponse {
+  succeeded: number;
+  failed: number;
+  results: { id: string; type: 'file' | 'folder'; status: 'ok' | 'not_found' | 'invalid'; detail?: string | null }[];
+}
+
+interface UsageResponse {
+  total_bytes: number;
+  file_count: number;
+  trashed_bytes: number;
+  trashed_file_count: number;
+  quota_bytes?: number | null;
+  by_type: { mime_type: string; bytes: number; file_count: number }[];
+}
+
+interface ChangeItem {
+  type: 'file' | 'folder';
+  id: string;
+  deleted: boolean;
+  trashed: boolean;
+  file?: FileResponse | null;
+  folder?: FolderResponse | null;
+}
+
+interface ChangesResponse {
+  items: ChangeItem[];
+  cursor: string;
+  has_more: boolean;
+}
+
+// Pushed by /changes/stream; 'resync' means events may have been missed
+interface ChangeEvent {
+  action: 'created' | 'updated' | 'trashed' | 'restored' | 'deleted' | 'resync';
+  files: string[];
+  folders: string[];
+}
+
+const RESYNC_EVENT: ChangeEvent = { action: 'resync', files: [], folders: [] };
+
 class ApiService {
   private baseURL: string;
+  // In-flight refresh, shared so concurrent 401s rotate the token only once
+  private refreshing: Promise<boolean> | null = null;
 
   constructor() {
     this.baseURL = API_BASE_URL;
   }
 
+  // Swap the stored refresh token for a new access token; false if the
+  // session is gone and the user has to log in again
+  private refreshAccessToken(): Promise<boolean> {
+    const refreshToken = localStorage.getItem('refresh_token');
+    if (!refreshToken) {
+      return Promise.resolve(false);
+    }
+    if (!this.refreshing) {
+      this.refreshing = fetch(`${this.baseURL}/auth/refresh`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ refresh_token: refreshToken }),
+      })
+        .then(async (response) => {
+          if (!response.ok) {
+            return false;
+          }
+          const data: LoginResponse = await response.json();
+          localStorage.setItem('auth_token', data.access_token);
+          if (data.refresh_token) {
+            localStorage.setItem('refresh_token', data.refresh_token);
+          }
+          return true;
+        })
+        .catch(() => false)
+        .finally(() => {
+          this.refreshing = null;
+        });
+    }
+    return this.refreshing;
+  }
+
   private async request<T>(
     endpoint: string,
-    options: RequestInit = {}
+    options: RequestInit = {},
+    retried = false
   ): Promise<T> {
     const url = `${this.baseURL}${endpoint}`;
     
@@ -72,10 +175,15 @@ class ApiService {
       const response = await fetch(url, config);
       
       if (!response.ok) {
+        // Expired access token: refresh it and retry once
+        if (response.status === 401 && !retried && await this.refreshAccessToken()) {
+          return this.request<T>(endpoint, options, true);
+        }
         if (response.status === 401 || response.status === 403) {
           // Token invalid/expired or missing -> clear and redirect to login
           try {
             localStorage.removeItem('auth_token');
+            localStorage.removeItem('refresh_token');
             localStorage.removeItem('drive-clone-user');
           } catch {}
           // Redirect outside of React tree is acceptable for a global guard
@@ -94,6 +202,13 @@ class ApiService {
     }
   }
 
+  // One page of a listing; pass the previous page's next_cursor to continue
+  private async requestPage<T>(endpoint: string, cursor?: string | null): Promise<PageResponse<T>> {
+    const separator = endpoint.includes('?') ? '&' : '?';
+    const url = cursor ? `${endpoint}${separator}cursor=${encodeURIComponent(cursor)}` : endpoint;
+    return this.request<PageResponse<T>>(url);
+  }
+
   // Auth endpoints
   async signup(name: string, email: string, password: string): Promise<UserResponse> {
     return this.request<UserResponse>('/auth/signup', {
@@ -108,10 +223,13 @@ class ApiService {
       body: JSON.stringify({ email, password }),
     });
     
-    // Store the token
+    // Store the tokens
     if (response.access_token) {
       localStorage.setItem('auth_token', response.access_token);
     }
+    if (response.refresh_token) {
+      localStorage.setItem('refresh_token', response.refresh_token);
+    }
     
     return response;
   }
@@ -154,23 +272,36 @@ class ApiService {
     return response.json();
   }
 
-  async listFiles(folderId?: string): Promise<FileResponse[]> {
+  async listFiles(folderId?: string, cursor?: string | null): Promise<PageResponse<FileResponse>> {
     const params = folderId ? `?folder_id=${folderId}` : '';
-    return this.request<FileResponse[]>(`/files/list${params}`);
+    return this.requestPage<FileResponse>(`/files/list${params}`, cursor);
   }
 
   async getFile(fileId: string): Promise<FileResponse> {
     return this.request<FileResponse>(`/files/${fileId}`);
   }
 
+  // Fetched with the auth header (an <img> can't send it) and handed out as an
+  // object URL; null when the file has no thumbnail
+  async getThumbnailUrl(fileId: string, size = 256): Promise<string | null> {
+    const token = localStorage.getItem('auth_token');
+    const response = await fetch(`${this.baseURL}/files/${fileId}/thumbnail?size=${size}`, {
+      headers: { 'Authorization': `Bearer ${token}` },
+    });
+    if (!response.ok) {
+      return null;
+    }
+    return URL.createObjectURL(await response.blob());
+  }
+
   async deleteFile(fileId: string): Promise<{message: string}> {
     return this.request<{message: string}>(`/files/${fileId}`, {
       method: 'DELETE',
     });
   }
 
-  async toggleFileStar(fileId: string): Promise<{message: string}> {
-    return this.request<{message: string}>(`/files/${fileId}/star`, {
+  async toggleFileStar(fileId: string): Promise<{message: string, is_starred: boolean}> {
+    return this.request<{message: string, is_starred: boolean}>(`/files/${fileId}/star`, {
       method: 'PUT',
     });
   }
@@ -183,15 +314,53 @@ class ApiService {
     });
   }
 
-  async listFolders(parentId?: string): Promise<FolderResponse[]> {
+  async listFolders(parentId?: string, cursor?: string | null): Promise<PageResponse<FolderResponse>> {
     const params = parentId ? `?parent_id=${parentId}` : '';
-    return this.request<FolderResponse[]>(`/folders/list${params}`);
+    return this.requestPage<FolderResponse>(`/folders/list${params}`, cursor);
+  }
+
+  // One page of a folder's (or the root's) subfolders and files. Without
+  // cursors this is the first page of both; to load more, pass the cursors the
+  // previous page returned and only the lists that have more are fetched.
+  async getFolderContents(
+    folderId?: string,
+    cursors: { folder_cursor?: string | null; file_cursor?: string | null } = {}
+  ): Promise<FolderContentsResponse> {
+    const endpoint = folderId ? `/folders/${folderId}/contents` : '/folders/contents';
+    const params = new URLSearchParams();
+    if (cursors.folder_cursor) params.set('folder_cursor', cursors.folder_cursor);
+    if (cursors.file_cursor) params.set('file_cursor', cursors.file_cursor);
+    const query = params.toString();
+    return this.request<FolderContentsResponse>(query ? `${endpoint}?${query}` : endpoint);
   }
 
   async getFolder(folderId: string): Promise<FolderResponse> {
     return this.request<FolderResponse>(`/folders/${folderId}`);
   }
 
+  async getFolderPath(folderId: string): Promise<FolderResponse[]> {
+    return this.request<FolderResponse[]>(`/folders/${folderId}/path`);
+  }
+
+  // Apply one action to many files and folders in a single request
+  async bulk(
+    action: 'move' | 'star' | 'trash' | 'restore' | 'delete',
+    fileIds: string[],
+    folderIds: string[],
+    options: { target_folder_id?: string | null; starred?: boolean } = {}
+  ): Promise<BulkResponse> {
+    return this.request<BulkResponse>(`/bulk/${action}`, {
+      method: 'POST',
+      body: JSON.stringify({ file_ids: fileIds, folder_ids: folderIds, ...options }),
+    });
+  }
+
+  async search(query: string, cursor?: string): Promise<PageResponse<SearchResult>> {
+    const params = new URLSearchParams({ q: query });
+    if (cursor) params.set('cursor', cursor);
+    return this.request<PageResponse<SearchResult>>(`/search?${params.toString()}`);
+  }
+
   async updateFolder(folderId: string, name: string, parentId?: string): Promise<FolderResponse> {
     return this.request<FolderResponse>(`/folders/${folderId}`, {
       method: 'PUT',
@@ -205,47 +374,47 @@ class ApiService {
     });
   }
 
-  async toggleFolderStar(folderId: string): Promise<{message: string}> {
-    return this.request<{message: string}>(`/folders/${folderId}/star`, {
+  async toggleFolderStar(folderId: string): Promise<{message: string, is_starred: boolean}> {
+    return this.request<{message: string, is_starred: boolean}>(`/folders/${folderId}/star`, {
       method: 'PUT',
     });
   }
 
   // Trash endpoints
-  async listTrashedFiles(): Promise<FileResponse[]> {
+  async listTrashedFiles(cursor?: string | null): Promise<PageResponse<FileResponse>> {
     try {
-      return this.request<FileResponse[]>('/files/trash');
+      return await this.requestPage<FileResponse>('/files/trash', cursor);
     } catch (error) {
       console.warn('Trash functionality not available:', error);
-      return [];
+      return { items: [] };
     }
   }
 
-  async listTrashedFolders(): Promise<FolderResponse[]> {
+  async listTrashedFolders(cursor?: string | null): Promise<PageResponse<FolderResponse>> {
     try {
-      return this.request<FolderResponse[]>('/folders/trash');
+      return await this.requestPage<FolderResponse>('/folders/trash', cursor);
     } catch (error) {
       console.warn('Trash functionality not available:', error);
-      return [];
+      return { items: [] };
     }
   }
 
   // Starred endpoints
-  async listStarredFiles(): Promise<FileResponse[]> {
-    return this.request<FileResponse[]>('/files/starred');
+  async listStarredFiles(cursor?: string | null): Promise<PageResponse<FileResponse>> {
+    return this.requestPage<FileResponse>('/files/starred', cursor);
   }
 
-  async listStarredFolders(): Promise<FolderResponse[]> {
-    return this.request<FolderResponse[]>('/folders/starred');
+  async listStarredFolders(cursor?: string | null): Promise<PageResponse<FolderResponse>> {
+    return this.requestPage<FolderResponse>('/folders/starred', cursor);
   }
 
   // Recent endpoints
-  async listRecentFiles(): Promise<FileResponse[]> {
-    return this.request<FileResponse[]>('/files/recent');
+  async listRecentFiles(cursor?: string | null): Promise<PageResponse<FileResponse>> {
+    return this.requestPage<FileResponse>('/files/recent', cursor);
   }
 
-  async listRecentFolders(): Promise<FolderResponse[]> {
-    return this.request<FolderResponse[]>('/folders/recent');
+  async listRecentFolders(cursor?: string | null): Promise<PageResponse<FolderResponse>> {
+    return this.requestPage<FolderResponse>('/folders/recent', cursor);
   }
 
   async restoreFile(fileId: string): Promise<{message: string}> {
@@ -272,23 +441,112 @@ class ApiService {
     });
   }
 
-  // Storage usage
+  // Changes since a cursor from an earlier call; without one, just the current cursor
+  async getChanges(since?: string): Promise<ChangesResponse> {
+    const params = since ? `?since=${encodeURIComponent(since)}` : '';
+    return this.request<ChangesResponse>(`/changes${params}`);
+  }
+
+  // Call onChange for each push about the user's files and folders until the
+  // returned function is called. Reconnects on its own, sending a 'resync'
+  // after any gap. Read with fetch rather than EventSource so the token can
+  // go in the Authorization header.
+  subscribeToChanges(onChange: (event: ChangeEvent) => void): () => void {
+    const controller = new AbortController();
+
+    const connect = async (failures: number, resume: boolean): Promise<void> => {
+      let subscribed = false;
+      let retryNow = false;
+      try {
+        const token = localStorage.getItem('auth_token');
+        const response = await fetch(`${this.baseURL}/changes/stream`, {
+          headers: token ? { 'Authorization': `Bearer ${token}` } : {},
+          signal: controller.signal,
+        });
+        if (response.status === 401) {
+          if (!(await this.refreshAccessToken())) {
+            return;
+          }
+          retryNow = true;
+        } else if (response.ok && response.body) {
+          const reader = response.body.getReader();
+          const decoder = new TextDecoder();
+          let buffer = '';
+          for (;;) {
+            const { value, done } = await reader.read();
+            if (done) {
+              break;
+            }
+            buffer += decoder.decode(value, { stream: true });
+            let end = buffer.indexOf('\n\n');
+            while (end >= 0) {
+              const frame = buffer.slice(0, end);
+              buffer = buffer.slice(end + 2);
+              end = buffer.indexOf('\n\n');
+
+              let event = '';
+              let data = '';
+              frame.split('\n').forEach((line) => {
+                if (line.startsWith('event: ')) {
+                  event = line.slice(7);
+                } else if (line.startsWith('data: ')) {
+                  data = line.slice(6);
+                }
+              });
+              if (event === 'ready') {
+                subscribed = true;
+                if (resume) {
+                  onChange(RESYNC_EVENT);
+                }
+              } else if (event === 'change' || event === 'resync') {
+                onChange(JSON.parse(data));
+              }
+            }
+          }
+        }
+      } catch (error) {
+        if (controller.signal.aborted) {
+          return;
+        }
+        console.error('Change stream failed:', error);
+      }
+      if (controller.signal.aborted) {
+        return;
+      }
+      // The server closes the stream when the token expires: reconnect at once.
+      // Otherwise back off while it is unreachable.
+      const delay = subscribed || retryNow ? 0 : Math.min(30000, 1000 * Math.pow(2, failures));
+      setTimeout(() => connect(subscribed ? 0 : failures + 1, resume || subscribed), delay);
+    };
+
+    connect(0, false);
+    return () => controller.abort();
+  }
+
+  // Storage usage, maintained server-side; total falls back to 15GB without a quota
   async getStorageUsage(): Promise<{used: number, total: number}> {
     try {
-      // Calculate storage usage from user's files
-      const files = await this.listFiles();
-      const used = files.reduce((total, file) => total + file.size, 0);
-      const total = 15 * 1024 * 1024 * 1024; // 15GB default
-      return { used, total };
+      const usage = await this.request<UsageResponse>('/usage');
+      return { used: usage.total_bytes, total: usage.quota_bytes ?? 15 * 1024 * 1024 * 1024 };
     } catch (error) {
-      console.error('Failed to calculate storage usage:', error);
+      console.error('Failed to load storage usage:', error);
       return { used: 0, total: 15 * 1024 * 1024 * 1024 };
     }
   }
 
   // Utility methods
   logout() {
+    // End the server-side session too, so the refresh token can't be reused
+    const refreshToken = localStorage.getItem('refresh_token');
+    if (refreshToken) {
+      fetch(`${this.baseURL}/auth/logout`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ refresh_token: refreshToken }),
+      }).catch(() => {});
+    }
     localStorage.removeItem('auth_token');
+    localStorage.removeItem('refresh_token');
     localStorage.removeItem('drive-clone-user');
   }
 